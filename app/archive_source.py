@@ -0,0 +1,229 @@
+"""
+archive_source.py
+------------------
+直接从 tar / zip 归档读取图片，无需解压
+
+爬取的数据集以归档形式拷贝，解压会占用双倍磁盘并耗费大量时间：
+    - 打开归档时建立一次成员索引 (zip 为中央目录；tar 扫描一遍头部，
+      索引保存为旁边的 <归档>.index.json，归档未变时直接复用)
+    - 按成员读取原始字节，可直接交给 cv2.imdecode / PIL 解码
+    - 每个线程使用独立的文件句柄，多个读取线程可并行读取
+    - 归档内的图片用 "<归档路径>::<成员路径>" 表示，批量识别可与普通路径混用
+
+tar 需为未压缩格式 (.tar)：JPEG 本身已压缩，gzip 几乎不能再减小体积，
+却使随机读取变得不可能。zip 中 Windows 生成的 GBK 文件名会被正确还原。
+"""
+
+import json
+import os
+import tarfile
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from image_index import is_image_file
+
+MEMBER_SEP = "::"
+ARCHIVE_EXTENSIONS = ('.zip', '.tar')
+INDEX_VERSION = 1
+
+
+def is_archive(path):
+    return str(path).lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def split_member_path(path):
+    """"a.zip::x/y.jpg" -> ("a.zip", "x/y.jpg")；普通路径返回 None"""
+    archive, sep, member = str(path).partition(MEMBER_SEP)
+    if not sep or not archive.lower().endswith(ARCHIVE_EXTENSIONS):
+        return None
+    return archive, member
+
+
+def member_path(archive, member):
+    return f"{archive}{MEMBER_SEP}{member}"
+
+
+def _zip_display_name(info):
+    """未设置 UTF-8 标志的文件名按 cp437 解码，中文 Windows 下实际为 GBK"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+class ArchiveSource:
+    """tar / zip 归档中的图片，接口与 DirectorySource 一致"""
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+        if zipfile.is_zipfile(self.path):
+            self.format = "zip"
+            self._members = self._index_zip()
+        elif tarfile.is_tarfile(self.path):
+            self.format = "tar"
+            self._members = self._index_tar()
+        else:
+            raise ValueError(f"不支持的归档格式: {path}")
+
+    def _index_zip(self):
+        with zipfile.ZipFile(self.path) as zf:
+            return {_zip_display_name(info): info.filename
+                    for info in zf.infolist() if not info.is_dir()}
+
+    def _index_tar(self):
+        """成员名 -> (数据偏移, 大小)；索引文件与归档大小 / 修改时间一致时直接加载"""
+        st = os.stat(self.path)
+        index_path = self.path + ".index.json"
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (cached.get("version"), cached.get("size"), cached.get("mtime_ns")) == \
+                    (INDEX_VERSION, st.st_size, st.st_mtime_ns):
+                return {name: tuple(v) for name, v in cached["members"].items()}
+        except (OSError, ValueError):
+            pass
+
+        try:
+            with tarfile.open(self.path, "r:") as tf:
+                members = {m.name: (m.offset_data, m.size) for m in tf if m.isfile()}
+        except tarfile.ReadError:
+            raise ValueError(f"{os.path.basename(self.path)} 是压缩的 tar，请改用未压缩的 .tar 或 .zip")
+
+        try:
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": INDEX_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                           "members": members}, f, ensure_ascii=False)
+        except OSError:
+            # 只读目录 (如网络共享) 下每次重新扫描
+            pass
+        return members
+
+    def _handle(self):
+        """当前线程的文件句柄 (zip 为 ZipFile)"""
+        handle = getattr(self._local, "handle", None)
+        if handle is None:
+            handle = zipfile.ZipFile(self.path) if self.format == "zip" else open(self.path, 'rb')
+            self._local.handle = handle
+            with self._lock:
+                self._handles.append(handle)
+        return handle
+
+    def list_images(self):
+        """归档内全部图片的成员路径 (排序)"""
+        return sorted(name for name in self._members if is_image_file(name))
+
+    def read(self, name):
+        """读取成员的原始字节"""
+        entry = self._members.get(name)
+        if entry is None:
+            raise FileNotFoundError(f"{os.path.basename(self.path)} 中没有 {name}")
+        handle = self._handle()
+        if self.format == "zip":
+            try:
+                return handle.read(entry)
+            except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+                # 成员损坏：与文件读取错误一并按 OSError 处理，调用方逐张记录错误
+                raise OSError(f"{os.path.basename(self.path)} 中的 {name} 已损坏: {e}") from e
+        offset, size = entry
+        handle.seek(offset)
+        return handle.read(size)
+
+    def close(self):
+        with self._lock:
+            handles, self._handles = self._handles, []
+        for handle in handles:
+            handle.close()
+
+
+class DirectorySource:
+    """普通目录，成员路径为相对路径 (使用 /)"""
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.format = "dir"
+
+    def list_images(self):
+        names = []
+        for dirpath, _, filenames in os.walk(self.path):
+            rel = os.path.relpath(dirpath, self.path)
+            for name in filenames:
+                if is_image_file(name):
+                    names.append(name if rel == "." else f"{rel.replace(os.sep, '/')}/{name}")
+        return sorted(names)
+
+    def read(self, name):
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+
+def open_source(path):
+    """目录或归档统一打开为图片源"""
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    return ArchiveSource(path)
+
+
+def read_many(source, names, workers=4):
+    """多线程并行读取，按 names 顺序产出 (name, bytes 或 OSError)
+
+    预读窗口有上限，读取速度不会远超调用方的处理速度。
+    """
+    window = deque()
+    names = iter(names)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for name in names:
+            window.append((name, pool.submit(source.read, name)))
+            if len(window) >= workers * 4:
+                break
+        while window:
+            name, future = window.popleft()
+            try:
+                data = future.result()
+            except OSError as e:
+                data = e
+            for next_name in names:
+                window.append((next_name, pool.submit(source.read, next_name)))
+                break
+            yield name, data
+
+
+# 批量识别按路径读取时复用已打开的归档 (索引只建一次)
+_opened = {}
+_opened_lock = threading.Lock()
+
+
+def _archive(path):
+    key = os.path.normcase(os.path.abspath(path))
+    with _opened_lock:
+        source = _opened.get(key)
+        if source is None:
+            source = _opened[key] = ArchiveSource(path)
+    return source
+
+
+def expand_archive(path):
+    """归档 -> 其中全部图片的 "<归档>::<成员>" 路径"""
+    return [member_path(path, name) for name in _archive(path).list_images()]
+
+
+def read_bytes(path):
+    """读取普通文件或归档成员的字节"""
+    parts = split_member_path(path)
+    if parts is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    archive, member = parts
+    try:
+        return _archive(archive).read(member)
+    except ValueError as e:
+        # 与文件读取错误一并按 OSError 处理
+        raise OSError(str(e))
@@ -0,0 +1,187 @@
+"""
+batch_pipeline.py
+------------------
+后台批量识别流水线
+
+    读取线程池 (并行读盘) -> 有界预取队列 -> 推理线程 (批量前向) -> 结果队列
+
+结果以字典形式放入线程安全的 results 队列，由 GUI 通过 root.after 定时取出，
+主线程不会被阻塞。支持暂停 / 继续 / 取消，并提供吞吐与剩余时间估计。
+可选的 sink (如 result_export.ResultExporter) 在推理线程中逐条接收结果，用于流式导出。
+路径可以是 "<归档>::<成员>" 形式，直接从 tar / zip 中读取 (见 archive_source.py)。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from archive_source import read_bytes
+from model_backend import predict_probs
+from results import topk
+
+_SENTINEL = object()
+
+
+class BatchPipeline:
+    """批量识别流水线，结果记录格式:
+
+        {"index": 序号, "path": 路径, "topk": [(类别索引, 置信度), ...],
+         "error": 错误信息或 None, "latency_ms": 该图片分摊的 batch 耗时}
+    """
+    def __init__(self, model, paths, batch_size=16, read_workers=4, prefetch_batches=2, k=5, sink=None):
+        self.model = model
+        self.sink = sink
+        self.sink_error = None
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self.read_workers = read_workers
+        self.k = k
+        self.total = len(self.paths)
+        self.done = 0
+        self.results = queue.Queue()
+
+        self._batches = queue.Queue(maxsize=prefetch_batches)
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._started_at = None
+        self._paused_at = None
+        self._paused_total = 0.0
+
+    # ---------------- 控制 ----------------
+    def start(self):
+        self._started_at = time.perf_counter()
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._inference_loop, daemon=True).start()
+
+    def pause(self):
+        if self._resume.is_set():
+            self._paused_at = time.perf_counter()
+            self._resume.clear()
+
+    def resume(self):
+        if not self._resume.is_set():
+            self._paused_total += time.perf_counter() - self._paused_at
+            self._paused_at = None
+            self._resume.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._resume.set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    # ---------------- 统计 ----------------
+    def elapsed(self):
+        """已运行时间 (不含暂停)"""
+        if self._started_at is None:
+            return 0.0
+        now = self._paused_at or time.perf_counter()
+        return now - self._started_at - self._paused_total
+
+    def throughput(self):
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """剩余时间估计 (秒)，尚无数据时返回 None"""
+        rate = self.throughput()
+        if rate <= 0:
+            return None
+        return (self.total - self.done) / rate
+
+    # ---------------- 工作线程 ----------------
+    def _read_loop(self):
+        """并行读取图片字节，按 batch 放入有界队列 (队列满时自然限速)"""
+        with ThreadPoolExecutor(max_workers=self.read_workers) as pool:
+            for start in range(0, self.total, self.batch_size):
+                self._resume.wait()
+                if self._cancelled.is_set():
+                    break
+                chunk = self.paths[start:start + self.batch_size]
+                futures = [pool.submit(read_bytes, p) for p in chunk]
+                self._put((start, chunk, futures))
+        self._put(_SENTINEL)
+
+    def _put(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self._batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _inference_loop(self):
+        try:
+            while True:
+                self._resume.wait()
+                if self._cancelled.is_set():
+                    break
+                try:
+                    item = self._batches.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _SENTINEL:
+                    break
+                self._run_batch(*item)
+        finally:
+            self._close_sink()
+            self._finished.set()
+
+    def _close_sink(self):
+        close = getattr(self.sink, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            self.sink_error = self.sink_error or str(e)
+
+    def _run_batch(self, start, chunk, futures):
+        inputs, errors = [], {}
+        for i, fut in enumerate(futures):
+            try:
+                inputs.append(fut.result())
+            except OSError as e:
+                errors[i] = str(e)
+
+        valid = [i for i in range(len(chunk)) if i not in errors]
+        t0 = time.perf_counter()
+        try:
+            probs = dict(zip(valid, predict_probs(self.model, inputs))) if inputs else {}
+        except Exception:
+            # 整批失败时逐张重试，定位出错的图片
+            probs = {}
+            for i, data in zip(valid, inputs):
+                try:
+                    probs[i] = predict_probs(self.model, [data])[0]
+                except Exception as e:
+                    errors[i] = str(e)
+        latency_ms = (time.perf_counter() - t0) * 1000 / max(len(chunk), 1)
+
+        for i, path in enumerate(chunk):
+            record = {"index": start + i, "path": path, "topk": [], "error": errors.get(i), "latency_ms": latency_ms}
+            if i in probs:
+                p = probs[i]
+                record["topk"] = [(int(idx), float(p[idx])) for idx in topk(p, self.k)]
+            if self.sink is not None and self.sink_error is None:
+                try:
+                    self.sink(record)
+                except Exception as e:
+                    # 导出失败 (如磁盘已满) 时停止流水线，由界面提示
+                    self.sink_error = str(e)
+                    self.cancel()
+            self.results.put(record)
+        self.done += len(chunk)
@@ -0,0 +1,130 @@
+"""
+cascade.py
+-----------
+快慢模型级联推理
+
+大多数图片用小模型即可正确识别：
+    - 先由快速模型 (如 yolov8n-cls) 识别整个 batch
+    - 仅 top-1 置信度低于 min_conf 或 top-1 与 top-2 差值低于 min_margin 的图片
+      再送入精确模型 (如 yolov8s-cls)，其结果覆盖快速模型的结果
+    - 两个模型的类别按名称对齐，输出统一使用精确模型的类别顺序
+
+阈值由 scripts/calibrate_cascade.py 在验证集上标定，写入 models/cascade.json：
+    {"fast": "...", "accurate": "...", "min_conf": 0.8, "min_margin": 0.3, ...}
+load_model() 遇到 .json 配置时自动创建 CascadeClassifier。
+"""
+
+import json
+import os
+
+import numpy as np
+
+from model_backend import embed, load_model, predict_probs
+from results import ClassifyResult
+
+DEFAULT_CONFIG = os.path.join("models", "cascade.json")
+
+
+def confidence_margin(probs):
+    """(N, C) 概率 -> (top-1 置信度, top-1 与 top-2 之差)"""
+    if probs.shape[1] < 2:
+        top1 = probs[:, 0]
+        return top1, top1
+    top2 = np.partition(probs, -2, axis=1)[:, -2:]
+    return top2[:, 1], top2[:, 1] - top2[:, 0]
+
+
+def needs_escalation(probs, min_conf, min_margin):
+    """需要交给精确模型的图片掩码"""
+    conf, margin = confidence_margin(probs)
+    return (conf < min_conf) | (margin < min_margin)
+
+
+def align_probs(probs, src_names, dst_names):
+    """按类别名称把 src 模型的概率映射到 dst 模型的类别顺序 (缺失类别为 0)"""
+    dst_index = {str(name).lstrip('_'): i for i, name in dst_names.items()}
+    out = np.zeros((len(probs), len(dst_names)), dtype=np.float32)
+    for i, name in src_names.items():
+        j = dst_index.get(str(name).lstrip('_'))
+        if j is not None:
+            out[:, j] = probs[:, i]
+    return out
+
+
+def _resolve(config_path, path):
+    """配置中的相对路径以配置文件所在目录为基准"""
+    if os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(config_path)), path))
+
+
+def read_config(config_path, path_keys=("fast", "accurate")):
+    """读取 .json 配置，path_keys 对应的模型路径解析为绝对路径"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    for key in path_keys:
+        config[key] = _resolve(config_path, config[key])
+    return config
+
+
+class CascadeClassifier:
+    """快速模型 + 精确模型级联，接口与 OnnxClassifier 一致"""
+    task = "classify"
+    backend = "cascade"
+
+    def __init__(self, fast, accurate, min_conf=0.5, min_margin=0.0):
+        self.fast = fast
+        self.accurate = accurate
+        self.min_conf = min_conf
+        self.min_margin = min_margin
+        self.names = accurate.names
+        self.imgsz = getattr(fast, "imgsz", None)
+        self.fast_decode = getattr(fast, "fast_decode", False)
+        self.total = 0
+        self.escalated = 0
+        # 两个模型类别顺序一致时无需对齐
+        self._aligned = dict(fast.names) == dict(accurate.names)
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / self.total if self.total else 0.0
+
+    def predict_probs(self, sources):
+        sources = list(sources)
+        if not sources:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+
+        probs = predict_probs(self.fast, sources)
+        if not self._aligned:
+            probs = align_probs(probs, self.fast.names, self.names)
+        else:
+            probs = np.array(probs, dtype=np.float32)
+
+        mask = needs_escalation(probs, self.min_conf, self.min_margin)
+        hard = np.flatnonzero(mask)
+        if len(hard):
+            probs[hard] = predict_probs(self.accurate, [sources[i] for i in hard])
+
+        self.total += len(sources)
+        self.escalated += len(hard)
+        return probs
+
+    def embed(self, sources):
+        """特征向量取自精确模型"""
+        return embed(self.accurate, sources)
+
+    def __call__(self, source, **kwargs):
+        sources = list(source) if isinstance(source, (list, tuple)) else [source]
+        probs = self.predict_probs(sources)
+        return [
+            ClassifyResult(p, self.names, src if isinstance(src, (str, os.PathLike)) else None)
+            for p, src in zip(probs, sources)
+        ]
+
+
+def load_cascade(config_path, prefer_onnxruntime=True, **kwargs):
+    """根据标定好的配置文件创建级联模型"""
+    config = read_config(config_path)
+    fast = load_model(config["fast"], prefer_onnxruntime, **kwargs)
+    accurate = load_model(config["accurate"], prefer_onnxruntime, **kwargs)
+    return CascadeClassifier(fast, accurate, config.get("min_conf", 0.5), config.get("min_margin", 0.0))
@@ -0,0 +1,220 @@
+"""
+embedding_index.py
+-------------------
+相似文物检索：特征向量最近邻索引
+
+    - 每个已编目文物的每张视角图 (main / angle_N) 提取一条特征向量
+    - 向量 L2 归一化后以 float16 矩阵存储，距离为 1 - 余弦相似度
+    - 默认精确检索 (分块矩阵乘法)；数据量很大时可选 faiss IVF-PQ 近似检索
+    - 同一文物的多张视角只返回距离最近的一张
+    - 开集判断：最近邻距离超过 open_set_distance (建库时由同文物视角间距离估计)
+      视为库中没有的文物
+
+目录结构 (默认 models/embedding_index/)：
+    vectors.npy   (N, D) float16
+    items.json    [{"id": ..., "path": ...}, ...]
+    meta.json     模型哈希、维度、检索模式、开集阈值等
+    ivfpq.faiss   仅 ivfpq 模式
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from model_backend import embed
+
+DEFAULT_INDEX_DIR = os.path.join("models", "embedding_index")
+INDEX_MODES = ("exact", "ivfpq")
+SEARCH_CHUNK = 65536      # 精确检索时每次升精度到 float32 的行数
+CANDIDATE_FACTOR = 16     # 多取候选，按文物去重后仍能凑够 k 个
+OPEN_SET_PERCENTILE = 95
+
+
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _pq_subvectors(dim, limit=64):
+    """PQ 子向量个数须整除维度"""
+    for m in range(min(limit, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def estimate_open_set_distance(vectors, ids, percentile=OPEN_SET_PERCENTILE):
+    """同一文物不同视角之间最近距离的分位数，作为"库中已有"的距离上限"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    groups = {}
+    for i, item_id in enumerate(ids):
+        groups.setdefault(item_id, []).append(i)
+
+    nearest = []
+    for rows in groups.values():
+        if len(rows) < 2:
+            continue
+        sims = vectors[rows] @ vectors[rows].T
+        np.fill_diagonal(sims, -np.inf)
+        nearest.extend(1.0 - sims.max(axis=1))
+    if not nearest:
+        return None
+    return float(np.percentile(nearest, percentile))
+
+
+class EmbeddingIndex:
+    """已编目文物视角图的特征向量索引"""
+    def __init__(self, vectors, items, meta=None):
+        self.vectors = vectors
+        self.items = items
+        self.meta = dict(meta or {})
+        self.meta.setdefault("mode", "exact")
+        self._faiss = None
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1] if len(self.vectors) else self.meta.get("dim", 0)
+
+    @property
+    def open_set_distance(self):
+        return self.meta.get("open_set_distance")
+
+    @classmethod
+    def build(cls, vectors, items, mode="exact", **meta):
+        """由原始特征向量建立索引 (items 与向量一一对应)"""
+        if mode not in INDEX_MODES:
+            raise ValueError(f"不支持的检索模式: {mode} (可选 {', '.join(INDEX_MODES)})")
+        normalized = l2_normalize(vectors)
+        meta.update(
+            mode=mode,
+            dim=int(normalized.shape[1]),
+            count=len(items),
+            built_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            open_set_distance=estimate_open_set_distance(normalized, [it["id"] for it in items]),
+        )
+        index = cls(normalized.astype(np.float16), items, meta)
+        if mode == "ivfpq":
+            index._faiss = index._train_ivfpq(normalized)
+        return index
+
+    def _train_ivfpq(self, normalized):
+        try:
+            import faiss
+        except ImportError:
+            raise ImportError("ivfpq 模式需要安装 faiss: pip install faiss-cpu")
+        n, dim = normalized.shape
+        # 每个聚类中心至少约 39 条训练样本 (faiss 的建议下限)
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subvectors(dim), 8, faiss.METRIC_INNER_PRODUCT)
+        index.train(normalized)
+        index.add(normalized)
+        index.nprobe = min(16, nlist)
+        self.meta.update(nlist=nlist, nprobe=index.nprobe)
+        return index
+
+    def save(self, index_dir=DEFAULT_INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "vectors.npy"), self.vectors)
+        with open(os.path.join(index_dir, "items.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.items, f, ensure_ascii=False)
+        with open(os.path.join(index_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        if self._faiss is not None:
+            import faiss
+            faiss.write_index(self._faiss, os.path.join(index_dir, "ivfpq.faiss"))
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR):
+        """加载索引；向量矩阵以内存映射方式打开，不一次性读入内存"""
+        vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode='r')
+        with open(os.path.join(index_dir, "items.json"), 'r', encoding='utf-8') as f:
+            items = json.load(f)
+        with open(os.path.join(index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        index = cls(vectors, items, meta)
+        faiss_path = os.path.join(index_dir, "ivfpq.faiss")
+        if meta["mode"] == "ivfpq" and os.path.exists(faiss_path):
+            try:
+                import faiss
+                index._faiss = faiss.read_index(faiss_path)
+                index._faiss.nprobe = meta.get("nprobe", 16)
+            except ImportError:
+                # 没有 faiss 时退回精确检索，结果只会更准
+                index.meta["mode"] = "exact"
+        else:
+            index.meta["mode"] = "exact"
+        return index
+
+    def _search_exact(self, queries, n):
+        """分块计算余弦相似度，返回 (sims, rows)，均按相似度降序"""
+        best_sims = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.vectors), SEARCH_CHUNK):
+            chunk = np.asarray(self.vectors[start:start + SEARCH_CHUNK], dtype=np.float32)
+            sims = queries @ chunk.T
+            take = min(n, sims.shape[1])
+            part = np.argpartition(-sims, take - 1, axis=1)[:, :take]
+            best_sims = np.concatenate([best_sims, np.take_along_axis(sims, part, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+            if best_sims.shape[1] > n:
+                keep = np.argpartition(-best_sims, n - 1, axis=1)[:, :n]
+                best_sims = np.take_along_axis(best_sims, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(-best_sims, axis=1)
+        return np.take_along_axis(best_sims, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    def search(self, vectors, k=5):
+        """原始特征向量 -> 每条查询的 k 个最相似文物
+
+        返回 [[{"id", "path", "distance"}, ...], ...]，同一文物只保留最近的视角。
+        """
+        if not len(self.items):
+            return [[] for _ in range(len(vectors))]
+        queries = l2_normalize(vectors)
+        n = min(len(self.items), k * CANDIDATE_FACTOR)
+        if self._faiss is not None:
+            sims, rows = self._faiss.search(queries, n)
+        else:
+            sims, rows = self._search_exact(queries, n)
+
+        results = []
+        for sim_row, idx_row in zip(sims, rows):
+            hits, seen = [], set()
+            for sim, row in zip(sim_row, idx_row):
+                if row < 0:
+                    continue
+                item = self.items[row]
+                if item["id"] in seen:
+                    continue
+                seen.add(item["id"])
+                hits.append({"id": item["id"], "path": item["path"], "distance": round(1.0 - float(sim), 5)})
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+    def is_unknown(self, hits):
+        """最近邻距离超过开集阈值 -> 可能是库中没有的文物"""
+        threshold = self.open_set_distance
+        return bool(hits) and threshold is not None and hits[0]["distance"] > threshold
+
+    def query(self, model, source, k=5):
+        """单张图片查询 (GUI / 命令行共用)，附带特征提取与检索耗时"""
+        t0 = time.perf_counter()
+        vector = embed(model, [source])
+        t1 = time.perf_counter()
+        hits = self.search(vector, k)[0]
+        t2 = time.perf_counter()
+        return {
+            "hits": hits,
+            "unknown": self.is_unknown(hits),
+            "embed_ms": (t1 - t0) * 1000,
+            "search_ms": (t2 - t1) * 1000,
+        }
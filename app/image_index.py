@@ -0,0 +1,163 @@
+"""
+image_index.py
+---------------
+图片队列索引与后台目录扫描
+
+    - ImageIndex: 保持插入顺序的去重列表，成员判断与定位均为 O(1)
+    - FolderScanner: 后台线程用 os.scandir 递归扫描目录，按块放入 chunks 队列，
+      GUI 通过 root.after 定时取出，大目录也不会阻塞主线程
+    - collect_val_images / load_id_mapping: 验证集目录与 ShortID -> 名称映射的读取 (脚本与服务共用)
+"""
+
+import json
+import os
+import queue
+import threading
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.gif')
+
+
+def _key(path):
+    """同一文件的不同写法 (相对路径、大小写) 视为同一项"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_image_file(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def collect_val_images(val_dir):
+    """<val>/<类别>/<图片> 目录 -> [(路径, 类别名)]"""
+    samples = []
+    for class_name in sorted(os.listdir(val_dir)):
+        class_dir = os.path.join(val_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for name in sorted(os.listdir(class_dir)):
+            if is_image_file(name):
+                samples.append((os.path.join(class_dir, name), class_name))
+    return samples
+
+
+def load_id_mapping(project_root):
+    """读取 datasets/id_to_name.json (ShortID -> 文物名称)，不存在时返回空字典"""
+    mapping_path = os.path.join(project_root, "datasets", "id_to_name.json")
+    if os.path.exists(mapping_path):
+        with open(mapping_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+class ImageIndex:
+    """有序去重的图片路径列表"""
+    def __init__(self, paths=()):
+        self._paths = []
+        self._positions = {}
+        self.extend(paths)
+
+    def add(self, path):
+        """添加图片，已存在时返回 False"""
+        key = _key(path)
+        if key in self._positions:
+            return False
+        self._positions[key] = len(self._paths)
+        self._paths.append(path)
+        return True
+
+    def extend(self, paths):
+        """批量添加，返回实际新增的路径列表"""
+        return [p for p in paths if self.add(p)]
+
+    def index(self, path):
+        """路径在队列中的位置，不存在时返回 -1"""
+        return self._positions.get(_key(path), -1)
+
+    def clear(self):
+        self._paths.clear()
+        self._positions.clear()
+
+    def __contains__(self, path):
+        return _key(path) in self._positions
+
+    def __getitem__(self, i):
+        return self._paths[i]
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+
+def scan_images(root, recursive=True):
+    """用 os.scandir 遍历目录下的图片 (每个目录内按文件名排序)"""
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_file() and is_image_file(entry.name):
+                    yield entry.path
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+        # 逆序入栈，保证子目录按名称顺序遍历
+        stack.extend(reversed(subdirs))
+
+
+class FolderScanner:
+    """后台扫描文件与目录，结果按块放入 chunks 队列
+
+    chunks 中每一项是路径列表；扫描结束后 finished 为 True。
+    """
+    def __init__(self, sources, chunk_size=500, recursive=True):
+        self.sources = list(sources)
+        self.chunk_size = chunk_size
+        self.recursive = recursive
+        self.found = 0
+        self.chunks = queue.Queue()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def _run(self):
+        chunk = []
+        try:
+            for path in self._iter_sources():
+                if self._cancelled.is_set():
+                    return
+                chunk.append(path)
+                if len(chunk) >= self.chunk_size:
+                    self._emit(chunk)
+                    chunk = []
+            if chunk:
+                self._emit(chunk)
+        finally:
+            self._finished.set()
+
+    def _emit(self, chunk):
+        self.found += len(chunk)
+        self.chunks.put(chunk)
+
+    def _iter_sources(self):
+        for source in self.sources:
+            if os.path.isdir(source):
+                yield from scan_images(source, self.recursive)
+            elif os.path.isfile(source) and is_image_file(source):
+                yield source
@@ -8,22 +8,40 @@ inference_gui.py
     - 模型下拉快速选择
     - 拖放图片支持
     - 批量识别
+    - 多视角融合识别
+    - 相似文物检索 (特征向量最近邻)
     - 快捷键支持
 """
 
+import json
 import os
+import queue
 import threading
+from collections import deque
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from PIL import Image, ImageTk
+import tkinter.font as tkfont
+from PIL import ImageTk
 import glob
 
-# Attempt to import Ultralytics YOLO
-try:
-    from ultralytics import YOLO
-except ImportError:
-    messagebox.showerror("Error", "Please install ultralytics: pip install ultralytics")
-    exit()
+# 进程启动时刻，用于统计冷启动各阶段耗时
+_PROCESS_START = time.perf_counter()
+
+# ONNX 模型走轻量级 onnxruntime 后端，ultralytics 仅在加载 .pt 时导入；
+# 推理库本身在后台线程中按需导入，窗口无需等待
+from model_backend import load_model, backend_name, preload_backend, warmup
+from batch_pipeline import BatchPipeline
+from inference_scheduler import LatestWinsScheduler
+from prefetch import Prefetcher
+from preprocess import DEFAULT_IMGSZ
+from multiview import FUSION_METHODS, classify_folder
+from model_pool import ModelPool, load_registry, save_registry, side_by_side
+from image_index import FolderScanner, ImageIndex, load_id_mapping
+from result_export import ResultExporter
+from embedding_index import DEFAULT_INDEX_DIR, EmbeddingIndex
+from perf_stats import STAGES, STATS
+from prediction_cache import CachedPredictor, PredictionCache, model_digest
 
 # 尝试导入拖放支持
 try:
@@ -33,6 +51,10 @@ except ImportError:
     DND_AVAILABLE = False
 
 
+# 批量识别窗口最多显示的行数，完整结果请使用导出
+MAX_BATCH_ROWS = 1000
+
+
 # ==================== 现代化主题配置 ====================
 class ModernTheme:
     # 主色调
@@ -113,6 +135,163 @@ class ScrollableFrame(ttk.Frame):
         # 简单的鼠标滚轮滚动
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
+
+class ResultRow(tk.Frame):
+    """识别结果卡片：控件只创建一次，每次识别只更新文字与颜色"""
+    RANK_COLORS = [ModernTheme.PRIMARY, "#8B5CF6", "#EC4899", ModernTheme.TEXT_SECONDARY, ModernTheme.TEXT_MUTED]
+
+    def __init__(self, container, rank):
+        super().__init__(container, bg=ModernTheme.BG_DARK, pady=8, padx=8)
+        
+        # 排名
+        tk.Label(
+            self,
+            text=f"#{rank + 1}",
+            font=("Microsoft YaHei UI", 11, "bold"),
+            bg=ModernTheme.BG_DARK,
+            fg=self.RANK_COLORS[rank % len(self.RANK_COLORS)],
+            width=3
+        ).pack(side=tk.LEFT)
+        
+        # 信息区
+        info = tk.Frame(self, bg=ModernTheme.BG_DARK)
+        info.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(8, 0))
+        
+        self.name_label = tk.Label(
+            info,
+            font=ModernTheme.FONT_BODY,
+            bg=ModernTheme.BG_DARK,
+            fg=ModernTheme.TEXT_PRIMARY,
+            anchor="w",
+            wraplength=400,  # 允许更长的换行
+            justify="left"
+        )
+        self.name_label.pack(fill=tk.X)
+        
+        self.id_label = tk.Label(
+            info,
+            font=ModernTheme.FONT_SMALL,
+            bg=ModernTheme.BG_DARK,
+            fg=ModernTheme.TEXT_MUTED,
+            anchor="w"
+        )
+        self._id_visible = False
+        
+        # 置信度
+        self.conf_label = tk.Label(
+            self,
+            font=("Microsoft YaHei UI", 11, "bold"),
+            bg=ModernTheme.BG_DARK
+        )
+        self.conf_label.pack(side=tk.RIGHT)
+
+    def set(self, real_name, clean_id, conf_pct, show_id):
+        """原地更新内容，只在 ID 行显隐变化时才重新布局"""
+        self.name_label.config(text=real_name)
+        if show_id:
+            self.id_label.config(text=f"ID: {clean_id}")
+        if show_id != self._id_visible:
+            if show_id:
+                self.id_label.pack(fill=tk.X)
+            else:
+                self.id_label.pack_forget()
+            self._id_visible = show_id
+        
+        conf_color = ModernTheme.SUCCESS if conf_pct >= 70 else (ModernTheme.WARNING if conf_pct >= 40 else ModernTheme.TEXT_MUTED)
+        self.conf_label.config(text=f"{conf_pct:.1f}%", fg=conf_color)
+
+
+class VirtualListbox(tk.Frame):
+    """虚拟列表：只渲染可见的几十行，数据量再大内存与重绘开销也保持不变
+
+    items 为支持 len() 与下标访问的序列；选中某行时调用 on_select(index)。
+    """
+    def __init__(self, container, items, formatter=os.path.basename, on_select=None, **listbox_kwargs):
+        super().__init__(container, bg=listbox_kwargs.get("bg", ModernTheme.BG_DARK))
+        self.items = items
+        self.formatter = formatter
+        self.on_select = on_select
+        self.top = 0
+        self.selected = -1
+        
+        self.listbox = tk.Listbox(self, exportselection=False, **listbox_kwargs)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        font = tkfont.Font(font=self.listbox.cget("font"))
+        self._row_height = font.metrics("linespace") + 1 + 2 * int(self.listbox.cget("selectborderwidth"))
+        
+        self.listbox.bind("<Configure>", lambda e: self.refresh())
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda e: self._scroll(-3))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll(3))
+
+    def _visible_rows(self):
+        border = 2 * (int(self.listbox.cget("highlightthickness")) + int(self.listbox.cget("borderwidth")))
+        return max(1, (self.listbox.winfo_height() - border) // self._row_height)
+
+    def refresh(self):
+        """数据或尺寸变化后重绘可见行"""
+        rows = self._visible_rows()
+        total = len(self.items)
+        self.top = max(0, min(self.top, total - rows))
+        end = min(total, self.top + rows)
+        
+        self.listbox.delete(0, tk.END)
+        if end > self.top:
+            self.listbox.insert(tk.END, *[self.formatter(self.items[i]) for i in range(self.top, end)])
+        if self.top <= self.selected < end:
+            self.listbox.selection_set(self.selected - self.top)
+        
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def select(self, index):
+        """选中并滚动到指定行 (不触发 on_select)"""
+        self.selected = index
+        rows = self._visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self.refresh()
+
+    def clear(self):
+        self.top = 0
+        self.selected = -1
+        self.refresh()
+
+    def _scroll(self, delta):
+        self.top += delta
+        self.refresh()
+        return "break"
+
+    def _yview(self, *args):
+        total = len(self.items)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+            self.refresh()
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self._scroll(step * self._visible_rows() if args[2] == "pages" else step)
+
+    def _on_mousewheel(self, event):
+        return self._scroll(int(-3 * (event.delta / 120)))
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        index = self.top + selection[0]
+        if index != self.selected:
+            self.selected = index
+            if self.on_select is not None:
+                self.on_select(index)
+
 class InferenceApp:
     def __init__(self, root):
         self.root = root
@@ -128,20 +307,56 @@ class InferenceApp:
         # 状态变量
         self.model = None
         self.image_path = None
-        self.image_list = []
+        self.image_list = ImageIndex()
+        self._scanners = []
+        self._scan_polling = False
         self.current_index = 0
         self.auto_recognize = tk.BooleanVar(value=True)
+        self.fusion_method = tk.StringVar(value="mean")
+        self.batch_export = tk.BooleanVar(value=False)
         self.id_to_name = self._load_id_mapping()
-        self.available_models = self._scan_models()
+        self.available_models = {}
+        
+        # 冷启动阶段耗时 (秒，相对进程启动)，首个模型加载完成后写入 runs/startup_timings.jsonl
+        self.startup_timings = {"imports": time.perf_counter() - _PROCESS_START}
+        self._startup_logged = False
+        
+        # 识别结果缓存：同一图片 + 同一模型再次识别时直接返回
+        self.prediction_cache = PredictionCache(
+            os.path.join(self.project_root, "runs", "cache", "predictions.sqlite3")
+        )
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        
+        # 常驻推理线程，切换图片时只保留最新请求
+        self.scheduler = LatestWinsScheduler(self._on_scheduled_result)
+        
+        # 预取前后图片：一次解码同时得到预览图和模型输入
+        self.prefetcher = Prefetcher(radius=3)
+        self.prefetcher.on_loaded = self._on_prefetched
+        self.precompute_neighbours = tk.BooleanVar(value=False)
+        self._precompute = False
+        
+        # 常驻模型池：切换模型不再重复加载，收藏的模型后台预加载
+        self.model_pool = ModelPool(self._build_model, max_models=3)
+        self.registry_path = os.path.join(self.project_root, "models", "model_registry.json")
+        self.registry = load_registry(self.registry_path)
+        self.model_path = None
+        self._wanted_model_path = None
+        self.compare_var = tk.StringVar()
+        
+        # 相似文物检索索引，首次检索时在推理线程中加载
+        self.embedding_index = None
+        self.index_dir = os.path.join(self.project_root, DEFAULT_INDEX_DIR)
         
         self._apply_theme()
         self._create_widgets()
         self._bind_shortcuts()
         self._setup_drag_drop()
         
-        # 自动加载首选模型
-        if self.available_models:
-            self._auto_load_first_model()
+        # 窗口先显示，模型扫描与加载放到后台
+        self.root.after_idle(self._mark_startup, "window_visible")
+        self.model_info_label.config(text="正在扫描模型...")
+        threading.Thread(target=self._scan_models_task, daemon=True).start()
     
     def _apply_theme(self):
         """应用现代化主题样式"""
@@ -219,12 +434,7 @@ class InferenceApp:
     def _load_id_mapping(self):
         """加载ID到名称的映射"""
         try:
-            import json
-            mapping_path = os.path.join(self.project_root, "datasets", "id_to_name.json")
-            if os.path.exists(mapping_path):
-                with open(mapping_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {}
+            return load_id_mapping(self.project_root)
         except Exception:
             return {}
 
@@ -236,6 +446,10 @@ class InferenceApp:
             os.path.join(self.project_root, "*.onnx"),
             os.path.join(self.project_root, "models", "*.pt"),
             os.path.join(self.project_root, "models", "*.onnx"),
+            # 快慢模型级联配置 (scripts/calibrate_cascade.py 生成)
+            os.path.join(self.project_root, "models", "cascade*.json"),
+            # 定位 + 裁剪分类配置 (scripts/train_localizer.py 生成)
+            os.path.join(self.project_root, "models", "roi*.json"),
             os.path.join(self.project_root, "runs", "**", "*.pt"),
             os.path.join(self.project_root, "runs", "**", "*.onnx"),
         ]
@@ -317,6 +531,10 @@ class InferenceApp:
         )
         self.model_status.pack(side=tk.LEFT, padx=(8, 0))
         
+        self.favourite_btn = ttk.Button(model_frame, text="☆", width=3, style="Secondary.TButton",
+                                        command=self._toggle_favourite)
+        self.favourite_btn.pack(side=tk.LEFT, padx=(8, 0))
+        
         # ==================== 主内容区域 ====================
         main_container = tk.Frame(self.root, bg=ModernTheme.BG_DARK)
         main_container.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
@@ -329,8 +547,10 @@ class InferenceApp:
         list_container = tk.Frame(left_panel, bg=ModernTheme.BG_CARD)
         list_container.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
         
-        self.image_listbox = tk.Listbox(
+        self.image_listbox = VirtualListbox(
             list_container,
+            self.image_list,
+            on_select=self._on_image_selected,
             bg=ModernTheme.BG_DARK,
             fg=ModernTheme.TEXT_PRIMARY,
             selectbackground=ModernTheme.PRIMARY,
@@ -342,16 +562,7 @@ class InferenceApp:
             highlightcolor=ModernTheme.PRIMARY,
             activestyle='none'
         )
-        self.image_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.image_listbox.bind("<<ListboxSelect>>", self._on_image_selected)
-        
-        scrollbar = ttk.Scrollbar(
-            list_container,
-            orient="vertical",
-            command=self.image_listbox.yview
-        )
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.image_listbox.config(yscrollcommand=scrollbar.set)
+        self.image_listbox.pack(fill=tk.BOTH, expand=True)
         
         # 图片操作按钮
         btn_frame = tk.Frame(left_panel, bg=ModernTheme.BG_CARD)
@@ -375,6 +586,21 @@ class InferenceApp:
             style="TCheckbutton"
         ).pack(side=tk.LEFT)
         
+        ttk.Checkbutton(
+            auto_frame,
+            text="预识别邻近",
+            variable=self.precompute_neighbours,
+            command=self._on_precompute_toggled,
+            style="TCheckbutton"
+        ).pack(side=tk.LEFT, padx=(8, 0))
+        
+        ttk.Checkbutton(
+            auto_frame,
+            text="批量导出",
+            variable=self.batch_export,
+            style="TCheckbutton"
+        ).pack(side=tk.LEFT, padx=(8, 0))
+        
         # 中间面板 - 图片预览
         center_panel = self._create_card(main_container, "🖼️ 图片预览")
         center_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
@@ -445,6 +671,29 @@ class InferenceApp:
                   command=self._run_inference).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(action_frame, text="📊 批量识别", style="Secondary.TButton",
                   command=self._batch_inference).pack(side=tk.LEFT)
+        ttk.Combobox(action_frame, textvariable=self.fusion_method, values=FUSION_METHODS,
+                     state="readonly", width=8).pack(side=tk.RIGHT)
+        ttk.Button(action_frame, text="🧩 多视角融合", style="Secondary.TButton",
+                  command=self._run_fusion).pack(side=tk.RIGHT, padx=(0, 5))
+        
+        # 双模型对比
+        compare_frame = tk.Frame(center_panel, bg=ModernTheme.BG_CARD)
+        compare_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        tk.Label(
+            compare_frame,
+            text="对比模型",
+            font=ModernTheme.FONT_SMALL,
+            bg=ModernTheme.BG_CARD,
+            fg=ModernTheme.TEXT_MUTED
+        ).pack(side=tk.LEFT, padx=(0, 8))
+        self.compare_combo = ttk.Combobox(compare_frame, textvariable=self.compare_var,
+                                          state="readonly", width=25)
+        self.compare_combo.pack(side=tk.LEFT)
+        ttk.Button(compare_frame, text="⚖️ 对比识别", style="Secondary.TButton",
+                  command=self._run_compare).pack(side=tk.RIGHT)
+        ttk.Button(compare_frame, text="🔎 相似文物", style="Secondary.TButton",
+                  command=self._run_similar).pack(side=tk.RIGHT, padx=(0, 5))
         
         # 右侧面板 - 识别结果
         right_panel = self._create_card(main_container, "📋 识别结果", width=350)
@@ -468,8 +717,11 @@ class InferenceApp:
         )
         self.result_placeholder.pack(pady=50)
         
-        # 结果列表容器
+        # 结果列表容器：预先创建 Top-5 卡片，识别时原地更新
         self.result_list_frame = tk.Frame(self.result_container, bg=ModernTheme.BG_CARD)
+        self.result_rows = [ResultRow(self.result_list_frame, i) for i in range(5)]
+        for row in self.result_rows:
+            row.pack(fill=tk.X, pady=3)
         
         # ==================== 底部状态栏 ====================
         footer = tk.Frame(self.root, bg=ModernTheme.BG_CARD, height=35)
@@ -478,7 +730,7 @@ class InferenceApp:
         
         self.status_label = tk.Label(
             footer,
-            text="就绪 | 快捷键: Ctrl+O 添加图片, Ctrl+R 识别, ←→ 切换图片",
+            text="就绪 | 快捷键: Ctrl+O 添加图片, Ctrl+R 识别, ←→ 切换图片, Ctrl+P 性能面板",
             font=ModernTheme.FONT_SMALL,
             bg=ModernTheme.BG_CARD,
             fg=ModernTheme.TEXT_MUTED,
@@ -495,6 +747,21 @@ class InferenceApp:
             anchor="e"
         )
         self.model_info_label.pack(side=tk.RIGHT, padx=15, pady=8)
+        
+        self.perf_window = None
+        tk.Button(
+            footer,
+            text="📈 性能",
+            font=ModernTheme.FONT_SMALL,
+            bg=ModernTheme.BG_CARD,
+            fg=ModernTheme.TEXT_SECONDARY,
+            activebackground=ModernTheme.BG_HOVER,
+            activeforeground=ModernTheme.TEXT_PRIMARY,
+            relief="flat",
+            borderwidth=0,
+            cursor="hand2",
+            command=self._toggle_perf_panel
+        ).pack(side=tk.RIGHT, padx=(0, 5))
 
     def _create_card(self, parent, title, width=None):
         """创建卡片式容器"""
@@ -523,6 +790,8 @@ class InferenceApp:
         self.root.bind("<Control-O>", lambda e: self._add_images())
         self.root.bind("<Control-r>", lambda e: self._run_inference())
         self.root.bind("<Control-R>", lambda e: self._run_inference())
+        self.root.bind("<Control-p>", lambda e: self._toggle_perf_panel())
+        self.root.bind("<Control-P>", lambda e: self._toggle_perf_panel())
         self.root.bind("<Left>", lambda e: self._prev_image())
         self.root.bind("<Right>", lambda e: self._next_image())
 
@@ -535,29 +804,92 @@ class InferenceApp:
     def _on_drop(self, event):
         """处理拖放事件"""
         files = self.root.tk.splitlist(event.data)
-        image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.gif')
-        
-        added = 0
-        for f in files:
-            if os.path.isfile(f) and f.lower().endswith(image_extensions):
-                if f not in self.image_list:
-                    self.image_list.append(f)
-                    self.image_listbox.insert(tk.END, os.path.basename(f))
-                    added += 1
-            elif os.path.isdir(f):
-                for ext in image_extensions:
-                    for img in glob.glob(os.path.join(f, f"*{ext}")):
-                        if img not in self.image_list:
-                            self.image_list.append(img)
-                            self.image_listbox.insert(tk.END, os.path.basename(img))
-                            added += 1
+        self._start_scan(files)
+
+    def _start_scan(self, sources):
+        """后台递归扫描文件 / 目录，结果分块追加到图片队列"""
+        scanner = FolderScanner(sources)
+        scanner.start()
+        self._scanners.append(scanner)
+        if not self._scan_polling:
+            self._scan_polling = True
+            self._update_status("正在扫描图片...")
+            self.root.after(50, self._poll_scanners)
+
+    def _poll_scanners(self):
+        """定时取出扫描结果 (主线程)"""
+        for scanner in list(self._scanners):
+            done = scanner.finished
+            while True:
+                try:
+                    self._append_images(scanner.chunks.get_nowait())
+                except queue.Empty:
+                    break
+            if done:
+                self._scanners.remove(scanner)
         
-        if added > 0:
-            self._update_nav_label()
-            self._update_status(f"已添加 {added} 张图片")
-            if self.image_list and self.current_index == 0:
-                self.image_listbox.selection_set(0)
-                self._display_current_image()
+        if self._scanners:
+            self._update_status(f"正在扫描图片... 已添加 {len(self.image_list)} 张")
+            self.root.after(50, self._poll_scanners)
+        else:
+            self._scan_polling = False
+            self._update_status(f"图片队列共 {len(self.image_list)} 张")
+
+    def _append_images(self, paths):
+        """追加图片 (自动去重)；队列由空变为非空时显示第一张"""
+        was_empty = len(self.image_list) == 0
+        added = self.image_list.extend(paths)
+        if not added:
+            return 0
+        self.image_listbox.refresh()
+        self._update_nav_label()
+        if was_empty:
+            self.current_index = 0
+            self.image_listbox.select(0)
+            self._display_current_image()
+            if self.auto_recognize.get() and self.model:
+                self._run_inference()
+        return len(added)
+
+    def _mark_startup(self, phase):
+        """记录启动阶段完成时刻"""
+        self.startup_timings.setdefault(phase, time.perf_counter() - _PROCESS_START)
+
+    def _scan_models_task(self):
+        """后台扫描模型目录"""
+        models = self._scan_models()
+        self.root.after(0, self._on_models_scanned, models)
+
+    def _on_models_scanned(self, models):
+        """模型扫描完成回调：填充下拉框并自动加载首选模型"""
+        self._mark_startup("models_scanned")
+        self.available_models = models
+        self.model_combo.config(values=list(models.keys()))
+        self.compare_combo.config(values=list(models.keys()))
+        if models:
+            self._auto_load_first_model()
+            # 收藏的模型在首选模型之后排队预加载
+            favourites = [models[name] for name in self.registry["favourites"] if name in models]
+            self.model_pool.preload(favourites)
+        else:
+            self.model_info_label.config(text="未找到模型")
+
+    def _log_startup(self, path):
+        """追加一条冷启动耗时记录"""
+        self._startup_logged = True
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "model": os.path.basename(path),
+            "backend": backend_name(self.model),
+            "phases": {k: round(v, 3) for k, v in self.startup_timings.items()},
+        }
+        log_path = os.path.join(self.project_root, "runs", "startup_timings.jsonl")
+        try:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
 
     def _auto_load_first_model(self):
         """自动加载首选模型"""
@@ -587,49 +919,122 @@ class InferenceApp:
             self._load_model_from_path(path)
 
     def _load_model_from_path(self, path):
-        """异步加载模型"""
+        """切换模型：常驻模型立即生效，否则异步加载"""
+        self._wanted_model_path = path
+        model = self.model_pool.get(path)
+        if model is not None:
+            self._on_model_loaded(model, path, None, resident=True)
+            return
+        
         self.model_status.config(fg=ModernTheme.WARNING)
         self.model_info_label.config(text=f"正在加载模型: {os.path.basename(path)}...")
         self._update_status("正在加载模型，请稍候...")
         self.model_combo.config(state="disabled")
-        self.root.update()
         
         # 启动后台线程加载模型
         threading.Thread(target=self._load_model_task, args=(path,), daemon=True).start()
 
+    def _build_model(self, path):
+        """加载并预热模型 (模型池的加载函数，在后台线程调用)"""
+        t0 = time.perf_counter()
+        preload_backend(path)
+        t1 = time.perf_counter()
+        model = load_model(path, fast_decode=True, decode_workers=4)
+        t2 = time.perf_counter()
+        # 空白 batch 预热，首次识别不再承担会话初始化开销 (不经过缓存)
+        warmup(model, imgsz=getattr(model, "imgsz", 224) or 224)
+        t3 = time.perf_counter()
+        # 模型内容哈希作为缓存键的一部分，模型变化时缓存自动失效
+        model = CachedPredictor(model, self.prediction_cache, model_digest(path))
+        model.load_timings = {"ml_import": t1 - t0, "model_load": t2 - t1, "warmup": t3 - t2}
+        return model
+
     def _load_model_task(self, path):
         """后台加载模型任务"""
         try:
-            if path.endswith('.onnx'):
-                model = YOLO(path, task='classify')
-            else:
-                model = YOLO(path)
+            model = self.model_pool.load(path)
             # 加载完成，在主线程更新UI
             self.root.after(0, self._on_model_loaded, model, path, None)
         except Exception as e:
             # 加载失败，在主线程显示错误
             self.root.after(0, self._on_model_loaded, None, path, str(e))
 
-    def _on_model_loaded(self, model, path, error):
+    def _on_model_loaded(self, model, path, error, resident=False):
         """模型加载回调"""
+        if path != self._wanted_model_path:
+            # 加载期间用户已切换到其他模型；结果仍留在模型池中
+            return
         self.model_combo.config(state="readonly")
         
         if model:
             self.model = model
+            self.model_path = path
+            # 预取的模型输入与当前模型的输入尺寸保持一致
+            self.prefetcher.set_imgsz(getattr(model, "imgsz", None) or DEFAULT_IMGSZ)
+            if self.image_list and self.current_index >= 0:
+                self.prefetcher.schedule(self.image_list, self.current_index)
             self.model_status.config(fg=ModernTheme.SUCCESS)
-            self.model_info_label.config(text=f"模型: {os.path.basename(path)}")
-            self._update_status("模型加载成功")
+            self.model_info_label.config(text=f"模型: {os.path.basename(path)} ({backend_name(model)})")
+            self._update_favourite_button()
+            timings = model.load_timings
+            if resident:
+                self._update_status(f"已切换到常驻模型 (常驻 {len(self.model_pool.resident())} 个)")
+            else:
+                self._update_status(
+                    f"模型加载成功 (导入 {timings['ml_import']:.2f}s / 加载 {timings['model_load']:.2f}s / "
+                    f"预热 {timings['warmup']:.2f}s)"
+                )
+            if not self._startup_logged:
+                self.startup_timings.update({f"{k}_s": v for k, v in timings.items()})
+                self._mark_startup("model_ready")
+                self._log_startup(path)
             
             # 如果开启了自动识别且当前有图片，尝试识别
             if self.auto_recognize.get() and self.image_list and self.current_index >= 0:
                 self._run_inference()
         else:
             self.model = None
+            self.model_path = None
             self.model_status.config(fg=ModernTheme.ERROR)
             self.model_info_label.config(text="模型加载失败")
             self._update_status("模型加载失败")
             messagebox.showerror("加载失败", f"无法加载模型:\n{error}")
 
+    def _on_close(self):
+        """关闭窗口：停止推理线程、写回缓存后退出"""
+        self.scheduler.stop()
+        self.prefetcher.shutdown()
+        self.model_pool.shutdown()
+        self.prediction_cache.close()
+        self.root.destroy()
+
+    def _model_name(self, path):
+        """模型路径 -> 下拉框中的名称"""
+        for name, model_path in self.available_models.items():
+            if model_path == path:
+                return name
+        return os.path.basename(path)
+
+    def _update_favourite_button(self):
+        name = self._model_name(self.model_path) if self.model_path else None
+        self.favourite_btn.config(text="★" if name in self.registry["favourites"] else "☆")
+
+    def _toggle_favourite(self):
+        """收藏 / 取消收藏当前模型，收藏的模型下次启动时后台预加载"""
+        if self.model_path is None:
+            return
+        name = self._model_name(self.model_path)
+        favourites = self.registry["favourites"]
+        if name in favourites:
+            favourites.remove(name)
+        else:
+            favourites.append(name)
+        try:
+            save_registry(self.registry_path, self.registry)
+        except OSError as e:
+            messagebox.showerror("保存失败", f"无法写入模型登记表:\n{e}")
+        self._update_favourite_button()
+
     def _add_images(self):
         """添加图片"""
         paths = filedialog.askopenfilenames(
@@ -640,21 +1045,9 @@ class InferenceApp:
             ]
         )
         
-        added = 0
-        for path in paths:
-            if path not in self.image_list:
-                self.image_list.append(path)
-                self.image_listbox.insert(tk.END, os.path.basename(path))
-                added += 1
-        
+        added = self._append_images(paths)
         if added > 0:
-            self._update_nav_label()
             self._update_status(f"已添加 {added} 张图片")
-            if len(self.image_list) == added:
-                self.image_listbox.selection_set(0)
-                self._display_current_image()
-                if self.auto_recognize.get() and self.model:
-                    self._run_inference()
 
     def _add_folder(self):
         """添加文件夹"""
@@ -662,41 +1055,26 @@ class InferenceApp:
         if not folder:
             return
         
-        exts = ('*.jpg', '*.jpeg', '*.png', '*.bmp', '*.webp', '*.gif')
-        added = 0
-        
-        for ext in exts:
-            for path in glob.glob(os.path.join(folder, ext)):
-                if path not in self.image_list:
-                    self.image_list.append(path)
-                    self.image_listbox.insert(tk.END, os.path.basename(path))
-                    added += 1
-                    # 每添加10张图片更新一次UI，防止完全卡死
-                    if added % 10 == 0:
-                        self.root.update()
-        
-        if added > 0:
-            self._update_nav_label()
-            self._update_status(f"从文件夹添加 {added} 张图片")
-            self.image_listbox.selection_set(0)
-            self._display_current_image()
+        self._start_scan([folder])
 
     def _clear_list(self):
         """清空列表"""
+        for scanner in self._scanners:
+            scanner.cancel()
+        self._scanners.clear()
         self.image_list.clear()
-        self.image_listbox.delete(0, tk.END)
+        self.image_listbox.clear()
+        self.prefetcher.clear()
         self.current_index = 0
         self._update_nav_label()
         self._clear_display()
 
-    def _on_image_selected(self, event):
+    def _on_image_selected(self, index):
         """图片选择事件"""
-        selection = self.image_listbox.curselection()
-        if selection:
-            self.current_index = selection[0]
-            self._display_current_image()
-            if self.auto_recognize.get() and self.model:
-                self._run_inference()
+        self.current_index = index
+        self._display_current_image()
+        if self.auto_recognize.get() and self.model:
+            self._run_inference()
 
     def _display_current_image(self):
         """显示当前图片"""
@@ -709,21 +1087,9 @@ class InferenceApp:
     def _display_image(self, path):
         """显示图片"""
         try:
-            img = Image.open(path)
-            
-            # 智能缩放
-            max_w, max_h = 500, 400
-            img_ratio = img.width / img.height
-            
-            new_w = min(img.width, max_w)
-            new_h = int(new_w / img_ratio)
-            
-            if new_h > max_h:
-                new_h = max_h
-                new_w = int(new_h * img_ratio)
-            
-            img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
+            # 优先使用预取好的预览图，未命中时同步解码一次
+            entry = self.prefetcher.load(path)
+            photo = ImageTk.PhotoImage(entry.preview)
             
             # 切换显示
             self.drop_frame.pack_forget()
@@ -731,6 +1097,9 @@ class InferenceApp:
             self.image_label.config(image=photo)
             self.image_label.image = photo
             
+            # 后台预取前后图片
+            self.prefetcher.schedule(self.image_list, self.current_index)
+            
         except Exception as e:
             messagebox.showerror("图片加载失败", f"无法打开图片:\n{e}")
 
@@ -743,8 +1112,6 @@ class InferenceApp:
         self.image_path = None
         
         # 清空结果
-        for widget in self.result_list_frame.winfo_children():
-            widget.destroy()
         self.result_list_frame.pack_forget()
         self.result_placeholder.pack(pady=50)
 
@@ -762,9 +1129,7 @@ class InferenceApp:
         """上一张"""
         if self.image_list and self.current_index > 0:
             self.current_index -= 1
-            self.image_listbox.selection_clear(0, tk.END)
-            self.image_listbox.selection_set(self.current_index)
-            self.image_listbox.see(self.current_index)
+            self.image_listbox.select(self.current_index)
             self._display_current_image()
             if self.auto_recognize.get() and self.model:
                 self._run_inference()
@@ -773,15 +1138,13 @@ class InferenceApp:
         """下一张"""
         if self.image_list and self.current_index < len(self.image_list) - 1:
             self.current_index += 1
-            self.image_listbox.selection_clear(0, tk.END)
-            self.image_listbox.selection_set(self.current_index)
-            self.image_listbox.see(self.current_index)
+            self.image_listbox.select(self.current_index)
             self._display_current_image()
             if self.auto_recognize.get() and self.model:
                 self._run_inference()
 
     def _run_inference(self):
-        """异步运行推理"""
+        """异步运行推理 (最新请求优先：快速切换图片时旧请求被取代)"""
         if self.model is None:
             messagebox.showwarning("提示", "请先选择模型!")
             return
@@ -789,115 +1152,307 @@ class InferenceApp:
             messagebox.showwarning("提示", "请先选择图片!")
             return
         
-        # 防止重复点击
-        if getattr(self, '_is_inferencing', False):
-            return
-            
-        self._is_inferencing = True
         self._update_status("正在识别...")
+        # 已预取的图片直接使用解码好的模型输入
+        source = self.prefetcher.get(self.image_path) or self.image_path
+        self.scheduler.submit(("single", self.image_path), self.model, source)
+
+    def _on_precompute_toggled(self):
+        """预识别开关 (后台线程只读普通属性，不访问 Tk 变量)"""
+        self._precompute = self.precompute_neighbours.get()
+
+    def _on_prefetched(self, entry):
+        """预取完成回调 (后台线程)：可选地提前计算识别结果写入缓存"""
+        model = self.model
+        if self._precompute and model is not None:
+            model.predict_probs([entry])
+
+    def _run_fusion(self):
+        """对当前图片所在文件夹的全部视角做融合识别"""
+        if self.model is None:
+            messagebox.showwarning("提示", "请先选择模型!")
+            return
+        if self.image_path is None:
+            messagebox.showwarning("提示", "请先选择图片!")
+            return
+
+        self._update_status("正在进行多视角融合识别...")
+        folder = os.path.dirname(self.image_path)
+        self.scheduler.submit(
+            ("fusion", self.image_path), classify_folder, self.model, folder, self.fusion_method.get()
+        )
+
+    def _run_compare(self):
+        """当前模型与对比模型并发识别同一张图片"""
+        if self.model is None:
+            messagebox.showwarning("提示", "请先选择模型!")
+            return
+        if self.image_path is None:
+            messagebox.showwarning("提示", "请先选择图片!")
+            return
+        other_name = self.compare_var.get()
+        if other_name not in self.available_models:
+            messagebox.showwarning("提示", "请先选择对比模型!")
+            return
+
+        self._update_status("正在对比识别...")
+        source = self.prefetcher.get(self.image_path) or self.image_path
+        self.scheduler.submit(
+            ("compare", self.image_path), self._compare_task,
+            self.model, self.available_models[other_name], source
+        )
+
+    def _compare_task(self, model, other_path, source):
+        """对比模型未常驻时先加载 (可能淘汰最久未用的模型)"""
+        other = self.model_pool.load(other_path)
+        return side_by_side([model, other], source), other_path
+
+    def _run_similar(self):
+        """在已编目文物中检索与当前图片最相似的 k 个"""
+        if self.model is None:
+            messagebox.showwarning("提示", "请先选择模型!")
+            return
+        if self.image_path is None:
+            messagebox.showwarning("提示", "请先选择图片!")
+            return
+        if self.embedding_index is None and not os.path.exists(os.path.join(self.index_dir, "meta.json")):
+            messagebox.showwarning("提示", "未找到相似检索索引，请先运行 scripts/build_embedding_index.py")
+            return
+
+        self._update_status("正在检索相似文物...")
+        source = self.prefetcher.get(self.image_path) or self.image_path
+        self.scheduler.submit(("similar", self.image_path), self._similar_task, self.model, source)
+
+    def _similar_task(self, model, source):
+        """索引只加载一次 (向量矩阵为内存映射)"""
+        if self.embedding_index is None:
+            self.embedding_index = EmbeddingIndex.load(self.index_dir)
+        return self.embedding_index.query(model, source, k=10)
+
+    def _on_scheduled_result(self, generation, tag, result, error):
+        """调度器回调 (工作线程)：切回主线程处理"""
+        self.root.after(0, self._dispatch_result, generation, tag, result, error)
+
+    def _dispatch_result(self, generation, tag, result, error):
+        """只显示与当前图片一致的最新结果"""
+        kind, image_path = tag
+        if not self.scheduler.is_latest(generation) or image_path != self.image_path:
+            return
+        if kind == "fusion":
+            self._on_fusion_complete(result, error)
+        elif kind == "compare":
+            self._on_compare_complete(result, error)
+        elif kind == "similar":
+            self._on_similar_complete(result, error)
+        else:
+            self._on_inference_complete(result, error)
+
+    def _on_fusion_complete(self, result, error):
+        """融合完成回调：复用结果面板，并在状态栏显示视角一致率"""
+        self._on_inference_complete([result] if result else None, error)
+        if result:
+            self._update_status(
+                f"多视角融合完成 ({result.method}): {len(result.views)} 个视角, "
+                f"一致率 {result.agreement * 100:.0f}%"
+            )
+
+    def _on_compare_complete(self, result, error):
+        """对比完成回调：左侧结果面板显示当前模型，弹窗并列显示两个模型的 Top-5"""
+        if error:
+            self._update_status("对比识别失败")
+            messagebox.showerror("对比失败", f"推理出错: {error}")
+            return
+        (current, other), other_path = result
+        self._on_inference_complete([current], None)
+        
+        win = tk.Toplevel(self.root)
+        win.title("模型对比")
+        win.geometry("820x260")
+        win.configure(bg=ModernTheme.BG_DARK)
         
-        # 启动后台线程进行推理
-        threading.Thread(target=self._run_inference_task, args=(self.image_path,), daemon=True).start()
+        name_a = self._model_name(self.model_path)
+        name_b = self._model_name(other_path)
+        columns = ("排名", name_a, "置信度A", name_b, "置信度B")
+        tree = ttk.Treeview(win, columns=columns, show="headings", height=5)
+        for col in columns:
+            tree.heading(col, text=col)
+        tree.column("排名", width=50, anchor="center")
+        tree.column(name_a, width=270)
+        tree.column("置信度A", width=80, anchor="center")
+        tree.column(name_b, width=270)
+        tree.column("置信度B", width=80, anchor="center")
+        tree.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        def label(res, idx):
+            class_id = res.names[idx]
+            return self.id_to_name.get(class_id.lstrip('_'), class_id)
+        
+        rows = zip(current.probs.top5, current.probs.top5conf, other.probs.top5, other.probs.top5conf)
+        for i, (idx_a, conf_a, idx_b, conf_b) in enumerate(rows):
+            tree.insert("", tk.END, values=(
+                i + 1, label(current, idx_a), f"{float(conf_a) * 100:.1f}%",
+                label(other, idx_b), f"{float(conf_b) * 100:.1f}%",
+            ))
+        
+        same = current.probs.top1 == other.probs.top1
+        self._update_status(f"对比完成: Top-1 {'一致' if same else '不一致'}")
 
-    def _run_inference_task(self, image_path):
-        """后台推理任务"""
-        try:
-            results = self.model(image_path)
-            # 在主线程处理结果
-            self.root.after(0, self._on_inference_complete, results, None)
-        except Exception as e:
-            # 在主线程显示错误
-            self.root.after(0, self._on_inference_complete, None, str(e))
+    def _on_similar_complete(self, result, error):
+        """检索完成回调：弹窗列出最相似的文物及距离"""
+        if error:
+            self._update_status("相似检索失败")
+            messagebox.showerror("检索失败", f"相似检索出错: {error}")
+            return
+        index = self.embedding_index
+        
+        win = tk.Toplevel(self.root)
+        win.title("相似文物")
+        win.geometry("760x340")
+        win.configure(bg=ModernTheme.BG_DARK)
+        
+        if index.meta.get("model_hash") not in (None, getattr(self.model, "model_hash", None)):
+            tk.Label(win, text="⚠️ 索引由其他模型建立，距离可能不准确，请重新建立索引",
+                     font=ModernTheme.FONT_SMALL, bg=ModernTheme.BG_DARK,
+                     fg=ModernTheme.WARNING).pack(fill=tk.X, padx=15, pady=(10, 0))
+        if result["unknown"]:
+            tk.Label(win, text=f"⚠️ 最近距离超过 {index.open_set_distance:.3f}，可能是库中没有的文物",
+                     font=ModernTheme.FONT_SMALL, bg=ModernTheme.BG_DARK,
+                     fg=ModernTheme.WARNING).pack(fill=tk.X, padx=15, pady=(10, 0))
+        
+        columns = ("排名", "名称", "ID", "距离", "图片")
+        tree = ttk.Treeview(win, columns=columns, show="headings", height=10)
+        for col in columns:
+            tree.heading(col, text=col)
+        tree.column("排名", width=50, anchor="center")
+        tree.column("名称", width=200)
+        tree.column("ID", width=80, anchor="center")
+        tree.column("距离", width=80, anchor="center")
+        tree.column("图片", width=300)
+        tree.pack(fill=tk.BOTH, expand=True, padx=15, pady=15)
+        
+        for rank, hit in enumerate(result["hits"], start=1):
+            tree.insert("", tk.END, values=(
+                rank, self.id_to_name.get(hit["id"], hit["id"]), hit["id"],
+                f"{hit['distance']:.4f}", hit["path"],
+            ))
+        
+        self._update_status(
+            f"相似检索完成: 特征 {result['embed_ms']:.1f} ms, 检索 {result['search_ms']:.2f} ms "
+            f"({len(index)} 张视角图)"
+        )
 
     def _on_inference_complete(self, results, error):
         """推理完成回调"""
-        self._is_inferencing = False
-        
         if error:
             self._update_status("识别失败")
             messagebox.showerror("识别失败", f"推理出错: {error}")
             return
             
         try:
-            probs = results[0].probs
-            top5_indices = probs.top5
-            top5_confs = probs.top5conf
-            names = results[0].names
-            
-            # 清空旧结果
-            for widget in self.result_list_frame.winfo_children():
-                widget.destroy()
-            
-            self.result_placeholder.pack_forget()
-            self.result_list_frame.pack(fill=tk.BOTH, expand=True)
-            
-            # 显示结果
-            rank_colors = [ModernTheme.PRIMARY, "#8B5CF6", "#EC4899", ModernTheme.TEXT_SECONDARY, ModernTheme.TEXT_MUTED]
-            
-            for i, (idx, conf) in enumerate(zip(top5_indices, top5_confs)):
-                class_id = names[idx]
-                conf_pct = float(conf) * 100
-                clean_id = class_id.lstrip('_')
-                real_name = self.id_to_name.get(clean_id, class_id)
-                
-                # 单条结果卡片
-                item = tk.Frame(self.result_list_frame, bg=ModernTheme.BG_DARK, pady=8, padx=8)
-                item.pack(fill=tk.X, pady=3)
-                
-                # 排名
-                rank = tk.Label(
-                    item,
-                    text=f"#{i+1}",
-                    font=("Microsoft YaHei UI", 11, "bold"),
-                    bg=ModernTheme.BG_DARK,
-                    fg=rank_colors[i],
-                    width=3
-                )
-                rank.pack(side=tk.LEFT)
-                
-                # 信息区
-                info = tk.Frame(item, bg=ModernTheme.BG_DARK)
-                info.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(8, 0))
-                
-                tk.Label(
-                    info,
-                    text=real_name,
-                    font=ModernTheme.FONT_BODY,
-                    bg=ModernTheme.BG_DARK,
-                    fg=ModernTheme.TEXT_PRIMARY,
-                    anchor="w",
-                    wraplength=400,  # 允许更长的换行
-                    justify="left"
-                ).pack(fill=tk.X)
-                
-                if real_name != class_id:
-                    tk.Label(
-                        info,
-                        text=f"ID: {clean_id}",
-                        font=ModernTheme.FONT_SMALL,
-                        bg=ModernTheme.BG_DARK,
-                        fg=ModernTheme.TEXT_MUTED,
-                        anchor="w"
-                    ).pack(fill=tk.X)
-                
-                # 置信度
-                conf_color = ModernTheme.SUCCESS if conf_pct >= 70 else (ModernTheme.WARNING if conf_pct >= 40 else ModernTheme.TEXT_MUTED)
-                tk.Label(
-                    item,
-                    text=f"{conf_pct:.1f}%",
-                    font=("Microsoft YaHei UI", 11, "bold"),
-                    bg=ModernTheme.BG_DARK,
-                    fg=conf_color
-                ).pack(side=tk.RIGHT)
+            with STATS.timed("render"):
+                probs = results[0].probs
+                names = results[0].names
+                self._show_top5(names, probs.top5, probs.top5conf)
+                # 包含布局与重绘，反映真实的主线程开销
+                self.result_list_frame.update_idletasks()
             
-            self._update_status("识别完成")
+            status = "识别完成"
+            forward = STATS.summary()["stages"]["forward"]
+            if forward["count"]:
+                status += f" (前向 p50 {forward['p50_ms']:.1f} ms/张)"
+            if backend_name(self.model) == "cascade":
+                status += f" | 级联升级率 {self.model.escalation_rate * 100:.0f}%"
+            elif backend_name(self.model) == "roi":
+                status += f" | 定位成功率 {self.model.localize_rate * 100:.0f}%"
+            self._update_status(status)
             
         except Exception as e:
             self._update_status("处理结果出错")
             messagebox.showerror("错误", f"处理结果失败: {e}")
 
+    def _show_top5(self, names, indices, confs):
+        """更新预建的结果卡片 (不创建 / 销毁控件)"""
+        if not self.result_list_frame.winfo_manager():
+            self.result_placeholder.pack_forget()
+            self.result_list_frame.pack(fill=tk.BOTH, expand=True)
+        
+        shown = 0
+        for row, idx, conf in zip(self.result_rows, indices, confs):
+            class_id = names[idx]
+            clean_id = class_id.lstrip('_')
+            real_name = self.id_to_name.get(clean_id, class_id)
+            row.set(real_name, clean_id, float(conf) * 100, real_name != class_id)
+            if not row.winfo_manager():
+                row.pack(fill=tk.X, pady=3)
+            shown += 1
+        # 类别数少于 5 时隐藏多余卡片
+        for row in self.result_rows[shown:]:
+            row.pack_forget()
+
+    def _toggle_perf_panel(self):
+        """打开 / 关闭性能面板"""
+        if self.perf_window is not None and self.perf_window.winfo_exists():
+            self.perf_window.destroy()
+            self.perf_window = None
+            return
+        
+        win = tk.Toplevel(self.root)
+        win.title("性能统计")
+        win.geometry("560x300")
+        win.configure(bg=ModernTheme.BG_DARK)
+        self.perf_window = win
+        
+        text = tk.Label(
+            win,
+            font=ModernTheme.FONT_MONO,
+            bg=ModernTheme.BG_DARK,
+            fg=ModernTheme.TEXT_PRIMARY,
+            justify="left",
+            anchor="nw"
+        )
+        text.pack(fill=tk.BOTH, expand=True, padx=15, pady=(15, 5))
+        
+        btn_frame = tk.Frame(win, bg=ModernTheme.BG_DARK)
+        btn_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+        ttk.Button(btn_frame, text="💾 导出 JSON", style="Secondary.TButton",
+                  command=self._dump_perf_stats).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="重置", style="Secondary.TButton",
+                  command=STATS.reset).pack(side=tk.LEFT, padx=(5, 0))
+        
+        self._refresh_perf_panel(win, text)
+
+    def _refresh_perf_panel(self, win, text):
+        """每秒刷新一次滚动分位数"""
+        if not win.winfo_exists():
+            return
+        summary = STATS.summary()
+        lines = [f"{'阶段':<12}{'次数':>8}{'p50':>9}{'p95':>9}{'p99':>9}  (ms/张)"]
+        for stage in STAGES:
+            s = summary["stages"][stage]
+            if s["count"]:
+                lines.append(f"{stage:<14}{s['count']:>8}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+            else:
+                lines.append(f"{stage:<14}{0:>8}{'-':>9}{'-':>9}{'-':>9}")
+        rss = summary["rss_mb"]
+        lines.append("")
+        lines.append(f"吞吐: {summary['throughput_img_s']:.1f} 张/秒 (最近 10 秒)")
+        lines.append(f"内存: {rss:.0f} MB" if rss is not None else "内存: -")
+        text.config(text="\n".join(lines))
+        win.after(1000, self._refresh_perf_panel, win, text)
+
+    def _dump_perf_stats(self):
+        """导出当前统计到 runs/perf/，便于版本间回归对比"""
+        path = os.path.join(self.project_root, "runs", "perf", time.strftime("perf_%Y%m%d_%H%M%S.json"))
+        model = os.path.basename(self.model_path) if self.model_path else None
+        try:
+            STATS.dump(path, source="gui", model=model, backend=backend_name(self.model) if self.model else None)
+        except OSError as e:
+            messagebox.showerror("导出失败", str(e))
+            return
+        self._update_status(f"性能统计已导出: {path}")
+
     def _batch_inference(self):
-        """批量识别"""
+        """批量识别：后台流水线执行，结果通过 root.after 流式写入表格"""
         if self.model is None:
             messagebox.showwarning("提示", "请先选择模型!")
             return
@@ -905,10 +1460,16 @@ class InferenceApp:
             messagebox.showwarning("提示", "请先添加图片!")
             return
         
+        exporter = None
+        if self.batch_export.get():
+            exporter = self._create_exporter()
+            if exporter is None:
+                return
+        
         # 创建结果窗口
         win = tk.Toplevel(self.root)
         win.title("批量识别结果")
-        win.geometry("750x550")
+        win.geometry("750x580")
         win.configure(bg=ModernTheme.BG_DARK)
         
         # 标题
@@ -936,39 +1497,122 @@ class InferenceApp:
         
         # 进度条
         progress = ttk.Progressbar(win, mode='determinate', maximum=len(self.image_list))
-        progress.pack(fill=tk.X, padx=15, pady=(0, 15))
+        progress.pack(fill=tk.X, padx=15, pady=(0, 10))
+        
+        # 吞吐 / 剩余时间 与 控制按钮
+        control_frame = tk.Frame(win, bg=ModernTheme.BG_DARK)
+        control_frame.pack(fill=tk.X, padx=15, pady=(0, 15))
+        
+        stats_label = tk.Label(
+            control_frame,
+            text="准备中...",
+            font=ModernTheme.FONT_SMALL,
+            bg=ModernTheme.BG_DARK,
+            fg=ModernTheme.TEXT_SECONDARY,
+            anchor="w"
+        )
+        stats_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        pipeline = BatchPipeline(self.model, self.image_list, batch_size=16, sink=exporter)
+        
+        def toggle_pause():
+            if pipeline.paused:
+                pipeline.resume()
+                pause_btn.config(text="⏸ 暂停")
+            else:
+                pipeline.pause()
+                pause_btn.config(text="▶ 继续")
+        
+        cancel_btn = ttk.Button(control_frame, text="取消", style="Secondary.TButton", command=pipeline.cancel)
+        cancel_btn.pack(side=tk.RIGHT)
+        pause_btn = ttk.Button(control_frame, text="⏸ 暂停", style="Secondary.TButton", command=toggle_pause)
+        pause_btn.pack(side=tk.RIGHT, padx=(0, 5))
+        
+        def on_close():
+            pipeline.cancel()
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
         
-        # 批量处理
-        for i, img_path in enumerate(self.image_list):
+        pipeline.start()
+        self._poll_batch(win, tree, progress, stats_label, (pause_btn, cancel_btn), pipeline)
+
+    def _create_exporter(self):
+        """选择导出文件，返回 ResultExporter；取消或失败时返回 None"""
+        export_dir = os.path.join(self.project_root, "runs", "exports")
+        path = filedialog.asksaveasfilename(
+            title="导出批量识别结果",
+            initialdir=export_dir if os.path.isdir(export_dir) else self.project_root,
+            initialfile=time.strftime("batch_%Y%m%d_%H%M%S.csv"),
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet")]
+        )
+        if not path:
+            return None
+        try:
+            return ResultExporter(path, self.model.names, self.id_to_name,
+                                  model_hash=getattr(self.model, "model_hash", ""))
+        except (ImportError, ValueError, OSError) as e:
+            messagebox.showerror("导出失败", str(e))
+            return None
+
+    def _poll_batch(self, win, tree, progress, stats_label, buttons, pipeline, rows=None):
+        """定时从流水线取出结果写入表格 (每次最多处理 200 条，保证界面流畅)
+
+        表格只保留最近 MAX_BATCH_ROWS 行；完整结果通过导出文件保存。
+        """
+        if not win.winfo_exists():
+            return
+        if rows is None:
+            rows = deque()
+        
+        for _ in range(200):
             try:
-                results = self.model(img_path)
-                probs = results[0].probs
-                top1_idx = probs.top1
-                top1_conf = float(probs.top1conf) * 100
-                names = results[0].names
-                
-                class_id = names[top1_idx]
-                clean_id = class_id.lstrip('_')
-                real_name = self.id_to_name.get(clean_id, class_id)
-                
-                tree.insert("", tk.END, values=(
-                    i + 1,
-                    os.path.basename(img_path),
-                    real_name,
-                    f"{top1_conf:.1f}%"
-                ))
-            except Exception as e:
-                tree.insert("", tk.END, values=(
-                    i + 1,
-                    os.path.basename(img_path),
-                    f"错误: {str(e)[:30]}",
-                    "-"
-                ))
-            
-            progress['value'] = i + 1
-            win.update()
+                record = pipeline.results.get_nowait()
+            except queue.Empty:
+                break
+            rows.append(tree.insert("", tk.END, values=self._format_batch_row(record, pipeline.model.names)))
+            if len(rows) > MAX_BATCH_ROWS:
+                tree.delete(rows.popleft())
+            progress['value'] = record["index"] + 1
+        
+        rate = pipeline.throughput()
+        eta = pipeline.eta()
+        eta_text = f"{eta:.0f}s" if eta is not None else "--"
+        state = "已暂停 | " if pipeline.paused else ""
+        stats_label.config(
+            text=f"{state}{pipeline.done} / {pipeline.total} | {rate:.1f} 张/秒 | 剩余 {eta_text}"
+        )
         
-        self._update_status(f"批量识别完成: {len(self.image_list)} 张图片")
+        if pipeline.finished and pipeline.results.empty():
+            for btn in buttons:
+                btn.config(state="disabled")
+            verb = "已取消" if pipeline.cancelled else "完成"
+            stats_label.config(
+                text=f"{verb}: {pipeline.done} / {pipeline.total} | {rate:.1f} 张/秒 | 用时 {pipeline.elapsed():.1f}s"
+            )
+            self._update_status(
+                f"批量识别{verb}: {pipeline.done} 张图片 "
+                f"(缓存命中 {self.prediction_cache.hits} / 未命中 {self.prediction_cache.misses})"
+            )
+            if pipeline.sink_error:
+                messagebox.showerror("导出失败", f"写入导出文件出错:\n{pipeline.sink_error}")
+            elif pipeline.sink is not None:
+                self._update_status(f"批量识别{verb}: 已导出 {pipeline.sink.count} 条到 {pipeline.sink.path}")
+            return
+        
+        self.root.after(50, self._poll_batch, win, tree, progress, stats_label, buttons, pipeline, rows)
+
+    def _format_batch_row(self, record, names):
+        """批量结果记录 -> 表格行 (names 取自批量任务的模型，运行中可能已切换当前模型)"""
+        name = os.path.basename(record["path"])
+        if record["error"] or not record["topk"]:
+            return (record["index"] + 1, name, f"错误: {str(record['error'])[:30]}", "-")
+        
+        top1_idx, top1_conf = record["topk"][0]
+        class_id = names[top1_idx]
+        clean_id = class_id.lstrip('_')
+        real_name = self.id_to_name.get(clean_id, class_id)
+        return (record["index"] + 1, name, real_name, f"{top1_conf * 100:.1f}%")
 
 
 def main():
@@ -0,0 +1,88 @@
+"""
+inference_scheduler.py
+-----------------------
+"最新请求优先" 的推理调度器
+
+快速切换图片时只有最后一次请求有意义：
+    - 单个常驻工作线程，不再每次识别新建线程
+    - 等待中的请求被新请求直接替换 (合并)，不会排队积压
+    - 执行期间被新请求取代的结果会被丢弃，不会回调
+    - 每个请求带有 tag (如图片路径)，回调时一并返回，便于界面核对
+"""
+
+import threading
+
+
+class LatestWinsScheduler:
+    """单工作线程 + 只保留最新请求的调度器
+
+    on_result(generation, tag, result, error) 在工作线程中调用，
+    GUI 需自行通过 root.after 切回主线程。
+    """
+    def __init__(self, on_result):
+        self.on_result = on_result
+        self.submitted = 0
+        self.superseded = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._stopped = False
+        self._busy = False
+        self._thread = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, tag, fn, *args):
+        """提交请求，替换尚未开始的旧请求；返回该请求的 generation"""
+        with self._cond:
+            self._generation += 1
+            self.submitted += 1
+            if self._pending is not None:
+                self.superseded += 1
+            self._pending = (self._generation, tag, fn, args)
+            self._cond.notify()
+            return self._generation
+
+    def cancel(self):
+        """取消等待中的请求，并让执行中的请求结果作废"""
+        with self._cond:
+            if self._pending is not None:
+                self.superseded += 1
+                self._pending = None
+            self._generation += 1
+
+    def is_latest(self, generation):
+        return generation == self._generation
+
+    @property
+    def busy(self):
+        return self._busy or self._pending is not None
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                generation, tag, fn, args = self._pending
+                self._pending = None
+                self._busy = True
+
+            try:
+                result, error = fn(*args), None
+            except Exception as e:
+                result, error = None, str(e)
+
+            with self._cond:
+                self._busy = False
+                stale = generation != self._generation
+                if stale:
+                    self.superseded += 1
+            if not stale:
+                self.on_result(generation, tag, result, error)
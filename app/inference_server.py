@@ -0,0 +1,396 @@
+"""
+inference_server.py
+--------------------
+本地 HTTP 推理服务 (asyncio，仅依赖标准库 + 推理后端)
+
+供 Spring Boot 等外部工具集成。并发请求在 max_batch / max_wait_ms 策略下
+合并成动态 batch 做一次前向推理；队列有上限，满载时返回 503 实现背压。
+--workers > 1 时使用 SessionPool，多个 batch 同时在不同会话 (CPU 核组) 上执行。
+
+接口：
+    POST /predict     请求体为图片字节，或 JSON {"path": "...", "topk": 5}
+                      (路径模式需用 --allow-root 指定允许读取的目录，默认关闭)
+    GET  /health      服务与模型状态
+    GET  /metrics     请求数、拒绝数、batch 大小、队列深度、延迟分位数、
+                      各阶段 (decode / preprocess / forward / postprocess) 分位数与内存
+
+Usage:
+    python app/inference_server.py --model models/best.onnx --port 8000
+    python app/inference_server.py --model models/best.onnx --workers 8 --intra-op-threads 4 --pin
+    python app/inference_server.py --model models/best.onnx --allow-root D:/museum/photos
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from image_index import load_id_mapping
+from model_backend import backend_name, load_model, predict_probs
+from perf_stats import STATS
+from results import topk
+from session_pool import POOL_MODES, SessionPool
+
+MAX_BODY_BYTES = 20 << 20
+LATENCY_WINDOW = 2048
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+def _parse_topk(value):
+    """请求中的 topk -> 正整数，非法值抛出 ValueError"""
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"topk must be a positive integer, got {value!r}") from None
+    if k < 1:
+        raise ValueError(f"topk must be a positive integer, got {value!r}")
+    return k
+
+
+class QueueFullError(Exception):
+    """请求队列已满"""
+
+
+class DynamicBatcher:
+    """将并发请求合并为动态 batch
+
+    第一个请求到达后最多等待 max_wait_ms 收集更多请求，凑满 max_batch 立即执行。
+    推理在线程池中运行，不阻塞事件循环；最多 concurrency 个 batch 同时执行
+    (单个会话为 1，SessionPool 为会话数)。
+    """
+    def __init__(self, model, max_batch=16, max_wait_ms=5.0, max_queue=256, concurrency=1):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="inference")
+        self.batches = 0
+        self.batched_items = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+
+    def submit(self, image_bytes):
+        """提交一张图片，返回 future；队列已满时抛出 QueueFullError"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image_bytes, future))
+        except asyncio.QueueFull:
+            raise QueueFullError()
+        return future
+
+    async def _collect(self):
+        items = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # 已在队列中的请求直接并入，不再额外等待
+        while len(items) < self.max_batch and not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            # 所有会话都在忙时不再取请求，让新请求继续在队列中合并
+            await slots.acquire()
+            items = await self._collect()
+            # 已取消的请求 (客户端断开) 不再参与推理
+            items = [(data, fut) for data, fut in items if not fut.done()]
+            if not items:
+                slots.release()
+                continue
+            task = asyncio.get_running_loop().create_task(self._execute(items))
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _execute(self, items):
+        loop = asyncio.get_running_loop()
+        try:
+            probs = await loop.run_in_executor(
+                self.executor, predict_probs, self.model, [data for data, _ in items]
+            )
+        except Exception:
+            # 整批失败 (通常是某张图片损坏) 时逐张重试，只让出错的请求失败
+            await self._run_individually(items)
+            return
+
+        self.batches += 1
+        self.batched_items += len(items)
+        for (_, fut), p in zip(items, probs):
+            if not fut.done():
+                fut.set_result((p, len(items)))
+
+    async def _run_individually(self, items):
+        loop = asyncio.get_running_loop()
+        for data, fut in items:
+            try:
+                probs = await loop.run_in_executor(self.executor, predict_probs, self.model, [data])
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_items += 1
+            if not fut.done():
+                fut.set_result((probs[0], 1))
+
+
+class InferenceServer:
+    """HTTP/1.1 (keep-alive) 推理服务"""
+    def __init__(self, model, model_path, id_to_name=None, max_batch=16, max_wait_ms=5.0, max_queue=256,
+                 allowed_roots=()):
+        self.model = model
+        self.model_path = model_path
+        self.id_to_name = id_to_name or {}
+        # JSON 路径模式只能读取这些目录下的文件 (解析符号链接后判断)
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots]
+        self.batcher = DynamicBatcher(model, max_batch, max_wait_ms, max_queue,
+                                      concurrency=getattr(model, "workers", 1))
+        self.started_at = time.time()
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    async def serve(self, host, port):
+        self.batcher.start()
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"🚀 Serving {os.path.basename(self.model_path)} ({backend_name(self.model)}) on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode('latin-1').partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, extra = await self._dispatch(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True, extra_headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        for key, value in (extra_headers or {}).items():
+            head.append(f"{key}: {value}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, self._health(), None
+        if url.path == "/metrics":
+            return 200, self._metrics(), None
+        if url.path == "/predict":
+            if method != "POST":
+                return 405, {"error": "use POST"}, None
+            return await self._predict(parse_qs(url.query), headers, body)
+        return 404, {"error": f"unknown endpoint {url.path}"}, None
+
+    async def _predict(self, query, headers, body):
+        t0 = time.perf_counter()
+        self.requests += 1
+        try:
+            k = _parse_topk(query.get("topk", ["5"])[0])
+            if headers.get("content-type", "").startswith("application/json"):
+                request = json.loads(body or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("JSON body must be an object")
+                k = _parse_topk(request.get("topk", k))
+                if not isinstance(request.get("path"), str):
+                    raise ValueError("JSON body needs a \"path\" string")
+                if not self.allowed_roots:
+                    raise ValueError("path requests are disabled (start the server with --allow-root)")
+                body = self._read_path(request["path"])
+                if body is None:
+                    # 不区分不存在、无权限与越界，避免泄露文件是否存在
+                    raise ValueError("path is not readable")
+        except ValueError as e:
+            self.errors += 1
+            return 400, {"error": f"invalid request: {e}"}, None
+        if not body:
+            self.errors += 1
+            return 400, {"error": "empty image"}, None
+
+        try:
+            future = self.batcher.submit(body)
+        except QueueFullError:
+            self.rejected += 1
+            return 503, {"error": "server busy, retry later"}, {"Retry-After": "1"}
+
+        try:
+            probs, batch_size = await future
+        except (OSError, ValueError) as e:
+            # 无法解码的图片
+            self.errors += 1
+            return 400, {"error": f"invalid image: {e}"}, None
+        except Exception as e:
+            self.errors += 1
+            return 500, {"error": str(e)}, None
+
+        latency_ms = (time.perf_counter() - t0) * 1000
+        self.latencies.append(latency_ms)
+        return 200, {
+            "topk": self._format_topk(probs, k),
+            "batch_size": batch_size,
+            "latency_ms": round(latency_ms, 2),
+        }, None
+
+    def _read_path(self, path):
+        """读取允许目录下的文件；越界或无法读取时返回 None"""
+        real = os.path.realpath(path)
+        try:
+            if not any(os.path.commonpath([real, root]) == root for root in self.allowed_roots):
+                return None
+            with open(real, 'rb') as f:
+                return f.read()
+        except (OSError, ValueError):
+            # commonpath 在不同盘符间抛出 ValueError
+            return None
+
+    def _format_topk(self, probs, k):
+        items = []
+        for idx in topk(probs, k):
+            class_id = self.model.names[int(idx)]
+            clean_id = class_id.lstrip('_')
+            items.append({
+                "id": clean_id,
+                "name": self.id_to_name.get(clean_id, class_id),
+                "confidence": round(float(probs[idx]), 6),
+            })
+        return items
+
+    def _health(self):
+        return {
+            "status": "ok",
+            "model": os.path.basename(self.model_path),
+            "backend": backend_name(self.model),
+            "classes": len(self.model.names),
+            "workers": self.batcher.concurrency,
+            "uptime_s": round(time.time() - self.started_at, 1),
+        }
+
+    def _metrics(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        batches = self.batcher.batches
+        perf = STATS.summary()
+        return {
+            "requests_total": self.requests,
+            "rejected_total": self.rejected,
+            "errors_total": self.errors,
+            "batches_total": batches,
+            "avg_batch_size": round(self.batcher.batched_items / batches, 2) if batches else 0.0,
+            "queue_depth": self.batcher.queue.qsize(),
+            "queue_capacity": self.batcher.queue.maxsize,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+                "p99": round(float(np.percentile(latencies, 99)), 2),
+            },
+            "throughput_img_s": perf["throughput_img_s"],
+            "rss_mb": perf["rss_mb"],
+            "stages": perf["stages"],
+        }
+
+
+def main():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Local HTTP inference server with dynamic batching.")
+    parser.add_argument("--model", default=os.path.join(project_root, "models", "best.onnx"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=16, help="Max images per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Max time to wait for a batch to fill")
+    parser.add_argument("--max-queue", type=int, default=256, help="Pending requests before returning 503")
+    parser.add_argument("--workers", type=int, default=1, help="Inference sessions running batches in parallel")
+    parser.add_argument("--intra-op-threads", type=int, default=0,
+                        help="Compute threads per session (0: runtime default, single session only)")
+    parser.add_argument("--pin", action="store_true", help="Pin each session to its own CPU set (Linux)")
+    parser.add_argument("--pool-mode", choices=POOL_MODES, default="auto")
+    parser.add_argument("--allow-root", action="append", default=[], metavar="DIR",
+                        help="Directory JSON {\"path\": ...} requests may read from (repeatable; off by default)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Error: Model not found at {args.model}")
+        return
+
+    if args.workers > 1:
+        model = SessionPool(args.model, args.workers, args.intra_op_threads or 1, args.pin,
+                            args.pool_mode, batch=args.max_batch)
+        print(f"🚀 {model.workers} {model.mode} sessions × {model.intra_op_threads} threads"
+              f"{' (pinned)' if model.pinned else ''}")
+    elif args.intra_op_threads:
+        model = load_model(args.model, intra_op_threads=args.intra_op_threads)
+    else:
+        model = load_model(args.model)
+    server = InferenceServer(
+        model, args.model, load_id_mapping(project_root),
+        max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, max_queue=args.max_queue,
+        allowed_roots=args.allow_root,
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 Server stopped.")
+    finally:
+        close = getattr(model, "close", None)
+        if close is not None:
+            close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+model_backend.py
+-----------------
+推理后端选择
+
+    - .onnx 模型优先使用轻量级 OnnxClassifier (无需 torch)
+    - 未安装 onnxruntime 或 .pt 权重时回退到 ultralytics YOLO
+    - .json 为快慢模型级联配置 (见 cascade.py)，含 "localizer" 时为定位 + 裁剪分类配置 (见 roi_crop.py)
+"""
+
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from perf_stats import STATS
+
+
+def preload_backend(path, prefer_onnxruntime=True):
+    """提前导入模型所需的推理库 (耗时操作，应在后台线程调用)，返回后端名称"""
+    if str(path).lower().endswith(".json"):
+        from roi_crop import is_roi_config
+        if is_roi_config(path):
+            from roi_crop import read_config
+            config = read_config(path)
+            for model_path in (config["localizer"], config["classifier"]):
+                preload_backend(model_path, prefer_onnxruntime)
+            return "roi"
+        from cascade import read_config
+        config = read_config(path)
+        for model_path in (config["fast"], config["accurate"]):
+            preload_backend(model_path, prefer_onnxruntime)
+        return "cascade"
+    if str(path).lower().endswith(".onnx") and prefer_onnxruntime:
+        try:
+            import onnx_inference  # noqa: F401  (导入 onnxruntime)
+            return "onnxruntime"
+        except ImportError:
+            pass
+    import ultralytics  # noqa: F401  (导入 torch)
+    return "ultralytics"
+
+
+def config_models(path):
+    """.json 配置引用的模型文件路径 (普通模型文件返回空列表)"""
+    if not str(path).lower().endswith(".json"):
+        return []
+    from roi_crop import is_roi_config
+    if is_roi_config(path):
+        from roi_crop import read_config
+        config = read_config(path)
+        return [config["localizer"], config["classifier"]]
+    from cascade import read_config
+    config = read_config(path)
+    return [config["fast"], config["accurate"]]
+
+
+def warmup(model, imgsz=224, batch=2):
+    """用空白图片跑一次 batch，提前完成会话初始化与内存分配"""
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    # 预热耗时不计入性能统计
+    with STATS.muted():
+        predict_probs(model, [dummy] * batch)
+
+
+def load_model(path, prefer_onnxruntime=True, **kwargs):
+    """根据模型格式创建推理后端"""
+    if str(path).lower().endswith(".json"):
+        from roi_crop import is_roi_config, load_roi
+        if is_roi_config(path):
+            return load_roi(path, prefer_onnxruntime, **kwargs)
+        from cascade import load_cascade
+        return load_cascade(path, prefer_onnxruntime, **kwargs)
+
+    is_onnx = str(path).lower().endswith(".onnx")
+
+    if is_onnx and prefer_onnxruntime:
+        try:
+            from onnx_inference import OnnxClassifier
+        except ImportError:
+            pass
+        else:
+            return OnnxClassifier(path, **kwargs)
+
+    from ultralytics import YOLO
+    if is_onnx:
+        return YOLO(path, task='classify')
+    return YOLO(path)
+
+
+# ultralytics 预测器状态在同一模型对象的调用间共享，不能并发调用 (onnxruntime 会话可以)
+_ultralytics_locks = weakref.WeakKeyDictionary()
+_ultralytics_locks_guard = threading.Lock()
+
+
+def _model_lock(model):
+    """同一 ultralytics 模型对象的调用串行化 (GUI 批量、单张识别、预取可能同时使用)"""
+    with _ultralytics_locks_guard:
+        lock = _ultralytics_locks.get(model)
+        if lock is None:
+            lock = _ultralytics_locks[model] = threading.Lock()
+    return lock
+
+
+def backend_name(model):
+    """返回后端名称，用于界面与日志显示"""
+    return getattr(model, "backend", None) or "ultralytics"
+
+
+def predict_probs(model, sources):
+    """统一获取 (N, num_classes) 概率矩阵，兼容 OnnxClassifier 与 ultralytics YOLO"""
+    sources = list(sources)
+    if hasattr(model, "predict_probs"):
+        return model.predict_probs(sources)
+
+    # 一次调用处理整组图片，避免逐张前向
+    images = _ultralytics_sources(sources)
+    with _model_lock(model):
+        results = model(images, batch=len(sources), verbose=False)
+
+    # ultralytics 自带各阶段单张平均耗时 (ms)，其 preprocess 含文件解码
+    speed = getattr(results[0], "speed", None) if results else None
+    if speed:
+        n = len(results)
+        STATS.record("preprocess", (speed.get("preprocess") or 0.0) * n, n)
+        STATS.record("forward", (speed.get("inference") or 0.0) * n, n)
+        STATS.record("postprocess", (speed.get("postprocess") or 0.0) * n, n)
+    rows = []
+    for r in results:
+        data = r.probs.data
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        rows.append(np.asarray(data, dtype=np.float32))
+    return np.stack(rows)
+
+
+def embed(model, sources):
+    """统一获取 (N, D) 特征向量 (分类头之前的全局池化特征，未归一化)"""
+    sources = list(sources)
+    if hasattr(model, "predict_probs"):
+        return model.embed(sources)
+
+    # ultralytics YOLO.embed 返回每张图片一个特征张量
+    images = _ultralytics_sources(sources)
+    with _model_lock(model):
+        features = model.embed(images, verbose=False)
+    rows = []
+    for f in features:
+        if hasattr(f, "cpu"):
+            f = f.cpu().numpy()
+        rows.append(np.asarray(f, dtype=np.float32).reshape(-1))
+    return np.stack(rows)
+
+
+def _ultralytics_sources(sources):
+    """ultralytics 不接受 bytes / PreparedImage，先转换为 PIL.Image"""
+    if all(isinstance(s, (str, os.PathLike)) for s in sources):
+        return sources
+    from preprocess import PreparedImage, open_image
+    converted = []
+    for s in sources:
+        if isinstance(s, (bytes, bytearray, PreparedImage)):
+            with STATS.timed("decode"):
+                s = open_image(s)
+        converted.append(s)
+    return converted
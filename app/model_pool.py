@@ -0,0 +1,163 @@
+"""
+model_pool.py
+--------------
+常驻模型池
+
+在 GUI 中切换模型时不再每次从磁盘重新加载：
+    - 最多常驻 max_models 个模型，并受内存预算 max_bytes 限制
+    - 超出限制时按 LRU 淘汰最久未使用的模型
+    - 收藏的模型 (models/model_registry.json) 可在后台预加载
+    - 同一模型被并发请求时只加载一次
+    - side_by_side() 将同一张图片同时送入多个常驻模型
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 模型常驻内存约为权重文件大小的倍数 (权重 + 推理会话的工作内存)
+MEMORY_FACTOR = 2
+
+
+def estimate_model_bytes(path):
+    """按权重文件大小粗略估计模型常驻内存"""
+    try:
+        return os.path.getsize(path) * MEMORY_FACTOR
+    except OSError:
+        return 0
+
+
+def load_registry(path):
+    """读取模型登记表 {"favourites": [模型名, ...]}，不存在时返回空表"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            registry = json.load(f)
+    except (OSError, ValueError):
+        registry = {}
+    registry.setdefault("favourites", [])
+    return registry
+
+
+def save_registry(path, registry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2)
+
+
+class ModelPool:
+    """按 LRU + 内存预算管理的常驻模型池，线程安全
+
+    loader(path) 负责真正加载模型 (耗时操作)，池只负责缓存与淘汰。
+    """
+    def __init__(self, loader, max_models=3, max_bytes=2 << 30):
+        self.loader = loader
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()  # path -> (model, nbytes)
+        self._loading = {}            # path -> Event，正在加载的模型
+        self._lock = threading.Lock()
+        self._preloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-preload")
+
+    def get(self, path):
+        """返回常驻模型 (不触发加载)，未常驻时返回 None"""
+        with self._lock:
+            entry = self._models.get(path)
+            if entry is None:
+                return None
+            self._models.move_to_end(path)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._models
+
+    def resident(self):
+        """当前常驻模型路径，按最近使用排序 (最新在后)"""
+        with self._lock:
+            return list(self._models)
+
+    def load(self, path):
+        """返回模型，未常驻时加载并按 LRU 淘汰 (在后台线程调用)"""
+        while True:
+            with self._lock:
+                entry = self._models.get(path)
+                if entry is not None:
+                    self._models.move_to_end(path)
+                    self.hits += 1
+                    return entry[0]
+                event = self._loading.get(path)
+                owner = event is None
+                if owner:
+                    event = self._loading[path] = threading.Event()
+                    self.misses += 1
+            if not owner:
+                # 其他线程正在加载同一模型；若其失败，则重新尝试
+                event.wait()
+                continue
+
+            try:
+                model = self.loader(path)
+                self._insert(path, model)
+                return model
+            finally:
+                with self._lock:
+                    self._loading.pop(path, None)
+                event.set()
+
+    def preload(self, paths):
+        """后台预加载，只占用空闲名额，不会淘汰已常驻的模型"""
+        for path in paths:
+            self._preloader.submit(self._preload_one, path)
+
+    def evict(self, path):
+        with self._lock:
+            entry = self._models.pop(path, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self.nbytes = 0
+
+    def shutdown(self):
+        self._preloader.shutdown(wait=False, cancel_futures=True)
+        self.clear()
+
+    def _preload_one(self, path):
+        with self._lock:
+            full = (
+                path in self._models or path in self._loading
+                or len(self._models) >= self.max_models
+                or self.nbytes + estimate_model_bytes(path) > self.max_bytes
+            )
+        if full:
+            return
+        try:
+            self.load(path)
+        except Exception:
+            pass
+
+    def _insert(self, path, model):
+        nbytes = estimate_model_bytes(path)
+        with self._lock:
+            self._models[path] = (model, nbytes)
+            self.nbytes += nbytes
+            while len(self._models) > 1 and (
+                len(self._models) > self.max_models or self.nbytes > self.max_bytes
+            ):
+                _, (_, evicted) = self._models.popitem(last=False)
+                self.nbytes -= evicted
+
+
+def side_by_side(models, source):
+    """同一张图片并发送入多个模型，返回与 models 顺序一致的结果列表"""
+    with ThreadPoolExecutor(max_workers=len(models)) as pool:
+        futures = [pool.submit(model, source) for model in models]
+        return [f.result()[0] for f in futures]
@@ -0,0 +1,83 @@
+"""
+multiview.py
+-------------
+多视角融合识别
+
+数据集中每件文物以 main.jpg + angle_1..N.jpg 保存。融合模式将同一文物的
+多张视角图片组成一个 batch 做一次前向推理，再按 mean / logmean / max
+合并概率，给出一个融合后的 top-k 以及各视角的一致率。
+"""
+
+import os
+import re
+
+import numpy as np
+
+from image_index import is_image_file
+from model_backend import predict_probs
+from results import ClassifyResult, topk
+
+FUSION_METHODS = ("mean", "logmean", "max")
+
+
+def _view_sort_key(name):
+    """main 优先，其次 angle_N 按数字排序，其余按文件名"""
+    stem = os.path.splitext(name)[0].lower()
+    if stem == "main":
+        return (0, 0, stem)
+    match = re.fullmatch(r"angle_(\d+)", stem)
+    if match:
+        return (1, int(match.group(1)), stem)
+    return (2, 0, stem)
+
+
+def collect_views(folder):
+    """收集文件夹中同一文物的全部视角图片"""
+    names = [f for f in os.listdir(folder) if is_image_file(f)]
+    return [os.path.join(folder, f) for f in sorted(names, key=_view_sort_key)]
+
+
+def fuse_probs(probs, method="mean"):
+    """合并 (N, C) 概率矩阵为 (C,) 融合概率"""
+    if method == "mean":
+        fused = probs.mean(axis=0)
+    elif method == "logmean":
+        # 几何平均：任一视角强烈否定的类别会被压低
+        fused = np.exp(np.log(np.clip(probs, 1e-12, 1.0)).mean(axis=0))
+    elif method == "max":
+        fused = probs.max(axis=0)
+    else:
+        raise ValueError(f"未知的融合方式: {method} (可选: {', '.join(FUSION_METHODS)})")
+    return (fused / fused.sum()).astype(np.float32)
+
+
+class FusionResult(ClassifyResult):
+    """融合结果，兼容 ClassifyResult，额外携带各视角信息"""
+    def __init__(self, fused, view_probs, names, views, method):
+        super().__init__(fused, names)
+        self.views = views
+        self.method = method
+        self.view_top1 = view_probs.argmax(axis=1)
+        self.view_top1conf = view_probs.max(axis=1)
+
+        # 一致率：单视角 top-1 与融合 top-1 相同的比例
+        self.agreement = float((self.view_top1 == self.probs.top1).mean()) if len(views) else 0.0
+
+    def topk(self, k=5):
+        """融合后的 top-k: [(类别索引, 置信度), ...]"""
+        return [(int(i), float(self.probs.data[i])) for i in topk(self.probs.data, k)]
+
+
+def classify_views(model, views, method="mean"):
+    """对一组视角做一次批量推理并融合"""
+    views = list(views)
+    if not views:
+        raise ValueError("没有可用的视角图片")
+    view_probs = predict_probs(model, views)
+    fused = fuse_probs(view_probs, method)
+    return FusionResult(fused, view_probs, model.names, views, method)
+
+
+def classify_folder(model, folder, method="mean"):
+    """融合识别文件夹中的同一文物"""
+    return classify_views(model, collect_views(folder), method)
@@ -0,0 +1,154 @@
+"""
+onnx_inference.py
+------------------
+轻量级 ONNX Runtime 推理后端
+
+特性：
+    - 仅依赖 numpy + onnxruntime + Pillow，不导入 ultralytics / torch
+    - 预处理严格复现 YOLOv8-cls: 短边缩放(BILINEAR) -> 中心裁剪 -> /255 (见 preprocess.py)
+    - softmax / top-k 与 ultralytics Probs 一致
+    - 返回结果兼容 ultralytics Results 的分类接口 (results[0].probs.top5 等)
+    - 若模型带有 embedding 输出 (export_model.py 导出时添加)，可提取分类头之前的特征向量
+"""
+
+import ast
+import os
+import threading
+
+import numpy as np
+import onnxruntime as ort
+
+from perf_stats import STATS
+from preprocess import DEFAULT_IMGSZ, BatchPreprocessor
+from results import ClassifyResult, softmax
+
+# export_model.py 为分类头之前的全局池化特征添加的输出名
+EMBEDDING_OUTPUT = "embedding"
+
+
+def _parse_names(value, num_classes):
+    """解析 ultralytics 导出时写入的 names 元数据"""
+    if value:
+        try:
+            names = ast.literal_eval(value)
+            if isinstance(names, dict):
+                return {int(k): str(v) for k, v in names.items()}
+            if isinstance(names, (list, tuple)):
+                return dict(enumerate(map(str, names)))
+        except (ValueError, SyntaxError):
+            pass
+    return {i: str(i) for i in range(num_classes or 0)}
+
+
+def _parse_imgsz(value, input_shape, default=DEFAULT_IMGSZ):
+    """解析 imgsz 元数据，缺失时取模型输入尺寸"""
+    if value:
+        try:
+            imgsz = ast.literal_eval(value)
+            return int(imgsz[0] if isinstance(imgsz, (list, tuple)) else imgsz)
+        except (ValueError, SyntaxError, TypeError, IndexError):
+            pass
+    if isinstance(input_shape[-1], int):
+        return input_shape[-1]
+    return default
+
+
+class OnnxClassifier:
+    """基于 onnxruntime 的 YOLOv8-cls 分类器"""
+    task = "classify"
+    backend = "onnxruntime"
+
+    def __init__(self, model_path, providers=None, intra_op_threads=0, fast_decode=False, decode_workers=0):
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+
+        if providers is None:
+            available = ort.get_available_providers()
+            providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+        model_input = self.session.get_inputs()[0]
+        model_output = self.session.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = model_output.name
+        output_names = [o.name for o in self.session.get_outputs()]
+        self.embedding_name = EMBEDDING_OUTPUT if EMBEDDING_OUTPUT in output_names else None
+
+        # 导出时未开启 dynamic 的模型只接受固定 batch
+        batch_dim = model_input.shape[0]
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+
+        num_classes = model_output.shape[-1] if isinstance(model_output.shape[-1], int) else None
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = _parse_names(meta.get("names"), num_classes)
+        self.imgsz = _parse_imgsz(meta.get("imgsz"), model_input.shape)
+
+        # fast_decode: JPEG 按 DCT 缩放解码，速度更快但与 ultralytics 存在细微数值差异
+        self.fast_decode = fast_decode
+        self.decode_workers = decode_workers
+        self._local = threading.local()
+
+    def _preprocessor(self):
+        """每个线程独立的预处理器 (缓冲区不可跨线程共享)"""
+        preprocessor = getattr(self._local, "preprocessor", None)
+        if preprocessor is None:
+            preprocessor = BatchPreprocessor(self.imgsz, draft=self.fast_decode, workers=self.decode_workers)
+            self._local.preprocessor = preprocessor
+        return preprocessor
+
+    def preprocess(self, sources):
+        """将图片列表转换为 NCHW float32 batch (复用的缓冲区视图)"""
+        return self._preprocessor()(sources)
+
+    def _run(self, output_name, batch):
+        """按模型支持的 batch 大小分块运行，返回指定输出的分块列表"""
+        step = self.fixed_batch or len(batch)
+        outputs = []
+        for start in range(0, len(batch), step):
+            chunk = batch[start:start + step]
+            n = len(chunk)
+            if self.fixed_batch and n < self.fixed_batch:
+                # 固定 batch 模型：不足部分补零
+                pad = np.zeros((self.fixed_batch - n,) + chunk.shape[1:], dtype=np.float32)
+                chunk = np.concatenate([chunk, pad])
+            with STATS.timed("forward", n):
+                outputs.append(self.session.run([output_name], {self.input_name: chunk})[0][:n])
+        return outputs
+
+    def forward(self, batch):
+        """运行模型，返回 (N, num_classes) 概率矩阵"""
+        outputs = self._run(self.output_name, batch)
+
+        with STATS.timed("postprocess", len(batch)):
+            probs = np.concatenate(outputs).astype(np.float32, copy=False)
+            # YOLOv8-cls 导出时已包含 softmax；若输出为 logits 则补做
+            if (probs < 0).any() or not np.allclose(probs.sum(axis=1), 1.0, atol=1e-3):
+                probs = softmax(probs, axis=1)
+        return probs
+
+    def predict_probs(self, sources):
+        """图片列表 -> 概率矩阵"""
+        if not sources:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+        return self.forward(self.preprocess(sources))
+
+    def embed(self, sources):
+        """图片列表 -> (N, D) 特征向量 (未归一化)"""
+        if self.embedding_name is None:
+            raise ValueError(f"{os.path.basename(self.model_path)} 没有 embedding 输出，请用 export_model.py 重新导出")
+        if not sources:
+            return np.empty((0, 0), dtype=np.float32)
+        outputs = self._run(self.embedding_name, self.preprocess(sources))
+        return np.concatenate(outputs).astype(np.float32, copy=False)
+
+    def __call__(self, source, **kwargs):
+        """与 YOLO(...)(source) 相同的调用方式，返回 ClassifyResult 列表"""
+        sources = list(source) if isinstance(source, (list, tuple)) else [source]
+        probs = self.predict_probs(sources)
+        return [
+            ClassifyResult(p, self.names, src if isinstance(src, (str, os.PathLike)) else None)
+            for p, src in zip(probs, sources)
+        ]
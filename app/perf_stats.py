@@ -0,0 +1,161 @@
+"""
+perf_stats.py
+--------------
+推理各阶段耗时统计 (GUI / 命令行 / HTTP 服务共用)
+
+阶段：
+    decode      图片解码 (每张)
+    localize    文物定位检测 (每张，见 roi_crop.py)
+    preprocess  缩放裁剪 + 归一化 (每张，batch 归一化按张数分摊)
+    forward     模型前向 (每个 batch)
+    postprocess softmax / 结果对象构建 (每个 batch)
+    tta         低置信度图片的增强视角推理与融合 (每张触发的图片，见 tta.py)
+    render      GUI 结果面板更新 (每次)
+
+每个阶段保留最近 window 条样本，汇总时给出单张图片分摊耗时的 p50/p95/p99，
+并按 forward 的图片数估计最近 THROUGHPUT_WINDOW 秒内的吞吐。
+全局实例 STATS 供各模块直接记录；summary() / dump() 输出 JSON 便于回归对比。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+STAGES = ("decode", "localize", "preprocess", "forward", "postprocess", "tta", "render")
+THROUGHPUT_WINDOW = 10.0
+
+
+def _ru_maxrss_mb():
+    """getrusage 峰值常驻内存 (MB)：macOS 单位为字节，其他平台为 KB；无法获取时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, OSError):
+        return None
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def rss_mb():
+    """当前进程常驻内存 (MB)；无法获取时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        pass
+    # 非 Linux 平台只能取到峰值
+    return _ru_maxrss_mb()
+
+
+def peak_rss_mb():
+    """进程启动以来的峰值常驻内存 (MB)；无法获取时返回 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return _ru_maxrss_mb()
+
+
+class PerfStats:
+    """线程安全的分阶段耗时记录器"""
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # stage -> deque[(完成时刻, 总耗时 ms, 图片数)]
+            self._samples = {stage: deque(maxlen=self.window) for stage in STAGES}
+            self._totals = {stage: [0, 0.0] for stage in STAGES}  # [图片数, 总耗时 ms]
+            self.started_at = time.perf_counter()
+
+    def record(self, stage, ms, items=1):
+        """记录一次调用的耗时 (ms)，items 为本次处理的图片数"""
+        if getattr(self._local, "muted", False):
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._samples[stage].append((now, ms, items))
+            totals = self._totals[stage]
+            totals[0] += items
+            totals[1] += ms
+
+    @contextmanager
+    def timed(self, stage, items=1):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - t0) * 1000, items)
+
+    @contextmanager
+    def muted(self):
+        """当前线程内暂停记录 (如模型预热)"""
+        self._local.muted = True
+        try:
+            yield
+        finally:
+            self._local.muted = False
+
+    def throughput(self):
+        """最近 THROUGHPUT_WINDOW 秒内 forward 处理的图片数 / 秒"""
+        now = time.perf_counter()
+        with self._lock:
+            recent = [(t, n) for t, _, n in self._samples["forward"] if now - t <= THROUGHPUT_WINDOW]
+        if not recent:
+            return 0.0
+        span = max(now - recent[0][0], 1e-3)
+        return sum(n for _, n in recent) / span
+
+    def summary(self):
+        """各阶段单张分摊耗时分位数 + 吞吐 + 内存"""
+        with self._lock:
+            snapshot = {stage: list(samples) for stage, samples in self._samples.items()}
+            totals = {stage: list(v) for stage, v in self._totals.items()}
+
+        stages = {}
+        for stage in STAGES:
+            samples = snapshot[stage]
+            images, total_ms = totals[stage]
+            if not samples:
+                stages[stage] = {"count": 0}
+                continue
+            per_image = np.array([ms / max(n, 1) for _, ms, n in samples])
+            stages[stage] = {
+                "count": images,
+                "mean_ms": round(total_ms / max(images, 1), 3),
+                "p50_ms": round(float(np.percentile(per_image, 50)), 3),
+                "p95_ms": round(float(np.percentile(per_image, 95)), 3),
+                "p99_ms": round(float(np.percentile(per_image, 99)), 3),
+            }
+
+        rss = rss_mb()
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "uptime_s": round(time.perf_counter() - self.started_at, 1),
+            "throughput_img_s": round(self.throughput(), 2),
+            "rss_mb": round(rss, 1) if rss is not None else None,
+            "stages": stages,
+        }
+
+    def dump(self, path, **extra):
+        """写出 JSON 快照，extra 中的字段 (模型名等) 一并写入"""
+        data = dict(extra, **self.summary())
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return data
+
+
+# 进程内共享的默认实例
+STATS = PerfStats()
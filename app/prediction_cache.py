@@ -0,0 +1,237 @@
+"""
+prediction_cache.py
+--------------------
+持久化识别结果缓存
+
+    - 缓存键 = 图片内容哈希 + 模型文件哈希 + 预处理版本
+      模型文件或预处理变化后键随之变化，旧结果自动失效 (.json 配置还包含其引用的模型)
+    - 两级存储：内存 LRU + 磁盘 SQLite (按总大小淘汰最久未访问的记录)
+    - 保存完整概率向量 (float32)，命中与未命中返回的结果完全一致 (多视角融合依赖完整分布)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from model_backend import backend_name, config_models, embed, predict_probs
+from preprocess import PREPROCESS_VERSION, PreparedImage
+from results import ClassifyResult
+
+CHUNK_SIZE = 1 << 20
+# 磁盘记录格式版本，变化时清空旧记录
+CACHE_FORMAT = 2
+
+
+def file_digest(path):
+    """计算文件内容哈希 (用于模型文件)"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def model_digest(path):
+    """模型哈希；.json 配置同时计入其引用的模型文件，任一模型更新后哈希随之变化"""
+    referenced = config_models(path)
+    if not referenced:
+        return file_digest(path)
+    h = hashlib.blake2b(file_digest(path).encode(), digest_size=16)
+    for model_path in referenced:
+        h.update(model_digest(model_path).encode())
+    return h.hexdigest()
+
+
+def make_key(image_bytes, model_tag):
+    """图片内容 + 模型标识 -> 缓存键"""
+    h = hashlib.blake2b(image_bytes, digest_size=16)
+    h.update(model_tag.encode())
+    return h.hexdigest()
+
+
+def _encode(probs):
+    return np.asarray(probs, dtype=np.float32).tobytes()
+
+
+def _decode(blob):
+    return np.frombuffer(blob, dtype=np.float32).copy()
+
+
+class PredictionCache:
+    """内存 LRU + SQLite 两级缓存，线程安全"""
+    def __init__(self, db_path=None, memory_entries=2048, max_disk_bytes=256 << 20):
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_check = 0
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON predictions(last_access)")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != CACHE_FORMAT:
+                # 旧版本只保存了 top-k，不能还原完整概率
+                self._db.execute("DELETE FROM predictions")
+                self._db.execute(f"PRAGMA user_version = {CACHE_FORMAT}")
+            self._db.commit()
+
+    def get(self, key):
+        """命中返回概率向量，否则返回 None"""
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT value FROM predictions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    blob = row[0]
+                    self._db.execute("UPDATE predictions SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._remember(key, blob)
+
+            if blob is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return _decode(blob)
+
+    def put(self, key, probs):
+        blob = _encode(probs)
+        with self._lock:
+            self._remember(key, blob)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, value, last_access) VALUES (?, ?, ?)",
+                    (key, blob, time.time()),
+                )
+                self._puts_since_check += 1
+
+    def commit(self):
+        """提交磁盘写入；写入量累积到一定程度时检查容量并淘汰"""
+        with self._lock:
+            if self._db is None:
+                return
+            if self._puts_since_check >= 256:
+                self._evict_disk()
+            else:
+                self._db.commit()
+
+    def flush(self):
+        """提交磁盘写入并执行淘汰"""
+        with self._lock:
+            if self._db is not None:
+                self._evict_disk()
+
+    def _remember(self, key, blob):
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """超出容量时删除最久未访问的记录，直到降到上限的 90%"""
+        self._puts_since_check = 0
+        total = self._db.execute("SELECT COALESCE(SUM(LENGTH(value) + LENGTH(key)), 0) FROM predictions").fetchone()[0]
+        if total > self.max_disk_bytes:
+            excess = total - int(self.max_disk_bytes * 0.9)
+            rows = self._db.execute("SELECT key, LENGTH(value) + LENGTH(key) FROM predictions ORDER BY last_access")
+            doomed = []
+            for key, size in rows:
+                doomed.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self._db.executemany("DELETE FROM predictions WHERE key = ?", doomed)
+        self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+
+class CachedPredictor:
+    """为推理后端加上缓存，接口与 OnnxClassifier / YOLO 调用方式一致"""
+    task = "classify"
+
+    def __init__(self, model, cache, model_hash):
+        self.model = model
+        self.cache = cache
+        self.model_hash = model_hash
+        self.names = model.names
+        self.backend = backend_name(model)
+        # 解码方式不同结果略有差异，也纳入缓存键
+        decode = "draft" if getattr(model, "fast_decode", False) else "exact"
+        self.model_tag = f"{model_hash}:{PREPROCESS_VERSION}:{decode}"
+        # 预取的 PreparedImage 按预览尺寸 draft 解码，与模型自身的解码结果不同，单独标识
+        self.prefetch_tag = f"{model_hash}:{PREPROCESS_VERSION}:prefetch"
+
+    def predict_probs(self, sources):
+        sources = list(sources)
+        probs = [None] * len(sources)
+        pending = []  # (位置, 缓存键, 推理输入)
+
+        for i, src in enumerate(sources):
+            if isinstance(src, PreparedImage):
+                data = src.data
+            elif isinstance(src, (bytes, bytearray)):
+                data = bytes(src)
+            elif isinstance(src, (str, os.PathLike)):
+                with open(src, 'rb') as f:
+                    data = f.read()
+            else:
+                pending.append((i, None, src))
+                continue
+            key = make_key(data, self.prefetch_tag if isinstance(src, PreparedImage) else self.model_tag)
+            cached = self.cache.get(key)
+            if cached is not None:
+                probs[i] = cached
+            else:
+                # onnxruntime 后端可直接解码已读入的字节，避免二次读盘
+                if isinstance(src, PreparedImage) or not hasattr(self.model, "predict_probs"):
+                    pending.append((i, key, src))
+                else:
+                    pending.append((i, key, data))
+
+        if pending:
+            fresh = predict_probs(self.model, [item for _, _, item in pending])
+            for (i, key, _), p in zip(pending, fresh):
+                probs[i] = p
+                if key is not None:
+                    self.cache.put(key, p)
+            self.cache.commit()
+
+        if not probs:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+        return np.stack(probs)
+
+    def embed(self, sources):
+        """特征向量不缓存，直接交给原始模型"""
+        return embed(self.model, sources)
+
+    def __call__(self, source, **kwargs):
+        sources = list(source) if isinstance(source, (list, tuple)) else [source]
+        probs = self.predict_probs(sources)
+        return [
+            ClassifyResult(p, self.names, src if isinstance(src, (str, os.PathLike)) else None)
+            for p, src in zip(probs, sources)
+        ]
+
+    def __getattr__(self, name):
+        # 其余属性 (imgsz / fast_decode 等) 透传给原始模型
+        return getattr(self.model, name)
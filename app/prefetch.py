@@ -0,0 +1,159 @@
+"""
+prefetch.py
+------------
+图片预取与预览缓存
+
+浏览图片列表时，后台提前处理当前图片前后 N 张：
+    - 只解码一次 (JPEG draft 模式)，同时生成显示用预览图和模型输入 (imgsz RGB uint8，随当前模型设置)
+    - 结果保存在按内存字节数限制的 LRU 中
+    - 可选：预取完成后顺带计算识别结果，写入识别缓存
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from preprocess import DEFAULT_IMGSZ, PreparedImage, open_image, resize_crop
+
+PREVIEW_SIZE = (500, 400)
+
+
+def fit_preview(img, max_w, max_h):
+    """与原显示逻辑一致的等比缩放 (宽优先，不放大)"""
+    img_ratio = img.width / img.height
+    new_w = min(img.width, max_w)
+    new_h = int(new_w / img_ratio)
+    if new_h > max_h:
+        new_h = max_h
+        new_w = int(new_h * img_ratio)
+    return img.resize((max(new_w, 1), max(new_h, 1)), Image.Resampling.LANCZOS)
+
+
+class PrefetchEntry(PreparedImage):
+    """预取结果：模型输入 + 显示预览"""
+    def __init__(self, path, data, array, preview):
+        super().__init__(path, data, array)
+        self.preview = preview
+        self.nbytes = len(data) + array.nbytes + preview.width * preview.height * 3
+
+
+class ByteBudgetLRU:
+    """按字节预算淘汰的 LRU，线程安全"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._items[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+class Prefetcher:
+    """后台预取当前图片的邻近图片"""
+    def __init__(self, max_bytes=256 << 20, radius=3, preview_size=PREVIEW_SIZE, imgsz=DEFAULT_IMGSZ, workers=2):
+        self.radius = radius
+        self.preview_size = preview_size
+        self.imgsz = imgsz
+        self.cache = ByteBudgetLRU(max_bytes)
+        self.on_loaded = None  # 可选回调 on_loaded(entry)，在后台线程调用
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        return self.cache.get(path)
+
+    def load(self, path):
+        """同步加载 (缓存未命中时由主线程调用)"""
+        entry = self.cache.get(path)
+        if entry is None:
+            entry = self._decode(path)
+            self.cache.put(path, entry)
+        return entry
+
+    def schedule(self, image_list, index):
+        """预取 index 前后 radius 张图片，取消已不在范围内的等待任务"""
+        wanted = []
+        for offset in range(1, self.radius + 1):
+            # 优先向后 (通常的浏览方向)
+            for i in (index + offset, index - offset):
+                if 0 <= i < len(image_list):
+                    wanted.append(image_list[i])
+
+        with self._lock:
+            for path, future in list(self._inflight.items()):
+                if path not in wanted and future.cancel():
+                    del self._inflight[path]
+            for path in wanted:
+                if path in self.cache or path in self._inflight:
+                    continue
+                self._inflight[path] = self._pool.submit(self._prefetch, path)
+
+    def set_imgsz(self, imgsz):
+        """切换模型时同步输入尺寸，丢弃旧尺寸的预取结果"""
+        if imgsz != self.imgsz:
+            self.imgsz = imgsz
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            for future in self._inflight.values():
+                future.cancel()
+            self._inflight.clear()
+        self.cache.clear()
+
+    def shutdown(self):
+        self.clear()
+        self._pool.shutdown(wait=False)
+
+    def _prefetch(self, path):
+        try:
+            entry = self._decode(path)
+            if entry.array.shape[0] != self.imgsz:
+                # 解码期间模型输入尺寸已变化
+                return
+            self.cache.put(path, entry)
+            if self.on_loaded is not None:
+                self.on_loaded(entry)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._inflight.pop(path, None)
+
+    def _decode(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        # draft 尺寸同时满足预览与模型输入；取正方形以兼容 EXIF 旋转
+        img = open_image(data, max(max(self.preview_size), self.imgsz), draft=True)
+        preview = fit_preview(img, *self.preview_size)
+        array = np.asarray(resize_crop(img, self.imgsz))
+        return PrefetchEntry(path, data, array, preview)
@@ -0,0 +1,179 @@
+"""
+result_export.py
+-----------------
+批量识别结果流式导出 (CSV / JSONL / Parquet)
+
+每条结果产生后立即写入文件，内存中只保留很小的缓冲区，
+十万张级别的批量识别也无需把结果全部留在界面中。
+每行包含 Top-K 的类别 ID、名称、置信度，以及模型哈希与耗时。
+
+Parquet 需要可选依赖 pyarrow。CSV / JSONL 支持追加写入 (append=True)，
+配合 sync() 作为常驻任务的持久化结果日志。
+"""
+
+import csv
+import json
+import os
+import time
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+
+def export_columns(k):
+    columns = ["index", "path", "model_hash", "time", "latency_ms", "error"]
+    for rank in range(1, k + 1):
+        columns += [f"top{rank}_id", f"top{rank}_name", f"top{rank}_conf"]
+    return columns
+
+
+def format_for_path(path):
+    """按扩展名推断导出格式"""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: .{ext} (可选 {', '.join(EXPORT_FORMATS)})")
+    return ext
+
+
+class CsvWriter:
+    def __init__(self, path, columns, append=False):
+        # 追加到已有文件时不再写表头 (也不再写 BOM)
+        has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+        # utf-8-sig: Excel 打开时中文不乱码
+        encoding = 'utf-8' if has_header else 'utf-8-sig'
+        self._file = open(path, 'a' if append else 'w', encoding=encoding, newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        if not has_header:
+            self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def flush(self):
+        self._file.flush()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, columns, append=False):
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, row):
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """按 row group 分块写入，缓冲区达到 row_group_size 行即落盘"""
+    def __init__(self, path, columns, append=False, row_group_size=4096):
+        if append:
+            raise ValueError("Parquet 文件不支持追加写入，请使用 .csv 或 .jsonl")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("导出 Parquet 需要安装 pyarrow: pip install pyarrow")
+
+        def column_type(name):
+            if name == "index":
+                return pa.int64()
+            if name == "latency_ms" or name.endswith("_conf"):
+                return pa.float64()
+            return pa.string()
+
+        self._pa = pa
+        self._schema = pa.schema([(name, column_type(name)) for name in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+        self.row_group_size = row_group_size
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self._write_group()
+
+    def flush(self):
+        # 行组凑满时才写入，避免产生大量很小的 row group
+        pass
+
+    def _write_group(self):
+        if self._rows:
+            table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+            self._writer.write_table(table)
+            self._rows = []
+
+    def close(self):
+        self._write_group()
+        self._writer.close()
+
+
+_WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+class ResultExporter:
+    """将 BatchPipeline 的结果记录逐条写入文件
+
+    可直接作为 BatchPipeline 的 sink，在推理线程中调用。
+    """
+    def __init__(self, path, names, id_to_name=None, model_hash="", k=5, flush_every=256, append=False):
+        self.path = path
+        self.names = names
+        self.id_to_name = id_to_name or {}
+        self.model_hash = model_hash
+        self.k = k
+        self.flush_every = flush_every
+        self.count = 0
+        self.format = format_for_path(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._writer = _WRITERS[self.format](path, export_columns(k), append=append)
+
+    def row(self, record):
+        """结果记录 -> 导出行"""
+        row = {
+            "index": record["index"],
+            "path": record["path"],
+            "model_hash": self.model_hash,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "latency_ms": round(record["latency_ms"], 3),
+            "error": record["error"],
+        }
+        for rank in range(1, self.k + 1):
+            if rank <= len(record["topk"]):
+                idx, conf = record["topk"][rank - 1]
+                class_id = self.names[idx]
+                row[f"top{rank}_id"] = class_id.lstrip('_')
+                row[f"top{rank}_name"] = self.id_to_name.get(class_id.lstrip('_'), class_id)
+                row[f"top{rank}_conf"] = round(conf, 6)
+            else:
+                row[f"top{rank}_id"] = row[f"top{rank}_name"] = row[f"top{rank}_conf"] = None
+        return row
+
+    def write(self, record):
+        self._writer.write(self.row(record))
+        self.count += 1
+        # 定期落盘，中途退出时已写入的结果不会丢失
+        if self.count % self.flush_every == 0:
+            self._writer.flush()
+
+    __call__ = write
+
+    def sync(self):
+        """写入内容刷到磁盘 (fsync)，返回后即使断电也不会丢失"""
+        self._writer.sync()
+
+    def close(self):
+        self._writer.close()
@@ -0,0 +1,52 @@
+"""
+results.py
+-----------
+与 ultralytics Results 分类接口兼容的轻量结果对象 (仅依赖 numpy)
+
+GUI 与脚本统一通过 results[0].probs.top5 / top5conf / names 读取结果，
+无需区分推理后端。
+"""
+
+import numpy as np
+
+
+def softmax(x, axis=-1):
+    """数值稳定的 softmax"""
+    x = x - x.max(axis=axis, keepdims=True)
+    e = np.exp(x)
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+def topk(probs, k=5):
+    """按概率降序返回前 k 个类别索引 (与 Probs.top5 排序一致)"""
+    return (-probs).argsort(kind="stable")[:k]
+
+
+class Probs:
+    """与 ultralytics Probs 接口兼容的分类概率"""
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def top1(self):
+        return int(self.data.argmax())
+
+    @property
+    def top5(self):
+        return topk(self.data, 5).tolist()
+
+    @property
+    def top1conf(self):
+        return self.data[self.top1]
+
+    @property
+    def top5conf(self):
+        return self.data[self.top5]
+
+
+class ClassifyResult:
+    """与 ultralytics Results 接口兼容的单张图片结果"""
+    def __init__(self, probs, names, path=None):
+        self.probs = Probs(probs)
+        self.names = names
+        self.path = path
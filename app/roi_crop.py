@@ -0,0 +1,254 @@
+"""
+roi_crop.py
+------------
+文物定位 + 裁剪后分类 (两阶段推理)
+
+照片中文物往往只占一部分，展柜、标签、其他展品等背景既干扰分类，
+又迫使分类器使用较大的输入尺寸：
+    - 第一阶段：单类别小型 YOLOv8 检测器 (scripts/train_localizer.py 用数据集中
+      main.txt / angle_N.txt 的标注框训练) 定位文物，每张图片只取置信度最高的框
+    - 框按 pad 向外扩展并补成正方形后裁剪，分类器的中心裁剪不会再切掉文物
+    - 第二阶段：分类器只看裁剪区域，可使用更小的输入尺寸 (如 160，
+      对应 data_augment.py --roi 生成的裁剪数据集)
+    - 未检测到文物 (置信度低于 min_conf) 时退回整图分类
+
+配置写入 models/roi.json：
+    {"localizer": "localizer/localizer.onnx", "classifier": "best.onnx", "pad": 0.1, "min_conf": 0.25}
+load_model() 遇到含 "localizer" 的 .json 配置时自动创建 RoiClassifier。
+ONNX 检测器直接使用 onnxruntime (无需 torch)，.pt 检测器使用 ultralytics。
+"""
+
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from cascade import read_config as _read_config
+from model_backend import _model_lock, embed, load_model, predict_probs
+from perf_stats import STATS
+from preprocess import DEFAULT_IMGSZ, PreparedImage, open_image, resize_crop
+from results import ClassifyResult
+
+DEFAULT_CONFIG = os.path.join("models", "roi.json")
+DEFAULT_LOCALIZER_IMGSZ = 320
+# 按分类器输入的倍数做 JPEG 缩放解码：框只占图片一部分时裁剪区域仍足够清晰
+DRAFT_FACTOR = 4
+LETTERBOX_FILL = (114, 114, 114)
+
+
+def letterbox(img, size):
+    """等比缩放并居中填充为 size x size，返回 (CHW float32, 缩放比例, (左填充, 上填充))"""
+    w, h = img.size
+    scale = size / max(w, h)
+    new_w, new_h = max(1, round(w * scale)), max(1, round(h * scale))
+    canvas = Image.new("RGB", (size, size), LETTERBOX_FILL)
+    pad = ((size - new_w) // 2, (size - new_h) // 2)
+    canvas.paste(img.resize((new_w, new_h), Image.Resampling.BILINEAR), pad)
+    return np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0, scale, pad
+
+
+def square_box(box, width, height, pad=0.1):
+    """(x1, y1, x2, y2) -> 向外扩展 pad 并补成正方形的整数框，尽量保持在图片内"""
+    x1, y1, x2, y2 = box
+    side = max(x2 - x1, y2 - y1) * (1 + 2 * pad)
+    side = min(side, max(width, height))
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    left = min(max(cx - side / 2, 0), max(width - side, 0))
+    top = min(max(cy - side / 2, 0), max(height - side, 0))
+    return (int(left), int(top), int(min(left + side, width)), int(min(top + side, height)))
+
+
+def yolo_label_box(line, width, height):
+    """YOLO 标注行 "cls cx cy w h" (归一化) -> 像素坐标 (x1, y1, x2, y2)；格式错误返回 None"""
+    parts = line.split()
+    if len(parts) < 5:
+        return None
+    try:
+        cx, cy, w, h = (float(v) for v in parts[1:5])
+    except ValueError:
+        return None
+    if w <= 0 or h <= 0:
+        return None
+    return ((cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height)
+
+
+class OnnxLocalizer:
+    """onnxruntime 运行的 YOLOv8 检测器"""
+    backend = "onnxruntime"
+
+    def __init__(self, model_path, providers=None, intra_op_threads=0):
+        import onnxruntime as ort
+        from onnx_inference import _parse_imgsz
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if providers is None:
+            available = ort.get_available_providers()
+            providers = [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider") if p in available]
+
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        batch_dim = model_input.shape[0]
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        self.imgsz = _parse_imgsz(self.session.get_modelmeta().custom_metadata_map.get("imgsz"),
+                                  model_input.shape, DEFAULT_LOCALIZER_IMGSZ)
+
+    def detect(self, images):
+        """PIL.Image 列表 -> 每张图片最高分的框 (x1, y1, x2, y2, conf)，坐标为原图像素"""
+        if not images:
+            return []
+        batch = np.empty((len(images), 3, self.imgsz, self.imgsz), dtype=np.float32)
+        transforms = []
+        for i, img in enumerate(images):
+            batch[i], scale, pad = letterbox(img, self.imgsz)
+            transforms.append((scale, pad))
+
+        step = self.fixed_batch or len(batch)
+        outputs = []
+        for start in range(0, len(batch), step):
+            chunk = batch[start:start + step]
+            n = len(chunk)
+            if self.fixed_batch and n < self.fixed_batch:
+                chunk = np.concatenate([chunk, np.zeros((self.fixed_batch - n,) + chunk.shape[1:], dtype=np.float32)])
+            outputs.append(self.session.run([self.output_name], {self.input_name: chunk})[0][:n])
+        # YOLOv8 检测输出 (N, 4 + 类别数, 候选框数)：前 4 行为输入尺度下的 cx, cy, w, h
+        preds = np.concatenate(outputs)
+        scores = preds[:, 4:, :].max(axis=1)
+        best = scores.argmax(axis=1)
+
+        boxes = []
+        for i, (img, (scale, (pad_x, pad_y))) in enumerate(zip(images, transforms)):
+            cx, cy, w, h = preds[i, :4, best[i]]
+            width, height = img.size
+            x1 = float(np.clip((cx - w / 2 - pad_x) / scale, 0, width))
+            y1 = float(np.clip((cy - h / 2 - pad_y) / scale, 0, height))
+            x2 = float(np.clip((cx + w / 2 - pad_x) / scale, 0, width))
+            y2 = float(np.clip((cy + h / 2 - pad_y) / scale, 0, height))
+            boxes.append((x1, y1, x2, y2, float(scores[i, best[i]])))
+        return boxes
+
+
+class UltralyticsLocalizer:
+    """ultralytics 运行的检测器 (.pt 或未安装 onnxruntime 时)"""
+    backend = "ultralytics"
+
+    def __init__(self, model_path, imgsz=None):
+        from ultralytics import YOLO
+        self.model = YOLO(model_path, task="detect")
+        self.imgsz = imgsz or self.model.overrides.get("imgsz") or DEFAULT_LOCALIZER_IMGSZ
+
+    def detect(self, images):
+        if not images:
+            return []
+        with _model_lock(self.model):
+            results = self.model(list(images), imgsz=self.imgsz, conf=0.001, verbose=False)
+        boxes = []
+        for r in results:
+            if len(r.boxes):
+                j = int(r.boxes.conf.argmax())
+                x1, y1, x2, y2 = (float(v) for v in r.boxes.xyxy[j].tolist())
+                boxes.append((x1, y1, x2, y2, float(r.boxes.conf[j])))
+            else:
+                boxes.append(None)
+        return boxes
+
+
+def load_localizer(path, prefer_onnxruntime=True, providers=None, intra_op_threads=0):
+    if str(path).lower().endswith(".onnx") and prefer_onnxruntime:
+        try:
+            return OnnxLocalizer(path, providers, intra_op_threads)
+        except ImportError:
+            pass
+    return UltralyticsLocalizer(path)
+
+
+class RoiClassifier:
+    """检测器定位 + 裁剪后分类，接口与 OnnxClassifier 一致"""
+    task = "classify"
+    backend = "roi"
+
+    def __init__(self, localizer, classifier, pad=0.1, min_conf=0.25):
+        self.localizer = localizer
+        self.classifier = classifier
+        self.pad = pad
+        self.min_conf = min_conf
+        self.names = classifier.names
+        self.imgsz = getattr(classifier, "imgsz", None) or DEFAULT_IMGSZ
+        self.fast_decode = getattr(classifier, "fast_decode", False)
+        self.total = 0
+        self.localized = 0
+
+    @property
+    def localize_rate(self):
+        return self.localized / self.total if self.total else 0.0
+
+    def _full_frame(self, src):
+        """解码整张照片；预取得到的 PreparedImage 只含中心裁剪，改用其原始字节或路径"""
+        if isinstance(src, PreparedImage):
+            if src.data:
+                src = src.data
+            elif src.path:
+                src = src.path
+        return open_image(src, self.imgsz * DRAFT_FACTOR, draft=True)
+
+    def crop(self, sources):
+        """图片列表 -> (裁剪缩放后的 PreparedImage 列表, 检测框列表)"""
+        with STATS.timed("decode", len(sources)):
+            images = [self._full_frame(src) for src in sources]
+        with STATS.timed("localize", len(sources)):
+            boxes = self.localizer.detect(images)
+
+        prepared = []
+        for src, img, box in zip(sources, images, boxes):
+            if box is not None and box[4] >= self.min_conf:
+                img = img.crop(square_box(box[:4], img.width, img.height, self.pad))
+                self.localized += 1
+            path = src if isinstance(src, (str, os.PathLike)) else getattr(src, "path", None)
+            prepared.append(PreparedImage(path, None, np.asarray(resize_crop(img, self.imgsz))))
+        self.total += len(sources)
+        return prepared, boxes
+
+    def predict_probs(self, sources):
+        sources = list(sources)
+        if not sources:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+        prepared, _ = self.crop(sources)
+        return np.asarray(predict_probs(self.classifier, prepared), dtype=np.float32)
+
+    def embed(self, sources):
+        """特征向量取自裁剪区域"""
+        return embed(self.classifier, self.crop(list(sources))[0])
+
+    def __call__(self, source, **kwargs):
+        sources = list(source) if isinstance(source, (list, tuple)) else [source]
+        probs = self.predict_probs(sources)
+        return [
+            ClassifyResult(p, self.names, src if isinstance(src, (str, os.PathLike)) else None)
+            for p, src in zip(probs, sources)
+        ]
+
+
+def is_roi_config(config_path):
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return "localizer" in json.load(f)
+    except (OSError, ValueError):
+        return False
+
+
+def read_config(config_path):
+    """读取 ROI 配置 (相对路径解析方式与级联配置相同)"""
+    return _read_config(config_path, ("localizer", "classifier"))
+
+
+def load_roi(config_path, prefer_onnxruntime=True, **kwargs):
+    """根据配置文件创建两阶段模型"""
+    config = read_config(config_path)
+    localizer = load_localizer(config["localizer"], prefer_onnxruntime, kwargs.get("providers"),
+                               kwargs.get("intra_op_threads", 0))
+    classifier = load_model(config["classifier"], prefer_onnxruntime, **kwargs)
+    return RoiClassifier(localizer, classifier, config.get("pad", 0.1), config.get("min_conf", 0.25))
@@ -0,0 +1,316 @@
+"""
+session_pool.py
+----------------
+多会话并行推理 (多核 CPU 扩展)
+
+单个 ONNX / YOLO 会话在并发负载下要么用不满 32 核，要么线程数过多互相争抢。
+SessionPool 创建 workers 个独立会话，每个会话 intra_op_threads 个计算线程，
+所有 batch 通过一个共享队列分发给空闲的会话：
+    - thread  模式：同一进程内多个 onnxruntime 会话 (推理时释放 GIL)，适合 .onnx
+    - process 模式：每个会话一个子进程，适合 ultralytics (.pt)，torch 线程数按进程设置
+    - pin=True 时每个会话绑定到互不重叠的一组 CPU (仅 Linux，sched_setaffinity)，
+      计算线程在绑定之后创建，因此继承同一组 CPU
+
+SessionPool 提供与 OnnxClassifier 相同的 names / predict_probs / __call__ 接口，
+可直接交给 BatchPipeline、HTTP 服务等使用。
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from model_backend import load_model, predict_probs
+from results import ClassifyResult
+
+POOL_MODES = ("auto", "thread", "process")
+
+
+def available_cpus():
+    """当前进程可用的 CPU 编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_sets(workers, threads_per_worker):
+    """为每个会话划分 threads_per_worker 个 CPU；核数不足时循环复用"""
+    cpus = available_cpus()
+    sets = []
+    for i in range(workers):
+        start = i * threads_per_worker
+        sets.append({cpus[(start + j) % len(cpus)] for j in range(threads_per_worker)})
+    return sets
+
+
+def pin_current_thread(cpus):
+    """把调用线程绑定到指定 CPU (Linux 下 pid 0 即当前线程)，不支持时返回 False"""
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return False
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError:
+        return False
+    return True
+
+
+def load_worker_model(model_path, threads):
+    """按线程数加载一个会话；ultralytics 后端通过 torch 设置线程数"""
+    model = load_model(model_path, intra_op_threads=threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+    return model
+
+
+def _process_worker(index, model_path, threads, cpus, tasks, results):
+    """子进程：加载会话后循环处理 (task_id, sources)，收到 None 退出"""
+    pin_current_thread(cpus)
+    try:
+        model = load_worker_model(model_path, threads)
+    except Exception as e:
+        results.put(("ready", None, str(e)))
+        return
+    results.put(("ready", (dict(model.names), getattr(model, "imgsz", None)), None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, sources = task
+        # 先报告领取了哪个任务：进程中途崩溃时主进程据此让对应 Future 失败
+        results.put(("start", (index, task_id), None))
+        try:
+            results.put((task_id, np.asarray(predict_probs(model, sources), dtype=np.float32), None))
+        except Exception as e:
+            results.put((task_id, None, str(e)))
+
+
+class SessionPool:
+    """多个推理会话共享一个任务队列"""
+    task = "classify"
+    backend = "pool"
+
+    def __init__(self, model_path, workers=None, intra_op_threads=1, pin=False, mode="auto", batch=16):
+        if mode not in POOL_MODES:
+            raise ValueError(f"不支持的模式: {mode} (可选 {', '.join(POOL_MODES)})")
+        if mode == "auto":
+            mode = "thread" if str(model_path).lower().endswith(".onnx") else "process"
+        self.model_path = model_path
+        self.workers = workers or max(1, len(available_cpus()) // intra_op_threads)
+        self.intra_op_threads = intra_op_threads
+        self.mode = mode
+        self.batch = batch
+        self.names = None
+        self.imgsz = None
+        self.pinned = False
+        self._cpu_sets = cpu_sets(self.workers, intra_op_threads) if pin else [None] * self.workers
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._crash_error = None
+
+        if mode == "thread":
+            self._start_threads()
+        else:
+            self._start_processes()
+
+    # ---------- thread 模式 ----------
+
+    def _start_threads(self):
+        self._tasks = queue.Queue()
+        self._threads = []
+        ready = queue.Queue()
+        for cpus in self._cpu_sets:
+            t = threading.Thread(target=self._thread_worker, args=(cpus, ready), daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._wait_ready(ready.get)
+
+    def _thread_worker(self, cpus, ready):
+        pinned = pin_current_thread(cpus)
+        try:
+            # 会话在绑定后创建，其计算线程继承相同的 CPU 集合
+            model = load_worker_model(self.model_path, self.intra_op_threads)
+        except Exception as e:
+            ready.put(("ready", None, str(e)))
+            return
+        self.pinned = self.pinned or pinned
+        ready.put(("ready", model, None))
+
+        while True:
+            item = self._tasks.get()
+            if item is None:
+                break
+            sources, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(np.asarray(predict_probs(model, sources), dtype=np.float32))
+            except Exception as e:
+                future.set_exception(e)
+
+    # ---------- process 模式 ----------
+
+    def _start_processes(self):
+        # spawn：子进程不继承父进程中已初始化的线程池 / GUI 状态
+        ctx = multiprocessing.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._processes = []
+        for index, cpus in enumerate(self._cpu_sets):
+            p = ctx.Process(target=_process_worker,
+                            args=(index, self.model_path, self.intra_op_threads, cpus, self._tasks, self._results),
+                            daemon=True)
+            p.start()
+            self._processes.append(p)
+        self.pinned = any(self._cpu_sets) and hasattr(os, "sched_setaffinity")
+        self._wait_ready(self._next_ready)
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+
+    def _next_ready(self):
+        """子进程在报告就绪前崩溃 (如导入失败) 时不再无限等待"""
+        while True:
+            try:
+                return self._results.get(timeout=1.0)
+            except queue.Empty:
+                crashed = [p.exitcode for p in self._processes if p.exitcode not in (None, 0)]
+                if crashed:
+                    return ("ready", None, f"工作进程异常退出 (exit code {crashed[0]})")
+
+    def _collect_results(self):
+        held = {}  # 工作进程编号 -> 最近领取的 task_id
+        crashed = set()
+        while True:
+            try:
+                task_id, probs, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_crashed(held, crashed)
+                continue
+            except (EOFError, OSError):
+                break
+            if task_id is None:
+                break
+            if task_id == "start":
+                index, started = probs
+                held[index] = started
+            else:
+                self._resolve(task_id, probs, error)
+            # 其他进程持续返回结果时队列不会空闲，每条消息后也检查一次
+            self._check_crashed(held, crashed)
+
+    def _resolve(self, task_id, probs, error):
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(probs)
+
+    def _check_crashed(self, held, crashed):
+        """运行中崩溃的工作进程：其正在处理的任务失败；全部崩溃时所有等待中的任务失败"""
+        if self._closed:
+            return
+        for index, p in enumerate(self._processes):
+            if index not in crashed:
+                if p.exitcode is None:
+                    continue
+                crashed.add(index)
+            # 崩溃前发出的领取消息可能晚于首次检查到达，之后的检查仍会处理
+            if index in held:
+                self._resolve(held.pop(index), None, f"工作进程异常退出 (exit code {p.exitcode})")
+        if len(crashed) == len(self._processes) and self._crash_error is None:
+            self._crash_error = f"全部工作进程异常退出 (exit code {self._processes[0].exitcode})"
+            with self._lock:
+                pending, self._futures = self._futures, {}
+            for future in pending.values():
+                future.set_exception(RuntimeError(self._crash_error))
+
+    # ---------- 公共接口 ----------
+
+    def _wait_ready(self, get):
+        """等待全部会话加载完成；任一失败则关闭整个池"""
+        errors = []
+        for _ in range(self.workers):
+            _, model, error = get()
+            if error is not None:
+                errors.append(error)
+            elif self.names is None:
+                if isinstance(model, tuple):
+                    # process 模式只传回 (names, imgsz)
+                    self.names, self.imgsz = model
+                else:
+                    self.names = model.names
+                    self.imgsz = getattr(model, "imgsz", None)
+        if errors:
+            self.close()
+            raise RuntimeError(f"会话加载失败: {errors[0]}")
+
+    def submit(self, sources):
+        """提交一个 batch，返回 Future[(N, num_classes) 概率]"""
+        if self._closed:
+            raise RuntimeError("SessionPool 已关闭")
+        if self._crash_error is not None:
+            raise RuntimeError(self._crash_error)
+        sources = list(sources)
+        future = Future()
+        if self.mode == "thread":
+            self._tasks.put((sources, future))
+        else:
+            future.set_running_or_notify_cancel()
+            task_id = next(self._ids)
+            with self._lock:
+                self._futures[task_id] = future
+            self._tasks.put((task_id, sources))
+        return future
+
+    def predict_probs(self, sources):
+        """按 batch 大小拆分后并行执行，结果保持输入顺序"""
+        sources = list(sources)
+        if not sources:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+        futures = [self.submit(sources[i:i + self.batch]) for i in range(0, len(sources), self.batch)]
+        return np.concatenate([f.result() for f in futures])
+
+    def __call__(self, source, **kwargs):
+        sources = list(source) if isinstance(source, (list, tuple)) else [source]
+        probs = self.predict_probs(sources)
+        return [
+            ClassifyResult(p, self.names, src if isinstance(src, (str, os.PathLike)) else None)
+            for p, src in zip(probs, sources)
+        ]
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in range(self.workers):
+            self._tasks.put(None)
+        if self.mode == "thread":
+            for t in self._threads:
+                t.join(timeout=5)
+        else:
+            for p in self._processes:
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+            self._results.put((None, None, None))
+            with self._lock:
+                pending, self._futures = self._futures, {}
+            for future in pending.values():
+                future.set_exception(RuntimeError("SessionPool 已关闭"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,151 @@
+"""
+tta.py
+-------
+低置信度图片的批量测试时增强 (TTA)
+
+细粒度文物中的难例单次前向置信度往往不高：
+    - 先按常规方式识别整个 batch
+    - 仅 top-1 置信度低于 min_conf 或 top-1 与 top-2 差值低于 min_margin 的图片
+      展开为多个视角 (水平翻转、±10° 旋转、中心放大裁剪，与训练时的增强相近)
+    - 全部难例的全部视角拼成一个 batch 只做一次前向，原图视角直接复用第一次的结果
+    - 各视角按对数概率平均融合 (等价于 logits 平均后再 softmax)
+
+TTAClassifier 接口与 OnnxClassifier 相同，可包装单模型后端，
+并统计触发比例以及 TTA 相对常规推理增加的耗时。
+视角是已缩放裁剪的模型输入，不适用于级联 (两个模型输入尺寸可能不同)
+与定位裁剪 (需要原图定位)，这两种后端会被拒绝。
+"""
+
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from cascade import needs_escalation
+from model_backend import backend_name, embed, predict_probs
+from multiview import FUSION_METHODS, fuse_probs
+from perf_stats import STATS
+from preprocess import DEFAULT_IMGSZ, PreparedImage, load_uint8
+from results import ClassifyResult
+
+CROP_RATIO = 0.875
+
+
+def _center_crop(img):
+    """中心放大裁剪，输出尺寸不变"""
+    w, h = img.size
+    cw, ch = int(w * CROP_RATIO), int(h * CROP_RATIO)
+    left, top = (w - cw) // 2, (h - ch) // 2
+    return img.crop((left, top, left + cw, top + ch)).resize((w, h), Image.Resampling.BILINEAR)
+
+
+# 视角名称 -> 作用于已缩放裁剪的 PIL.Image 的变换
+TTA_VIEWS = {
+    "hflip": ImageOps.mirror,
+    "rot+10": lambda img: img.rotate(10, resample=Image.Resampling.BILINEAR),
+    "rot-10": lambda img: img.rotate(-10, resample=Image.Resampling.BILINEAR),
+    "crop": _center_crop,
+    "hflip_crop": lambda img: _center_crop(ImageOps.mirror(img)),
+}
+DEFAULT_VIEWS = ("hflip", "rot+10", "rot-10", "crop")
+
+
+def expand_views(source, size, views):
+    """一张图片 -> 各视角的 PreparedImage (只解码一次，不含原图视角)"""
+    base = Image.fromarray(load_uint8(source, size))
+    return [PreparedImage(None, None, np.asarray(TTA_VIEWS[name](base))) for name in views]
+
+
+# 需要原始图片的组合后端，无法直接接收 TTA 视角
+UNSUPPORTED_BACKENDS = ("cascade", "roi")
+
+
+class TTAClassifier:
+    """按置信度触发的批量 TTA，接口与 OnnxClassifier 一致"""
+    task = "classify"
+
+    def __init__(self, model, min_conf=0.5, min_margin=0.0, views=DEFAULT_VIEWS, fusion="logmean"):
+        if backend_name(model) in UNSUPPORTED_BACKENDS:
+            raise ValueError(f"TTA 不支持 {backend_name(model)} 后端，请直接使用单个模型文件")
+        unknown = [v for v in views if v not in TTA_VIEWS]
+        if unknown:
+            raise ValueError(f"未知的 TTA 视角: {', '.join(unknown)} (可选: {', '.join(TTA_VIEWS)})")
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"未知的融合方式: {fusion} (可选: {', '.join(FUSION_METHODS)})")
+        self.model = model
+        self.min_conf = min_conf
+        self.min_margin = min_margin
+        self.views = tuple(views)
+        self.fusion = fusion
+        self.names = model.names
+        self.imgsz = getattr(model, "imgsz", None) or DEFAULT_IMGSZ
+        self.fast_decode = getattr(model, "fast_decode", False)
+        self.backend = f"{backend_name(model)}+tta"
+        self.total = 0
+        self.triggered = 0
+        self.base_ms = 0.0
+        self.tta_ms = 0.0
+
+    @property
+    def trigger_rate(self):
+        return self.triggered / self.total if self.total else 0.0
+
+    @property
+    def overhead(self):
+        """TTA 额外耗时 / 常规推理耗时"""
+        return self.tta_ms / self.base_ms if self.base_ms else 0.0
+
+    def stats(self):
+        return {
+            "views": len(self.views) + 1,
+            "min_conf": self.min_conf,
+            "min_margin": self.min_margin,
+            "images": self.total,
+            "triggered": self.triggered,
+            "trigger_rate": round(self.trigger_rate, 5),
+            "base_ms": round(self.base_ms, 3),
+            "tta_ms": round(self.tta_ms, 3),
+            "overhead": round(self.overhead, 5),
+        }
+
+    def predict_probs(self, sources):
+        sources = list(sources)
+        if not sources:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+
+        t0 = time.perf_counter()
+        probs = np.array(predict_probs(self.model, sources), dtype=np.float32)
+        t1 = time.perf_counter()
+
+        hard = np.flatnonzero(needs_escalation(probs, self.min_conf, self.min_margin))
+        if len(hard):
+            # 所有难例的全部视角合成一个 batch
+            expanded = []
+            for i in hard:
+                expanded.extend(expand_views(sources[i], self.imgsz, self.views))
+            view_probs = np.asarray(predict_probs(self.model, expanded), dtype=np.float32)
+            k = len(self.views)
+            for j, i in enumerate(hard):
+                probs[i] = fuse_probs(np.vstack([probs[i:i + 1], view_probs[j * k:(j + 1) * k]]), self.fusion)
+        t2 = time.perf_counter()
+
+        if len(hard):
+            STATS.record("tta", (t2 - t1) * 1000, len(hard))
+        self.total += len(sources)
+        self.triggered += len(hard)
+        self.base_ms += (t1 - t0) * 1000
+        self.tta_ms += (t2 - t1) * 1000
+        return probs
+
+    def embed(self, sources):
+        """特征向量取自原图"""
+        return embed(self.model, sources)
+
+    def __call__(self, source, **kwargs):
+        sources = list(source) if isinstance(source, (list, tuple)) else [source]
+        probs = self.predict_probs(sources)
+        return [
+            ClassifyResult(p, self.names, src if isinstance(src, (str, os.PathLike)) else None)
+            for p, src in zip(probs, sources)
+        ]
@@ -0,0 +1,375 @@
+"""
+watch_folder.py
+----------------
+监视文件夹的常驻识别服务 (无界面)
+
+工作人员把新照片放进共享文件夹后自动识别，无需手动导入 GUI：
+    - Linux 下优先使用 inotify (可选依赖 inotify_simple)，否则定时轮询扫描；
+      网络共享目录收不到 inotify 事件时请使用 --poll
+    - 新文件大小与修改时间在 settle 秒内不再变化才认为写入完成 (防抖)
+    - 就绪的图片凑成小 batch 一起推理 (最多 batch 张或等待 max_wait 秒)
+    - 结果逐批追加到 JSONL 日志并 fsync，之后才写入检查点 (SQLite)
+    - 重启时跳过检查点中大小与修改时间未变的文件；检查点之后日志中已有的
+      结果 (写完日志、未写检查点时中断) 会补记到检查点，不会重复识别
+
+Usage:
+    python app/watch_folder.py --watch D:/share/photos --model models/best.onnx
+    python app/watch_folder.py --watch dir1 --watch dir2 --log runs/watch/results.jsonl --poll
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from image_index import is_image_file, load_id_mapping, scan_images
+from model_backend import backend_name, load_model, predict_probs, warmup
+from prediction_cache import model_digest
+from result_export import ResultExporter
+from results import topk
+
+# 复制中的临时文件 (浏览器下载、rsync、Office 等) 不识别
+TEMP_SUFFIXES = ('.part', '.tmp', '.crdownload', '.partial')
+
+
+def is_candidate(path):
+    name = os.path.basename(path)
+    if name.startswith(('.', '~$')) or name.lower().endswith(TEMP_SUFFIXES):
+        return False
+    return is_image_file(name)
+
+
+def file_state(path):
+    """(大小, 修改时间 ns)；文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class Checkpoint:
+    """已处理文件登记表：路径 -> (大小, 修改时间)，以及日志已确认的字节位置"""
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, done_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        # 轮询时每个文件都要判断一次，全部载入内存
+        self._done = {path: (size, mtime) for path, size, mtime in
+                      self._db.execute("SELECT path, size, mtime_ns FROM processed")}
+
+    def __len__(self):
+        return len(self._done)
+
+    def is_done(self, path, state):
+        return self._done.get(path) == state
+
+    @property
+    def log_offset(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'log_offset'").fetchone()
+        return int(row[0]) if row else 0
+
+    def mark(self, entries, log_offset):
+        """entries: [(path, (size, mtime_ns))]，与日志位置在同一事务中提交"""
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO processed (path, size, mtime_ns, done_at) VALUES (?, ?, ?, ?)",
+            [(path, size, mtime, now) for path, (size, mtime) in entries],
+        )
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('log_offset', ?)", (str(log_offset),))
+        self._db.commit()
+        self._done.update(entries)
+
+    def close(self):
+        self._db.close()
+
+
+class PollingWatcher:
+    """定时全量扫描，适用于任何文件系统 (包括网络共享)"""
+    name = "polling"
+
+    def __init__(self, roots, interval=2.0, recursive=True):
+        self.roots = roots
+        self.interval = interval
+        self.recursive = recursive
+        self._next_scan = 0.0
+
+    def poll(self, timeout):
+        """等待至多 timeout 秒，返回可能新增或改动的路径"""
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0))
+        self._next_scan = time.monotonic() + self.interval
+        return [path for root in self.roots for path in scan_images(root, self.recursive)]
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """基于 inotify 的事件监视 (仅 Linux，需要 inotify_simple)
+
+    inotify 不递归，新建子目录时为其添加监视并扫描已有内容；
+    事件队列溢出时退化为一次全量扫描。
+    """
+    name = "inotify"
+
+    def __init__(self, roots, recursive=True):
+        from inotify_simple import INotify, flags
+        self._flags = flags
+        self._inotify = INotify()
+        self._dirs = {}
+        self.roots = roots
+        self.recursive = recursive
+        self._pending_scan = list(roots)
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch(self, folder):
+        mask = self._flags.CLOSE_WRITE | self._flags.MOVED_TO | self._flags.CREATE
+        try:
+            self._dirs[self._inotify.add_watch(folder, mask)] = folder
+        except OSError:
+            pass
+
+    def _watch_tree(self, root):
+        self._watch(root)
+        if not self.recursive:
+            return
+        for folder, subdirs, _ in os.walk(root):
+            for name in subdirs:
+                self._watch(os.path.join(folder, name))
+
+    def poll(self, timeout):
+        paths = []
+        # 启动、新建子目录或溢出后补扫
+        while self._pending_scan:
+            paths.extend(scan_images(self._pending_scan.pop(), self.recursive))
+        if paths:
+            return paths
+
+        for event in self._inotify.read(timeout=int(timeout * 1000)):
+            if event.mask & self._flags.Q_OVERFLOW:
+                self._pending_scan.extend(self.roots)
+                continue
+            folder = self._dirs.get(event.wd)
+            if folder is None or not event.name:
+                continue
+            path = os.path.join(folder, event.name)
+            if event.mask & self._flags.ISDIR:
+                if self.recursive:
+                    self._watch_tree(path)
+                    self._pending_scan.append(path)
+            else:
+                paths.append(path)
+        return paths
+
+    def close(self):
+        self._inotify.close()
+
+
+def create_watcher(roots, poll=False, interval=2.0, recursive=True):
+    """优先 inotify，不可用时退回轮询"""
+    if not poll:
+        try:
+            return InotifyWatcher(roots, recursive)
+        except (ImportError, OSError):
+            pass
+    return PollingWatcher(roots, interval, recursive)
+
+
+class WatchFolderService:
+    """监视 → 防抖 → 小批量识别 → 追加日志 → 写检查点"""
+    def __init__(self, model, watcher, log_path, checkpoint_path, id_to_name=None, model_hash="",
+                 batch=16, max_wait=1.0, settle=2.0, k=5):
+        self.model = model
+        self.watcher = watcher
+        self.log_path = log_path
+        self.batch = batch
+        self.max_wait = max_wait
+        self.settle = settle
+        self.k = k
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self._recover_log()
+        self.exporter = ResultExporter(log_path, model.names, id_to_name, model_hash, k=k, append=True)
+        # path -> [状态, 状态最近一次变化的时刻]
+        self._pending = {}
+        self._ready = []
+        self._ready_since = None
+        self._stop = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def _recover_log(self):
+        """补记检查点之后已写入日志的结果，并截掉中断时写了一半的行"""
+        if not os.path.exists(self.log_path):
+            return
+        offset = self.checkpoint.log_offset
+        entries, end = [], offset
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                try:
+                    path = json.loads(line)["path"]
+                except (ValueError, KeyError):
+                    continue
+                state = file_state(path)
+                if state is not None:
+                    entries.append((path, state))
+        if os.path.getsize(self.log_path) > end:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(end)
+        if end != offset:
+            self.checkpoint.mark(entries, end)
+            print(f"♻️ Recovered {len(entries)} results logged after the last checkpoint")
+
+    def stop(self):
+        self._stop.set()
+
+    def _consider(self, path):
+        """新事件：未处理过 (或已改动) 的图片进入防抖队列"""
+        if not is_candidate(path):
+            return
+        path = os.path.abspath(path)
+        state = file_state(path)
+        if state is None or self.checkpoint.is_done(path, state) or path in self._ready:
+            return
+        entry = self._pending.get(path)
+        if entry is None or entry[0] != state:
+            self._pending[path] = [state, time.monotonic()]
+
+    def _settle(self):
+        """大小与修改时间 settle 秒内不变的非空文件视为写入完成"""
+        now = time.monotonic()
+        for path, entry in list(self._pending.items()):
+            state = file_state(path)
+            if state is None:
+                del self._pending[path]
+            elif state != entry[0]:
+                entry[0], entry[1] = state, now
+            elif state[0] > 0 and now - entry[1] >= self.settle:
+                del self._pending[path]
+                self._ready.append(path)
+                if self._ready_since is None:
+                    self._ready_since = now
+
+    def _flush_due(self):
+        if not self._ready:
+            return False
+        return len(self._ready) >= self.batch or time.monotonic() - self._ready_since >= self.max_wait
+
+    def _process(self, paths):
+        """识别一批图片，结果写入日志并 fsync 后再写检查点"""
+        states = [file_state(p) for p in paths]
+        t0 = time.perf_counter()
+        probs, errors = {}, {}
+        try:
+            probs = dict(enumerate(predict_probs(self.model, paths)))
+        except Exception:
+            # 整批失败时逐张重试，定位出错的图片
+            for i, path in enumerate(paths):
+                try:
+                    probs[i] = predict_probs(self.model, [path])[0]
+                except Exception as e:
+                    errors[i] = str(e)
+        latency_ms = (time.perf_counter() - t0) * 1000 / len(paths)
+
+        entries = []
+        for i, (path, state) in enumerate(zip(paths, states)):
+            record = {"index": len(self.checkpoint) + i, "path": path, "topk": [],
+                      "error": errors.get(i), "latency_ms": latency_ms}
+            if i in probs:
+                p = probs[i]
+                record["topk"] = [(int(idx), float(p[idx])) for idx in topk(p, self.k)]
+            self.exporter.write(record)
+            # 识别失败的文件同样登记，避免损坏的图片反复重试；替换文件后会重新识别
+            if state is not None:
+                entries.append((path, state))
+        self.exporter.sync()
+        self.checkpoint.mark(entries, os.path.getsize(self.log_path))
+        self.processed += len(paths) - len(errors)
+        self.failed += len(errors)
+        print(f"✅ {len(paths)} images ({len(errors)} failed), {latency_ms:.1f} ms/img, "
+              f"total {self.processed} ok / {self.failed} failed")
+
+    def run(self):
+        """阻塞运行，直到 stop() 被调用"""
+        try:
+            while not self._stop.is_set():
+                # 有待防抖或待识别的文件时缩短等待，保证及时出结果
+                timeout = 0.25 if (self._pending or self._ready) else 1.0
+                for path in self.watcher.poll(timeout):
+                    self._consider(path)
+                self._settle()
+                while self._flush_due():
+                    chunk, self._ready = self._ready[:self.batch], self._ready[self.batch:]
+                    self._ready_since = time.monotonic() if self._ready else None
+                    self._process(chunk)
+        finally:
+            self.watcher.close()
+            self.exporter.close()
+            self.checkpoint.close()
+
+
+def main():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="Watch folders and recognize new images as they arrive.")
+    parser.add_argument("--watch", action="append", required=True, help="Folder to watch (repeatable)")
+    parser.add_argument("--model", default=os.path.join(project_root, "models", "best.onnx"))
+    parser.add_argument("--log", default=os.path.join(project_root, "runs", "watch", "results.jsonl"),
+                        help="Append-only JSONL result log")
+    parser.add_argument("--checkpoint", default=None, help="Defaults to <log>.checkpoint.sqlite3")
+    parser.add_argument("--batch", type=int, default=16, help="Max images per forward pass")
+    parser.add_argument("--max-wait", type=float, default=1.0, help="Seconds to wait for a batch to fill")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="Seconds a file must stay unchanged before it is recognized")
+    parser.add_argument("--poll", action="store_true", help="Force polling (network shares)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Polling interval in seconds")
+    parser.add_argument("--no-recursive", action="store_true")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Error: Model not found at {args.model}")
+        return
+    if not args.log.lower().endswith(".jsonl"):
+        print("❌ Error: The result log must be a .jsonl file")
+        return
+    roots = [os.path.abspath(p) for p in args.watch]
+    missing = [p for p in roots if not os.path.isdir(p)]
+    if missing:
+        print(f"❌ Error: Folder not found: {', '.join(missing)}")
+        return
+
+    model = load_model(args.model)
+    warmup(model)
+    watcher = create_watcher(roots, args.poll, args.interval, not args.no_recursive)
+    service = WatchFolderService(
+        model, watcher, args.log, args.checkpoint or args.log + ".checkpoint.sqlite3",
+        load_id_mapping(project_root), model_digest(args.model),
+        batch=args.batch, max_wait=args.max_wait, settle=args.settle,
+    )
+    print(f"🚀 Watching {len(roots)} folder(s) with {watcher.name} "
+          f"({os.path.basename(args.model)}, {backend_name(model)}); "
+          f"{len(service.checkpoint)} files already processed")
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        print("👋 Watcher stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+benchmark_preprocess.py
+------------------------
+Microbenchmark for classifier preprocessing.
+
+Usage:
+    python scripts/benchmark_preprocess.py [--images dataset] [--limit 256] [--batch 32] [--workers 4]
+
+Description:
+    Compares three ways of turning image files into a 224px NCHW float32 batch:
+      1. ultralytics : cv2 full decode + classify_transforms per image (current .pt path)
+      2. exact       : PIL full decode, per-image transform (OnnxClassifier default)
+      3. draft       : JPEG DCT-scaled decode + batched normalize into a reused buffer
+    and reports ms/image, images/s and the numeric deviation of the draft path.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from image_index import is_image_file
+from preprocess import BatchPreprocessor
+
+
+def collect_images(root, limit):
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if is_image_file(name):
+                images.append(os.path.join(dirpath, name))
+                if len(images) >= limit:
+                    return images
+    return images
+
+
+def make_ultralytics_path(size):
+    """Current path: what ultralytics does with a file path for classification."""
+    try:
+        import cv2
+        import torch
+        from PIL import Image
+        from ultralytics.data.augment import classify_transforms
+    except ImportError:
+        return None
+
+    transforms = classify_transforms(size)
+
+    def run(paths):
+        tensors = []
+        for p in paths:
+            im = cv2.imdecode(np.fromfile(p, dtype=np.uint8), cv2.IMREAD_COLOR)
+            tensors.append(transforms(Image.fromarray(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))))
+        return torch.stack(tensors).numpy()
+
+    return run
+
+
+def time_path(run, images, batch_size, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for start in range(0, len(images), batch_size):
+            run(images[start:start + batch_size])
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark classifier preprocessing paths.")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "dataset"))
+    parser.add_argument("--limit", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = collect_images(args.images, args.limit)
+    if not images:
+        print(f"❌ Error: No images found under {args.images}")
+        return
+
+    exact = BatchPreprocessor(args.size, max_batch=args.batch, draft=False)
+    draft = BatchPreprocessor(args.size, max_batch=args.batch, draft=True, workers=args.workers)
+
+    paths = {"exact": exact, "draft": draft}
+    ultralytics_path = make_ultralytics_path(args.size)
+    if ultralytics_path is not None:
+        paths = {"ultralytics": ultralytics_path, **paths}
+    else:
+        print("⚠️ ultralytics / torch not installed, skipping current-path baseline")
+
+    print(f"🚀 {len(images)} images, batch {args.batch}, {args.workers} decode workers\n")
+    print(f"{'path':<12} {'ms/img':>8} {'img/s':>8}")
+    for name, run in paths.items():
+        elapsed = time_path(run, images, args.batch, args.repeat)
+        print(f"{name:<12} {elapsed * 1000 / len(images):>8.2f} {len(images) / elapsed:>8.1f}")
+
+    # Numeric deviation of reduced-size decode vs full decode
+    sample = images[:args.batch]
+    reference = exact(sample).copy()
+    fast = draft(sample)
+    print(f"\n📊 draft vs exact: max |Δ| = {np.abs(reference - fast).max():.4f}, "
+          f"mean |Δ| = {np.abs(reference - fast).mean():.5f}")
+
+    draft.close()
+
+
+if __name__ == "__main__":
+    benchmark()
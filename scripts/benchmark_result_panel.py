@@ -0,0 +1,122 @@
+"""
+benchmark_result_panel.py
+--------------------------
+Main-thread cost of updating the GUI result panel.
+
+Usage:
+    python scripts/benchmark_result_panel.py [--updates 2000]
+
+Description:
+    Compares two ways of showing a top-5 result in the right-hand panel:
+      1. recreate : destroy all cards and build ~20 new Tk widgets (old behaviour)
+      2. recycle  : update the 5 pre-built ResultRow cards in place (current GUI)
+    Each update is timed including the idle-time layout/redraw it triggers, and
+    the process RSS before/after shows how much Tcl memory each approach leaves
+    behind. Requires a display (on a headless machine run it under xvfb-run).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import tkinter as tk
+
+from inference_gui import ModernTheme, ResultRow
+from perf_stats import rss_mb
+
+
+def recreate_update(frame, rows):
+    """Old behaviour: destroy and rebuild every card."""
+    for widget in frame.winfo_children():
+        widget.destroy()
+    for i, (real_name, clean_id, conf_pct, show_id) in enumerate(rows):
+        item = tk.Frame(frame, bg=ModernTheme.BG_DARK, pady=8, padx=8)
+        item.pack(fill=tk.X, pady=3)
+        tk.Label(item, text=f"#{i+1}", font=("Microsoft YaHei UI", 11, "bold"),
+                 bg=ModernTheme.BG_DARK, fg=ResultRow.RANK_COLORS[i], width=3).pack(side=tk.LEFT)
+        info = tk.Frame(item, bg=ModernTheme.BG_DARK)
+        info.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(8, 0))
+        tk.Label(info, text=real_name, font=ModernTheme.FONT_BODY, bg=ModernTheme.BG_DARK,
+                 fg=ModernTheme.TEXT_PRIMARY, anchor="w", wraplength=400, justify="left").pack(fill=tk.X)
+        if show_id:
+            tk.Label(info, text=f"ID: {clean_id}", font=ModernTheme.FONT_SMALL, bg=ModernTheme.BG_DARK,
+                     fg=ModernTheme.TEXT_MUTED, anchor="w").pack(fill=tk.X)
+        tk.Label(item, text=f"{conf_pct:.1f}%", font=("Microsoft YaHei UI", 11, "bold"),
+                 bg=ModernTheme.BG_DARK, fg=ModernTheme.SUCCESS).pack(side=tk.RIGHT)
+
+
+def make_recycle_update(frame):
+    """Current behaviour: update pre-built rows in place."""
+    result_rows = [ResultRow(frame, i) for i in range(5)]
+    for row in result_rows:
+        row.pack(fill=tk.X, pady=3)
+
+    def update(_, rows):
+        for row, values in zip(result_rows, rows):
+            row.set(*values)
+
+    return update
+
+
+def random_rows(rng):
+    rows = []
+    for _ in range(5):
+        short_id = f"{rng.randrange(16 ** 6):06x}"
+        rows.append((f"文物 {short_id}", short_id, rng.uniform(0, 100), rng.random() < 0.8))
+    return rows
+
+
+def time_updates(root, frame, update, updates, seed):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(updates):
+        rows = random_rows(rng)
+        t0 = time.perf_counter()
+        update(frame, rows)
+        root.update_idletasks()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark result panel update cost.")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"❌ Error: No display available ({e})")
+        return
+    root.geometry("400x600")
+
+    print(f"🚀 {args.updates} top-5 updates per approach\n")
+    print(f"{'approach':<10} {'mean ms':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'ΔRSS MB':>8}")
+    for name in ("recreate", "recycle"):
+        frame = tk.Frame(root, bg=ModernTheme.BG_CARD)
+        frame.pack(fill=tk.BOTH, expand=True)
+        update = recreate_update if name == "recreate" else make_recycle_update(frame)
+        root.update()
+
+        before = rss_mb()
+        samples = time_updates(root, frame, update, args.updates, args.seed)
+        after = rss_mb()
+        frame.destroy()
+
+        def pct(q):
+            return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+        delta = f"{after - before:>8.1f}" if before is not None else f"{'n/a':>8}"
+        print(f"{name:<10} {sum(samples) / len(samples):>8.3f} {pct(50):>7.3f} {pct(95):>7.3f} {pct(99):>7.3f} {delta}")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    benchmark()
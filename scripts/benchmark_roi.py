@@ -0,0 +1,170 @@
+"""
+benchmark_roi.py
+-----------------
+End-to-end comparison of full-frame vs ROI-crop classification.
+
+Usage:
+    python scripts/benchmark_roi.py
+    python scripts/benchmark_roi.py --full models/best.onnx --roi models/roi.json --images dataset --limit 1000
+
+Description:
+    Runs both pipelines on the same full-resolution photos sampled from the
+    raw dataset (<category>/<Era_Name_ShortID>/<view>.jpg, ShortID = label):
+      full : the classifier on the whole photo (models/best.onnx)
+      roi  : localizer -> padded square crop -> classifier, usually a smaller
+             one trained on `data_augment.py --roi` crops (models/roi.json)
+    and reports top-1 / top-5, batched throughput, single-image latency
+    p50 / p95 (decode included, images pre-read into memory) and, for the ROI
+    pipeline, how often an artifact was found and the mean IoU of the found
+    box with the labelled box (<view>.txt).
+    The raw photos were also the source of the augmented training data, so
+    absolute accuracy is optimistic; the comparison between the two
+    pipelines is what this measures.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from image_index import is_image_file
+from model_backend import backend_name, load_model, predict_probs, warmup
+from preprocess import open_image
+from roi_crop import DRAFT_FACTOR, yolo_label_box
+
+
+def collect_samples(root, limit):
+    """Evenly spaced (path, ShortID, label box or None) over the raw dataset."""
+    samples = []
+    for dirpath, _, filenames in os.walk(root):
+        short_id = os.path.basename(dirpath).split('_')[-1]
+        for name in sorted(filenames):
+            stem, ext = os.path.splitext(name)
+            if not is_image_file(name):
+                continue
+            label_path = os.path.join(dirpath, stem + ".txt")
+            box = None
+            if os.path.exists(label_path):
+                with open(label_path, 'r', encoding='utf-8') as f:
+                    box = next((b for b in (yolo_label_box(line, 1, 1) for line in f) if b is not None), None)
+            samples.append((os.path.join(dirpath, name), short_id, box))
+    samples.sort()
+    if len(samples) > limit:
+        samples = [samples[i] for i in np.linspace(0, len(samples) - 1, limit).astype(int)]
+    return samples
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def run_pipeline(model, data, labels, batch, latency_images):
+    """Accuracy + throughput on batches, then single-image latency."""
+    name_to_idx = {str(name).lstrip('_'): i for i, name in model.names.items()}
+    targets = np.array([name_to_idx.get(label, -1) for label in labels])
+
+    t0 = time.perf_counter()
+    probs = np.concatenate([predict_probs(model, data[i:i + batch]) for i in range(0, len(data), batch)])
+    elapsed = time.perf_counter() - t0
+
+    known = targets >= 0
+    top5 = np.argsort(-probs, axis=1)[:, :5]
+    top1_acc = float((top5[known, 0] == targets[known]).mean()) if known.any() else 0.0
+    top5_acc = float((top5[known] == targets[known, None]).any(axis=1).mean()) if known.any() else 0.0
+
+    latencies = []
+    for item in data[:latency_images]:
+        t1 = time.perf_counter()
+        predict_probs(model, [item])
+        latencies.append((time.perf_counter() - t1) * 1000)
+    return {
+        "evaluated": int(known.sum()),
+        "top1_acc": round(top1_acc, 5),
+        "top5_acc": round(top5_acc, 5),
+        "throughput_img_s": round(len(data) / elapsed, 2),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "imgsz": getattr(model, "imgsz", None),
+    }
+
+
+def localization_quality(model, data, boxes, batch):
+    """Share of images with a box above min_conf and mean IoU with the labelled box."""
+    found, ious = 0, []
+    for start in range(0, len(data), batch):
+        images = [open_image(d, model.imgsz * DRAFT_FACTOR, draft=True) for d in data[start:start + batch]]
+        for img, det, label in zip(images, model.localizer.detect(images), boxes[start:start + batch]):
+            if det is None or det[4] < model.min_conf:
+                continue
+            found += 1
+            if label is not None:
+                w, h = img.size
+                ious.append(iou((det[0] / w, det[1] / h, det[2] / w, det[3] / h), label))
+    return {"localized_rate": round(found / len(data), 5) if data else 0.0,
+            "mean_iou": round(float(np.mean(ious)), 4) if ious else None}
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description="Compare full-frame and ROI-crop classification end to end.")
+    parser.add_argument("--full", default=os.path.join(PROJECT_ROOT, "models", "best.onnx"))
+    parser.add_argument("--roi", default=os.path.join(PROJECT_ROOT, "models", "roi.json"))
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "dataset"))
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--latency-images", type=int, default=100)
+    parser.add_argument("--json", default=None, help="Results file (default runs/bench/roi_<time>.json)")
+    args = parser.parse_args()
+
+    for path in (args.full, args.roi):
+        if not os.path.exists(path):
+            print(f"❌ Error: Model not found: {path}")
+            return
+    samples = collect_samples(args.images, args.limit)
+    if not samples:
+        print(f"❌ Error: No images found under {args.images}")
+        return
+
+    data = []
+    for path, _, _ in samples:
+        with open(path, 'rb') as f:
+            data.append(f.read())
+    labels = [label for _, label, _ in samples]
+    print(f"🚀 {len(data)} photos, batch {args.batch}")
+
+    results = {}
+    for name, path in (("full", args.full), ("roi", args.roi)):
+        model = load_model(path)
+        warmup(model)
+        print(f"   {name}: {os.path.basename(path)} ({backend_name(model)})")
+        results[name] = run_pipeline(model, data, labels, args.batch, args.latency_images)
+        if name == "roi":
+            results[name].update(localization_quality(model, data, [box for _, _, box in samples], args.batch))
+
+    print(f"\n📊 {'pipeline':<8} {'imgsz':>6} {'top-1':>7} {'top-5':>7} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, r in results.items():
+        print(f"   {name:<8} {str(r['imgsz']):>6} {r['top1_acc'] * 100:>6.2f}% {r['top5_acc'] * 100:>6.2f}% "
+              f"{r['throughput_img_s']:>8.1f} {r['latency_p50_ms']:>8.2f} {r['latency_p95_ms']:>8.2f}")
+    roi = results["roi"]
+    iou_text = f"{roi['mean_iou']:.3f}" if roi["mean_iou"] is not None else "-"
+    print(f"   artifact found in {roi['localized_rate'] * 100:.1f}% of photos, mean IoU with labels {iou_text}")
+
+    output = args.json or os.path.join(PROJECT_ROOT, "runs", "bench", f"roi_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({"full": os.path.basename(args.full), "roi": os.path.basename(args.roi),
+                   "images": len(data), "batch": args.batch, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,129 @@
+"""
+benchmark_scaling.py
+---------------------
+Multi-core scaling of CPU inference.
+
+Usage:
+    python scripts/benchmark_scaling.py --model models/best.onnx
+    python scripts/benchmark_scaling.py --model models/best.onnx --max-cores 32 --threads 2 --pin --json runs/perf/scaling.json
+
+Description:
+    For 1, 2, 4, ... up to --max-cores CPU cores, compares two ways of using
+    those cores under a full queue of batches:
+      1. single : one session with <cores> intra-op threads (default threading)
+      2. pool   : <cores> / --threads sessions with --threads intra-op threads
+                  each, fed from one shared queue (SessionPool)
+    and reports images/s, speed-up over one core and parallel efficiency.
+    Images are read into memory first, so disk I/O is not measured.
+    .pt models use one process per session (--mode process).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from image_index import is_image_file
+from session_pool import POOL_MODES, SessionPool, available_cpus
+
+
+def load_images(root, limit):
+    """Read up to `limit` images as bytes; fall back to synthetic JPEGs."""
+    images = []
+    if os.path.isdir(root):
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if is_image_file(name):
+                    with open(os.path.join(dirpath, name), 'rb') as f:
+                        images.append(f.read())
+                    if len(images) >= limit:
+                        return images
+    if images:
+        return images
+
+    import io
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    for _ in range(limit):
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)).save(buf, "JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def core_counts(max_cores):
+    counts, c = [], 1
+    while c < max_cores:
+        counts.append(c)
+        c *= 2
+    return counts + [max_cores]
+
+
+def run_config(model_path, images, batch, rounds, workers, threads, pin, mode):
+    """Return images/s with all batches queued at once (best of `rounds`)."""
+    with SessionPool(model_path, workers, threads, pin, mode, batch=batch) as pool:
+        batches = [images[i:i + batch] for i in range(0, len(images), batch)]
+        pool.predict_probs(images[:batch])  # warm-up
+        best = float("inf")
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            futures = [pool.submit(b) for b in batches]
+            for f in futures:
+                f.result()
+            best = min(best, time.perf_counter() - t0)
+        return len(images) / best
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark multi-core inference scaling.")
+    parser.add_argument("--model", default=os.path.join(PROJECT_ROOT, "models", "best.onnx"))
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "dataset"))
+    parser.add_argument("--limit", type=int, default=512)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-cores", type=int, default=len(available_cpus()))
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per pool session")
+    parser.add_argument("--pin", action="store_true", help="Pin each pool session to its own CPU set")
+    parser.add_argument("--mode", choices=POOL_MODES, default="auto")
+    parser.add_argument("--json", default=None, help="Write the results table to a JSON file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Error: Model not found: {args.model}")
+        return
+
+    images = load_images(args.images, args.limit)
+    print(f"🚀 {len(images)} images, batch {args.batch}, {len(available_cpus())} CPUs available\n")
+    print(f"{'cores':>5} {'single img/s':>13} {'pool img/s':>11} {'sessions':>9} {'speed-up':>9} {'efficiency':>11}")
+
+    rows = []
+    base = None
+    for cores in core_counts(args.max_cores):
+        single = run_config(args.model, images, args.batch, args.rounds, 1, cores, False, args.mode)
+        threads = min(args.threads, cores)
+        sessions = max(1, cores // threads)
+        pool = run_config(args.model, images, args.batch, args.rounds, sessions, threads, args.pin, args.mode)
+        base = base or min(single, pool)
+        speedup = pool / base
+        rows.append({"cores": cores, "single_img_s": round(single, 2), "pool_img_s": round(pool, 2),
+                     "sessions": sessions, "threads": threads, "speedup": round(speedup, 2),
+                     "efficiency": round(speedup / cores, 3)})
+        print(f"{cores:>5} {single:>13.1f} {pool:>11.1f} {f'{sessions}x{threads}':>9} "
+              f"{speedup:>8.2f}x {speedup / cores * 100:>10.0f}%")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"model": os.path.basename(args.model), "batch": args.batch,
+                       "pin": args.pin, "results": rows}, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,359 @@
+"""
+benchmark_suite.py
+-------------------
+Offline inference performance regression suite.
+
+Usage:
+    python scripts/benchmark_suite.py run --save-baseline
+    python scripts/benchmark_suite.py run --model models/best.onnx --images dataset --output runs/bench/best.json
+    python scripts/benchmark_suite.py compare
+    python scripts/benchmark_suite.py compare --current runs/bench/best.json --baseline runs/bench/baseline.json
+
+Description:
+    Needs no network access and no trained weights: by default a tiny,
+    randomly initialised classifier (1300 classes, seeded, built with
+    onnx.helper) is written to runs/bench/tiny_cls.onnx, and synthetic JPEGs
+    of typical photo sizes are generated unless --images points at real ones.
+    Measured metrics:
+      cold_start_ms           fresh interpreter -> first prediction
+      import_ms / load_ms / first_infer_ms   breakdown of the cold start
+      peak_rss_mb             peak RSS of that process after one batch
+      single_p50_ms / p95     one image per call, from a file path
+      batch_img_s             batched throughput on in-memory images
+      display_p50_ms          GUI display path: decode once -> preview + model input
+      display_infer_p50_ms    display path + prediction on the prepared image
+    `run` writes the results (plus host / config info) as JSON and can store
+    them as the baseline; `compare` re-runs with the baseline's config (or
+    reads --current) and exits with status 1 if any metric is worse than the
+    baseline by more than its tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from image_index import is_image_file
+
+BENCH_DIR = os.path.join(PROJECT_ROOT, "runs", "bench")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+SYNTHETIC_SIZES = [(640, 480), (1280, 960), (1920, 1080), (4000, 3000)]
+
+# metric -> (better direction, relative tolerance, absolute noise floor)
+METRICS = {
+    "cold_start_ms": ("lower", 0.25, 50.0),
+    "import_ms": ("lower", 0.25, 30.0),
+    "load_ms": ("lower", 0.25, 20.0),
+    "first_infer_ms": ("lower", 0.25, 10.0),
+    "peak_rss_mb": ("lower", 0.10, 10.0),
+    "single_p50_ms": ("lower", 0.15, 0.5),
+    "single_p95_ms": ("lower", 0.25, 1.0),
+    "batch_img_s": ("higher", 0.10, 1.0),
+    "display_p50_ms": ("lower", 0.15, 0.5),
+    "display_infer_p50_ms": ("lower", 0.15, 0.5),
+}
+
+# Runs in a fresh interpreter: prints the cold-start breakdown as JSON
+COLD_START_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {app!r})
+from model_backend import load_model, predict_probs
+from perf_stats import peak_rss_mb
+t1 = time.perf_counter()
+model = load_model({model!r})
+t2 = time.perf_counter()
+predict_probs(model, [{image!r}])
+t3 = time.perf_counter()
+predict_probs(model, [{image!r}] * {batch})
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "load_ms": (t2 - t1) * 1000,
+                  "first_infer_ms": (t3 - t2) * 1000, "peak_rss_mb": peak_rss_mb()}}))
+"""
+
+
+def make_tiny_model(path, num_classes=1300, imgsz=224, seed=0):
+    """Seeded tiny classifier: Conv -> ReLU -> GAP -> Gemm -> Softmax, with ultralytics-style metadata."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    conv_w = rng.normal(0, 0.1, (16, 3, 3, 3)).astype(np.float32)
+    fc_w = rng.normal(0, 0.1, (num_classes, 16)).astype(np.float32)
+    fc_b = np.zeros(num_classes, dtype=np.float32)
+
+    nodes = [
+        helper.make_node("Conv", ["images", "conv_w"], ["conv"], strides=[2, 2], pads=[1, 1, 1, 1]),
+        helper.make_node("Relu", ["conv"], ["relu"]),
+        helper.make_node("GlobalAveragePool", ["relu"], ["pool"]),
+        helper.make_node("Flatten", ["pool"], ["features"]),
+        helper.make_node("Gemm", ["features", "fc_w", "fc_b"], ["logits"], transB=1),
+        helper.make_node("Softmax", ["logits"], ["output0"], axis=1),
+    ]
+    graph = helper.make_graph(
+        nodes, "tiny_cls",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, imgsz, imgsz])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", num_classes])],
+        [numpy_helper.from_array(conv_w, "conv_w"), numpy_helper.from_array(fc_w, "fc_w"),
+         numpy_helper.from_array(fc_b, "fc_b")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8  # readable by older onnxruntime releases
+    names = {i: f"{i:06x}" for i in range(num_classes)}
+    helper.set_model_props(model, {"names": repr(names), "imgsz": repr([imgsz, imgsz]), "task": "classify"})
+    onnx.checker.check_model(model)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    onnx.save(model, path)
+    return path
+
+
+def synthetic_images(out_dir, count, seed=0):
+    """Write smooth-noise JPEGs of typical photo sizes (reused when already present)."""
+    from PIL import Image
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        w, h = SYNTHETIC_SIZES[i % len(SYNTHETIC_SIZES)]
+        path = os.path.join(out_dir, f"synthetic_{i:03d}_{w}x{h}.jpg")
+        if not os.path.exists(path):
+            small = rng.integers(0, 255, (h // 16, w // 16, 3), dtype=np.uint8)
+            Image.fromarray(small).resize((w, h), Image.Resampling.BILINEAR).save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def sample_images(root, limit):
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if is_image_file(name):
+                images.append(os.path.join(dirpath, name))
+    if len(images) > limit:
+        # Evenly spaced sample so every run picks the same files
+        images = [images[i] for i in np.linspace(0, len(images) - 1, limit).astype(int)]
+    return images
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q))
+
+
+def measure_cold_start(model_path, image, batch, repeat):
+    """Median over `repeat` fresh interpreters."""
+    code = COLD_START_CHILD.format(app=os.path.join(PROJECT_ROOT, "app"), model=model_path, image=image, batch=batch)
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        wall = (time.perf_counter() - t0) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "cold start failed")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["cold_start_ms"] = wall
+        runs.append(result)
+    return {key: float(np.median([r[key] for r in runs])) for key in runs[0] if runs[0][key] is not None}
+
+
+def measure_single(model, images, iterations):
+    from model_backend import predict_probs
+    samples = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        predict_probs(model, [images[i % len(images)]])
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"single_p50_ms": percentile(samples, 50), "single_p95_ms": percentile(samples, 95)}
+
+
+def measure_batch(model, images, batch, rounds):
+    from model_backend import predict_probs
+    data = []
+    for path in images:
+        with open(path, 'rb') as f:
+            data.append(f.read())
+    batches = [data[i:i + batch] for i in range(0, len(data), batch)]
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for b in batches:
+            predict_probs(model, b)
+        best = min(best, time.perf_counter() - t0)
+    return {"batch_img_s": len(data) / best}
+
+
+def measure_display(model, images, iterations):
+    """GUI path without Tk: Prefetcher decode (preview + model input), then predict on it."""
+    from model_backend import predict_probs
+    from prefetch import Prefetcher
+    display, display_infer = [], []
+    prefetcher = Prefetcher()
+    try:
+        for i in range(iterations):
+            path = images[i % len(images)]
+            prefetcher.cache.clear()
+            t0 = time.perf_counter()
+            entry = prefetcher.load(path)
+            t1 = time.perf_counter()
+            predict_probs(model, [entry])
+            t2 = time.perf_counter()
+            display.append((t1 - t0) * 1000)
+            display_infer.append((t2 - t0) * 1000)
+    finally:
+        prefetcher.shutdown()
+    return {"display_p50_ms": percentile(display, 50), "display_infer_p50_ms": percentile(display_infer, 50)}
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+    try:
+        import onnxruntime
+        info["onnxruntime"] = onnxruntime.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def run_suite(config):
+    """Run every measurement for a config dict; returns the result document."""
+    from model_backend import backend_name, load_model, warmup
+
+    model_path = config["model"]
+    if model_path is None:
+        model_path = make_tiny_model(os.path.join(BENCH_DIR, "tiny_cls.onnx"))
+    if config["images"]:
+        images = sample_images(config["images"], config["limit"])
+    else:
+        images = synthetic_images(os.path.join(BENCH_DIR, "images"), config["limit"])
+    if not images:
+        raise RuntimeError(f"No images found under {config['images']}")
+
+    print(f"🚀 {os.path.basename(model_path)}, {len(images)} images, batch {config['batch']}")
+    metrics = measure_cold_start(model_path, images[0], config["batch"], config["cold_repeat"])
+    print(f"   cold start {metrics['cold_start_ms']:.0f} ms")
+
+    model = load_model(model_path)
+    warmup(model)
+    metrics.update(measure_single(model, images, config["iterations"]))
+    metrics.update(measure_batch(model, images, config["batch"], config["rounds"]))
+    metrics.update(measure_display(model, images, config["iterations"]))
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": backend_name(model),
+        "config": config,
+        "environment": environment(),
+        "metrics": {k: round(v, 3) for k, v in metrics.items()},
+    }
+
+
+def compare_results(baseline, current):
+    """Return [(metric, base, cur, change, regressed)] for metrics present in both."""
+    rows = []
+    for name, (direction, tolerance, floor) in METRICS.items():
+        base = baseline["metrics"].get(name)
+        cur = current["metrics"].get(name)
+        if base is None or cur is None:
+            continue
+        worse = cur - base if direction == "lower" else base - cur
+        change = (cur - base) / base if base else 0.0
+        regressed = worse > max(abs(base) * tolerance, floor)
+        rows.append((name, base, cur, change, regressed))
+    return rows
+
+
+def print_metrics(result):
+    print(f"\n📊 {'metric':<22} {'value':>10}")
+    for name, value in result["metrics"].items():
+        print(f"   {name:<22} {value:>10.2f}")
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def cmd_run(args):
+    config = {"model": args.model, "images": args.images, "limit": args.limit, "batch": args.batch,
+              "iterations": args.iterations, "rounds": args.rounds, "cold_repeat": args.cold_repeat}
+    result = run_suite(config)
+    print_metrics(result)
+    output = args.output or os.path.join(BENCH_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    write_json(output, result)
+    print(f"\n✅ Results written to {output}")
+    if args.save_baseline:
+        write_json(args.baseline, result)
+        print(f"✅ Saved as baseline: {args.baseline}")
+    return 0
+
+
+def cmd_compare(args):
+    if not os.path.exists(args.baseline):
+        print(f"❌ Error: Baseline not found: {args.baseline} (run with --save-baseline first)")
+        return 2
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    if args.current:
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = run_suite(baseline["config"])
+
+    if baseline.get("environment") != current.get("environment"):
+        print("⚠️ Host or library versions differ from the baseline; differences may not be regressions")
+
+    rows = compare_results(baseline, current)
+    print(f"\n📊 {'metric':<22} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base, cur, change, regressed in rows:
+        flag = "❌" if regressed else "✅"
+        print(f"{flag} {name:<22} {base:>10.2f} {cur:>10.2f} {change * 100:>+7.1f}%")
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed beyond tolerance: {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline inference performance regression suite.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Measure and write results")
+    run.add_argument("--model", default=None, help="Model to benchmark (default: generated tiny classifier)")
+    run.add_argument("--images", default=None, help="Sample real images from this folder (default: synthetic)")
+    run.add_argument("--limit", type=int, default=64)
+    run.add_argument("--batch", type=int, default=32)
+    run.add_argument("--iterations", type=int, default=100)
+    run.add_argument("--rounds", type=int, default=3)
+    run.add_argument("--cold-repeat", type=int, default=3)
+    run.add_argument("--output", default=None)
+    run.add_argument("--save-baseline", action="store_true")
+    run.add_argument("--baseline", default=DEFAULT_BASELINE)
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare", help="Compare against the baseline, exit 1 on regression")
+    compare.add_argument("--baseline", default=DEFAULT_BASELINE)
+    compare.add_argument("--current", default=None, help="Results file to check (default: run now)")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    try:
+        sys.exit(args.func(args))
+    except (ImportError, RuntimeError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+build_embedding_index.py
+-------------------------
+Build the similar-artifact retrieval index.
+
+Usage:
+    python scripts/build_embedding_index.py
+    python scripts/build_embedding_index.py --source dataset --model models/best.onnx --mode ivfpq
+
+Description:
+    Extracts one embedding per catalogued view (main.jpg / angle_N.jpg ...) of
+    every artifact under <source>/<category>/<Era_Name_ShortID>/ with the
+    trained backbone (the "embedding" output added by export_model.py, or
+    YOLO.embed for .pt weights) and stores them as an L2-normalized float16
+    matrix in models/embedding_index/.
+    --mode exact (default) does brute-force cosine search, which takes a few
+    milliseconds for tens of thousands of views; --mode ivfpq additionally
+    trains a faiss IVF-PQ index for much larger catalogues (needs faiss-cpu).
+    The open-set threshold (distance above which a query is reported as an
+    artifact not in the catalogue) is estimated from view-to-view distances
+    within the same artifact.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from embedding_index import DEFAULT_INDEX_DIR, INDEX_MODES, EmbeddingIndex
+from image_index import is_image_file
+from model_backend import backend_name, embed, load_model
+from prediction_cache import model_digest
+
+DEFAULT_MODELS = [
+    os.path.join("models", "best.onnx"),
+    os.path.join("models", "artifact_cls_best.onnx"),
+    os.path.join("models", "best.pt"),
+]
+
+
+def collect_catalogue(source):
+    """Return [{"id", "path"}] for every view of every <category>/<Era_Name_ShortID> folder."""
+    items = []
+    for category in sorted(os.listdir(source)):
+        cat_path = os.path.join(source, category)
+        if not os.path.isdir(cat_path):
+            continue
+        for art in sorted(os.listdir(cat_path)):
+            art_path = os.path.join(cat_path, art)
+            if not os.path.isdir(art_path):
+                continue
+            short_id = art.split('_')[-1]
+            for name in sorted(os.listdir(art_path)):
+                if is_image_file(name):
+                    items.append({"id": short_id, "path": os.path.relpath(os.path.join(art_path, name), PROJECT_ROOT)})
+    return items
+
+
+def find_default_model():
+    for rel_path in DEFAULT_MODELS:
+        path = os.path.join(PROJECT_ROOT, rel_path)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build():
+    parser = argparse.ArgumentParser(description="Build the embedding index for similar-artifact search.")
+    parser.add_argument("--source", default=os.path.join(PROJECT_ROOT, "dataset"),
+                        help="Catalogue root: <source>/<category>/<Era_Name_ShortID>/*.jpg")
+    parser.add_argument("--model", default=None, help="Path to .onnx (with embedding output) / .pt model")
+    parser.add_argument("--mode", choices=INDEX_MODES, default="exact")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, DEFAULT_INDEX_DIR))
+    args = parser.parse_args()
+
+    model_path = args.model or find_default_model()
+    if not model_path or not os.path.exists(model_path):
+        print("❌ Error: No model found. Pass --model.")
+        return
+    if not os.path.isdir(args.source):
+        print(f"❌ Error: Catalogue not found: {args.source}")
+        return
+
+    items = collect_catalogue(args.source)
+    if not items:
+        print(f"❌ Error: No images under {args.source}")
+        return
+
+    model = load_model(model_path)
+    artifacts = len({item["id"] for item in items})
+    print(f"🚀 Embedding {len(items)} views of {artifacts} artifacts with "
+          f"{os.path.basename(model_path)} ({backend_name(model)})")
+
+    rows, kept = [], []
+    t0 = time.perf_counter()
+    for start in range(0, len(items), args.batch):
+        chunk = items[start:start + args.batch]
+        paths = [os.path.join(PROJECT_ROOT, item["path"]) for item in chunk]
+        try:
+            rows.append(embed(model, paths))
+            kept.extend(chunk)
+        except ValueError as e:
+            # The model has no embedding output: nothing else will work either
+            print(f"❌ Error: {e}")
+            return
+        except Exception as e:
+            print(f"⚠️ Skipped batch at {chunk[0]['path']}: {e}")
+        done = start + len(chunk)
+        if done % (args.batch * 20) < args.batch or done == len(items):
+            print(f"   {done}/{len(items)} ({time.perf_counter() - t0:.1f}s)")
+
+    if not kept:
+        print("❌ Error: No embeddings extracted.")
+        return
+
+    vectors = np.concatenate(rows)
+    try:
+        index = EmbeddingIndex.build(vectors, kept, mode=args.mode,
+                                     model=os.path.basename(model_path), model_hash=model_digest(model_path))
+    except ImportError as e:
+        print(f"❌ Error: {e}")
+        return
+    index.save(args.output)
+
+    size_mb = vectors.shape[0] * vectors.shape[1] * 2 / (1 << 20)
+    print(f"\n📊 {len(kept)} vectors × {index.dim} dims (float16, {size_mb:.1f} MB), mode {index.meta['mode']}")
+    if index.open_set_distance is not None:
+        print(f"   open-set distance threshold: {index.open_set_distance:.4f}")
+    else:
+        print("⚠️ No artifact has more than one view, open-set detection disabled")
+    print(f"✅ Index written to {args.output}")
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,163 @@
+"""
+calibrate_cascade.py
+---------------------
+Calibrate the fast/accurate cascade thresholds on the validation split.
+
+Usage:
+    python scripts/calibrate_cascade.py --fast models/fast.onnx --accurate models/best.onnx
+    python scripts/calibrate_cascade.py --fast ... --accurate ... --max-drop 0.005 --output models/cascade.json
+
+Description:
+    Runs both models over datasets/processed/val (one folder per class) and
+    grid-searches the escalation thresholds: an image is sent to the accurate
+    model when the fast model's top-1 confidence < min_conf or its top-1/top-2
+    margin < min_margin. Among all threshold pairs whose cascade accuracy is
+    within --max-drop of the accurate model alone, the one with the lowest
+    expected latency (fast + escalation_rate * accurate) is chosen and written
+    to the cascade config, which load_model() / the GUI / the server accept
+    like a regular model file.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from cascade import align_probs, confidence_margin
+from image_index import collect_val_images
+from model_backend import backend_name, load_model, predict_probs
+from prediction_cache import file_digest
+
+CONF_GRID = np.append(np.linspace(0.0, 1.0, 101), 1.01)  # 1.01: escalate everything
+MARGIN_GRID = np.linspace(0.0, 1.0, 51)
+
+
+def run_model(model, paths, batch_size):
+    """Return (probs, ms per image) over all paths."""
+    rows = []
+    t0 = time.perf_counter()
+    for start in range(0, len(paths), batch_size):
+        rows.append(np.array(predict_probs(model, paths[start:start + batch_size]), dtype=np.float32))
+    elapsed = time.perf_counter() - t0
+    return np.concatenate(rows), elapsed * 1000 / max(len(paths), 1)
+
+
+def search_thresholds(fast_probs, fast_correct, accurate_correct, fast_ms, accurate_ms, target_acc):
+    """Grid search: cheapest (min_conf, min_margin) whose accuracy >= target_acc."""
+    conf, margin = confidence_margin(fast_probs)
+    best = None
+    for min_conf in CONF_GRID:
+        low_conf = conf < min_conf
+        # (margins, N) escalation masks for this confidence threshold
+        masks = low_conf[None, :] | (margin[None, :] < MARGIN_GRID[:, None])
+        accs = np.where(masks, accurate_correct[None, :], fast_correct[None, :]).mean(axis=1)
+        rates = masks.mean(axis=1)
+        for min_margin, acc, rate in zip(MARGIN_GRID, accs, rates):
+            if acc < target_acc - 1e-12:
+                continue
+            cost = fast_ms + rate * accurate_ms
+            key = (cost, -acc)
+            if best is None or key < best[0]:
+                best = (key, float(min_conf), float(min_margin), float(acc), float(rate), float(cost))
+    if best is None:
+        raise ValueError(f"No thresholds reach the target top-1 accuracy {target_acc:.5f}")
+    return best[1:]
+
+
+def calibrate():
+    parser = argparse.ArgumentParser(description="Calibrate cascade thresholds on the validation split.")
+    parser.add_argument("--fast", required=True, help="Small / fast model (.onnx or .pt)")
+    parser.add_argument("--accurate", required=True, help="Large / accurate model (.onnx or .pt)")
+    parser.add_argument("--val", default=os.path.join(PROJECT_ROOT, "datasets", "processed", "val"))
+    parser.add_argument("--max-drop", type=float, default=0.0,
+                        help="Allowed absolute top-1 accuracy drop vs. the accurate model")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, "models", "cascade.json"))
+    args = parser.parse_args()
+
+    if args.max_drop < 0:
+        print(f"❌ Error: --max-drop must be >= 0, got {args.max_drop}")
+        return
+    for path in (args.fast, args.accurate):
+        if not os.path.exists(path):
+            print(f"❌ Error: Model not found: {path}")
+            return
+    if not os.path.isdir(args.val):
+        print(f"❌ Error: Validation split not found: {args.val}")
+        return
+
+    samples = collect_val_images(args.val)
+    fast = load_model(args.fast)
+    accurate = load_model(args.accurate)
+    print(f"🚀 Calibrating on {len(samples)} val images")
+    print(f"   fast     : {os.path.basename(args.fast)} ({backend_name(fast)})")
+    print(f"   accurate : {os.path.basename(args.accurate)} ({backend_name(accurate)})")
+
+    name_to_idx = {str(name).lstrip('_'): i for i, name in accurate.names.items()}
+    samples = [(p, c) for p, c in samples if c.lstrip('_') in name_to_idx]
+    if not samples:
+        print("❌ Error: No val images whose class is known to the accurate model.")
+        return
+    paths = [p for p, _ in samples]
+    labels = np.array([name_to_idx[c.lstrip('_')] for _, c in samples])
+
+    fast_probs, fast_ms = run_model(fast, paths, args.batch)
+    fast_probs = align_probs(fast_probs, fast.names, accurate.names)
+    accurate_probs, accurate_ms = run_model(accurate, paths, args.batch)
+
+    fast_correct = fast_probs.argmax(axis=1) == labels
+    accurate_correct = accurate_probs.argmax(axis=1) == labels
+    accurate_acc = float(accurate_correct.mean())
+    target = accurate_acc - args.max_drop
+
+    min_conf, min_margin, acc, rate, cost = search_thresholds(
+        fast_probs, fast_correct, accurate_correct, fast_ms, accurate_ms, target
+    )
+
+    print(f"\n📊 Results ({len(paths)} images)")
+    print(f"  {'model':<10} {'top-1':>8} {'ms/img':>8}")
+    print(f"  {'fast':<10} {fast_correct.mean() * 100:>7.2f}% {fast_ms:>8.2f}")
+    print(f"  {'accurate':<10} {accurate_acc * 100:>7.2f}% {accurate_ms:>8.2f}")
+    print(f"  {'cascade':<10} {acc * 100:>7.2f}% {cost:>8.2f}  (expected)")
+    print(f"  thresholds : min_conf {min_conf:.2f}, min_margin {min_margin:.2f}")
+    print(f"  escalation : {rate * 100:.1f}% of images go to the accurate model")
+    if accurate_ms > 0:
+        print(f"  speed-up   : {accurate_ms / cost:.2f}x vs. accurate model alone")
+
+    out_dir = os.path.dirname(os.path.abspath(args.output))
+    config = {
+        "fast": os.path.relpath(os.path.abspath(args.fast), out_dir),
+        "accurate": os.path.relpath(os.path.abspath(args.accurate), out_dir),
+        "min_conf": round(min_conf, 4),
+        "min_margin": round(min_margin, 4),
+        "calibration": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "val_dir": args.val,
+            "val_images": len(paths),
+            "max_drop": args.max_drop,
+            "fast_acc": round(float(fast_correct.mean()), 5),
+            "accurate_acc": round(accurate_acc, 5),
+            "cascade_acc": round(acc, 5),
+            "escalation_rate": round(rate, 5),
+            "fast_ms": round(fast_ms, 3),
+            "accurate_ms": round(accurate_ms, 3),
+            "expected_ms": round(cost, 3),
+            # Retrained models change the config digest, invalidating cached predictions
+            "fast_hash": file_digest(args.fast),
+            "accurate_hash": file_digest(args.accurate),
+        },
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Cascade config written to {args.output}")
+
+
+if __name__ == "__main__":
+    calibrate()
@@ -1,12 +1,21 @@
 
+import argparse
 import os
+import sys
 import cv2
 import shutil
 import random
 import albumentations as A
 import numpy as np
+from collections import Counter
 from pathlib import Path
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+from archive_source import open_source, read_many
+from roi_crop import square_box, yolo_label_box
+
 # --- Helper Functions for Non-ASCII Paths (Windows) ---
 def cv2_imread(file_path):
     """Read image with non-ASCII path support."""
@@ -18,6 +27,10 @@ def cv2_imread(file_path):
         print(f"Error reading {file_path}: {e}")
         return None
 
+def cv2_imdecode(data):
+    """Decode image bytes (e.g. straight from a tar/zip member)."""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
 def cv2_imwrite(file_path, img):
     """Write image with non-ASCII path support."""
     try:
@@ -33,22 +46,33 @@ def cv2_imwrite(file_path, img):
 
 # --- Configuration ---
 # Adapt paths to be absolute or relative to project root
+# SOURCE_DIR may also be a .zip / uncompressed .tar of the same tree (read without extraction)
 SOURCE_DIR = os.path.join("datasets", "raw")
 OUTPUT_DIR = os.path.join("datasets", "processed")
+READ_WORKERS = 8               # Parallel readers for the source images
+IMG_SIZE = 224                 # Output size (YOLO cls default); smaller with --roi crops
+ROI_PAD = 0.1                  # --roi box padding, same as the "pad" of models/roi.json
 
 TARGET_COUNT = 50              # Target images per class
 VAL_RATIO = 0.2                # 20% validation set
 
+# --- Adaptive budgets (--budget-from) ---
+MIN_COUNT = 10                 # Floor for classes the model already gets right
+MAX_COUNT = 200                # Ceiling for the most confused classes
+BASE_WEIGHT = 0.05             # Share weight of a perfectly recognised class
+BUDGET_PATH = os.path.join("datasets", "augment_budgets.json")
+
 # --- Augmentation Pipeline ---
-transform = A.Compose([
-    A.Rotate(limit=30, p=0.7),                 # Random rotation
-    A.HorizontalFlip(p=0.5),                   # Horizontal flip
-    A.RandomBrightnessContrast(p=0.5),         # Brightness/Contrast
-    A.GaussianBlur(blur_limit=(3, 7), p=0.3),  # Blur
-    A.ISONoise(p=0.3),                         # ISO Noise
-    A.Perspective(scale=(0.05, 0.1), p=0.3),   # Perspective transform
-    A.Resize(224, 224)                         # Resize to YOLO cls default
-])
+def build_transform(size=IMG_SIZE):
+    return A.Compose([
+        A.Rotate(limit=30, p=0.7),                 # Random rotation
+        A.HorizontalFlip(p=0.5),                   # Horizontal flip
+        A.RandomBrightnessContrast(p=0.5),         # Brightness/Contrast
+        A.GaussianBlur(blur_limit=(3, 7), p=0.3),  # Blur
+        A.ISONoise(p=0.3),                         # ISO Noise
+        A.Perspective(scale=(0.05, 0.1), p=0.3),   # Perspective transform
+        A.Resize(size, size)                       # Resize to the classifier input size
+    ])
 
 def remove_watermark(img):
     """
@@ -89,115 +113,214 @@ import json
 
 # ... (Previous imports)
 
-def process():
-    # 1. Clean old data
-    if os.path.exists(OUTPUT_DIR):
-        shutil.rmtree(OUTPUT_DIR)
-        print(f"Cleaned existing directory: {OUTPUT_DIR}")
-    
-    # 2. Traverse categories
-    if not os.path.exists(SOURCE_DIR):
-        print(f"Error: Source directory not found: {SOURCE_DIR}")
+def group_artifacts(names):
+    """Group <...>/<category>/<Era_Name_ShortID>/<image> members by artifact folder."""
+    groups = {}
+    for name in names:
+        parts = name.split('/')
+        if len(parts) < 3:
+            continue
+        cat, art, filename = parts[-3:]
+        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            groups.setdefault((cat, art), []).append(name)
+    return groups
+
+def decode_artifacts(source, groups):
+    """Yield ((cat, art), {filename: img}) with all originals decoded once, read in parallel."""
+    order = [name for members in groups.values() for name in members]
+    reader = read_many(source, order, workers=READ_WORKERS)
+    for key, members in groups.items():
+        originals = {}
+        for _ in members:
+            name, data = next(reader)
+            img = None if isinstance(data, OSError) else cv2_imdecode(data)
+            if img is None:
+                print(f"Error reading {name}")
+                continue
+            originals[name.rsplit('/', 1)[-1]] = img
+        yield key, originals
+
+def crop_to_labels(source, members, originals):
+    """Crop each original to its labelled box (<image>.txt, YOLO format), padded to a square
+    the same way roi_crop.py crops at inference. Watermarks are removed before cropping."""
+    cropped = {}
+    for name in members:
+        filename = name.rsplit('/', 1)[-1]
+        img = originals.get(filename)
+        if img is None:
+            continue
+        img = remove_watermark(img.copy())
+        try:
+            lines = source.read(os.path.splitext(name)[0] + ".txt").decode('utf-8').splitlines()
+        except (OSError, UnicodeDecodeError):
+            lines = []
+        h, w = img.shape[:2]
+        box = next((b for b in (yolo_label_box(line, w, h) for line in lines) if b is not None), None)
+        if box is not None:
+            x1, y1, x2, y2 = square_box(box, w, h, ROI_PAD)
+            img = img[y1:y2, x1:x2]
+        cropped[filename] = img
+    return cropped
+
+def class_budgets(report_path, class_ids, total=None):
+    """Per-class image counts from an evaluate_model.py report.
+
+    A class's weight is its top-1 error rate plus the rate at which other
+    classes are predicted as it, so both sides of a confused pair grow and
+    classes the model already gets right shrink towards MIN_COUNT. Classes
+    missing from the report keep TARGET_COUNT. The counts sum to at most
+    `total` (default: TARGET_COUNT per class, the size of a uniform run).
+    """
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    per_class = report.get("per_class", {})
+    false_pos = Counter()
+    for _, pred_id, count in report.get("confusion", []):
+        false_pos[pred_id] += count
+
+    total = total or TARGET_COUNT * len(class_ids)
+    budgets = {c: TARGET_COUNT for c in class_ids if c.lstrip('_') not in per_class}
+    weights = {}
+    for c in class_ids:
+        stats = per_class.get(c.lstrip('_'))
+        if stats is not None:
+            weights[c] = BASE_WEIGHT + (1 - stats["top1_acc"]) + false_pos[c.lstrip('_')] / max(stats["count"], 1)
+    left = total - sum(budgets.values()) - MIN_COUNT * len(weights)
+    if left < 0:
+        raise ValueError(f"--total {total} is below the minimum of {total - left} for {len(class_ids)} classes")
+
+    # Split what is left above the floor by weight; classes hitting MAX_COUNT
+    # are fixed there and the rest is re-split among the others
+    while weights:
+        weight_sum = sum(weights.values())
+        capped = [c for c, w in weights.items() if left * w / weight_sum >= MAX_COUNT - MIN_COUNT]
+        if not capped:
+            for c, w in weights.items():
+                budgets[c] = MIN_COUNT + int(left * w / weight_sum)
+            break
+        for c in capped:
+            budgets[c] = MAX_COUNT
+            left -= MAX_COUNT - MIN_COUNT
+            del weights[c]
+    return budgets
+
+def process(source_path=SOURCE_DIR, budget_from=None, total=None, output_dir=OUTPUT_DIR, imgsz=IMG_SIZE, roi=False):
+    # 1. Traverse categories (folder tree or archive member index)
+    if not os.path.exists(source_path):
+        print(f"Error: Source directory not found: {source_path}")
         return
 
-    categories = [d for d in os.listdir(SOURCE_DIR) if os.path.isdir(os.path.join(SOURCE_DIR, d))]
+    source = open_source(source_path)
+    groups = group_artifacts(source.list_images())
+    categories = sorted({cat for cat, _ in groups})
     
-    print(f"🚀 Starting processing. Found {len(categories)} main categories.")
+    print(f"🚀 Starting processing. Found {len(categories)} main categories ({source.format} source).")
+
+    budgets = {}
+    if budget_from and groups:
+        class_ids = sorted({art.split('_')[-1] for _, art in groups})
+        try:
+            budgets = class_budgets(budget_from, class_ids, total)
+        except (OSError, ValueError) as e:
+            print(f"❌ Error: {e}")
+            source.close()
+            return
+        counts = sorted(budgets.values())
+        print(f"📊 Adaptive budgets from {budget_from}: {sum(counts)} images "
+              f"(uniform: {TARGET_COUNT * len(counts)}), per class min {counts[0]} / "
+              f"median {counts[len(counts) // 2]} / max {counts[-1]}, "
+              f"{sum(c < TARGET_COUNT for c in counts)} shrunk, {sum(c > TARGET_COUNT for c in counts)} grown")
+        with open(BUDGET_PATH, 'w', encoding='utf-8') as f:
+            json.dump({"report": budget_from, "budgets": budgets}, f, ensure_ascii=False, indent=2)
+
+    # 2. Clean old data (only once the budgets loaded successfully)
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+        print(f"Cleaned existing directory: {output_dir}")
+
+    transform = build_transform(imgsz)
 
     id_to_name_map = {}  # Store ID -> Name mapping
 
-    for cat in categories:
-        cat_path = os.path.join(SOURCE_DIR, cat)
-        # Traverse specific artifact folders (e.g., Era_Name_ShortID)
-        artifacts = [d for d in os.listdir(cat_path) if os.path.isdir(os.path.join(cat_path, d))]
+    # Traverse specific artifact folders (e.g., Era_Name_ShortID)
+    for (cat, art), originals in decode_artifacts(source, groups):
+        # Extract ShortID as class name (e.g., 89f8c3)
+        # Folder format assumption: Era_Name_ShortID
+        parts = art.split('_')
+        class_name = parts[-1]
+        # Extract real name (Middle part or full string minus ID)
+        if len(parts) >= 3:
+            real_name = parts[1] # Era_Name_ID -> Name
+        else:
+            real_name = art # Fallback
+
+        id_to_name_map[class_name] = real_name # Save mapping
+
+        # Original images, decoded once per artifact
+        if roi:
+            originals = crop_to_labels(source, groups[(cat, art)], originals)
+        images = sorted(originals)
+        if not images:
+            continue
+
+        # Create train/val directories
+        train_dir = os.path.join(output_dir, 'train', class_name)
+        val_dir = os.path.join(output_dir, 'val', class_name)
+        os.makedirs(train_dir, exist_ok=True)
+        os.makedirs(val_dir, exist_ok=True)
+
+        target_count = budgets.get(class_name, TARGET_COUNT)
+        print(f"Processing: {art} -> ID: {class_name} (Name: {real_name}), {target_count} images")
+
+        # --- Augment and Distribute ---
+        generated_count = 0
         
-        for art in artifacts:
-            # Extract ShortID as class name (e.g., 89f8c3)
-            # Folder format assumption: Era_Name_ShortID
-            parts = art.split('_')
-            try:
-                class_name = parts[-1] 
-                # Extract real name (Middle part or full string minus ID)
-                if len(parts) >= 3:
-                     real_name = parts[1] # Era_Name_ID -> Name
-                else:
-                     real_name = art # Fallback
-            except:
-                class_name = art # Fallback
-                real_name = art
-
-            id_to_name_map[class_name] = real_name # Save mapping
-            
-            src_art_path = os.path.join(cat_path, art)
-            
-            # ... (Rest of processing) ...
-            # Collect original images
-            images = [f for f in os.listdir(src_art_path) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            if not images:
-                continue
+        while generated_count < target_count:
+            if generated_count < len(images):
+                chosen_file = images[generated_count]
+                is_original = True
+            else:
+                chosen_file = random.choice(images)
+                is_original = False
 
-            # Create train/val directories
-            train_dir = os.path.join(OUTPUT_DIR, 'train', class_name)
-            val_dir = os.path.join(OUTPUT_DIR, 'val', class_name)
-            os.makedirs(train_dir, exist_ok=True)
-            os.makedirs(val_dir, exist_ok=True)
+            # Copy: watermark removal works in place
+            img = originals[chosen_file].copy()
 
-            print(f"Processing: {art} -> ID: {class_name} (Name: {real_name})")
+            # --- NEW: Watermark Removal ---
+            # (--roi crops were cleaned before cropping)
+            if is_original and not roi:
+                img = remove_watermark(img)
+            # ------------------------------
 
-            # --- Augment and Distribute ---
-            generated_count = 0
+            # Determine split (Train vs Val)
+            is_val = random.random() < VAL_RATIO
+            target_folder = val_dir if is_val else train_dir
             
-            while generated_count < TARGET_COUNT:
-                # ... (Same loop logic) ...
-                if generated_count < len(images):
-                    chosen_file = images[generated_count]
-                    is_original = True
-                else:
-                    chosen_file = random.choice(images)
-                    is_original = False
-
-                img_path = os.path.join(src_art_path, chosen_file)
-                # Use helper for reading
-                img = cv2_imread(img_path)
-                
-                if img is None:
-                    # ... (Error handling) ...
-                    if chosen_file in images:
-                        images.remove(chosen_file) 
-                    if not images: break
+            if is_original: 
+                # First pass: Save Original (Resized)
+                try:
+                    save_img = cv2.resize(img, (imgsz, imgsz))
+                    prefix = "orig"
+                except Exception as e:
+                    print(f"Resize failed for {chosen_file}: {e}")
+                    generated_count += 1
+                    continue
+            else:
+                # Augmentation
+                try:
+                    save_img = transform(image=img)['image']
+                    prefix = "aug"
+                except Exception as e:
+                    print(f"Augmentation failed for {chosen_file}: {e}")
                     continue
+            
+            # Use helper for writing
+            save_name = f"{prefix}_{generated_count}_{chosen_file}"
+            save_path = os.path.join(target_folder, save_name)
+            cv2_imwrite(save_path, save_img)
+            generated_count += 1
 
-                # --- NEW: Watermark Removal ---
-                if is_original:
-                    img = remove_watermark(img)
-                # ------------------------------
-
-                # Determine split (Train vs Val)
-                is_val = random.random() < VAL_RATIO
-                target_folder = val_dir if is_val else train_dir
-                
-                if generated_count < len(images) and is_original: 
-                    # First pass: Save Original (Resized)
-                    try:
-                        save_img = cv2.resize(img, (224, 224))
-                        prefix = "orig"
-                    except Exception as e:
-                        print(f"Resize failed for {chosen_file}: {e}")
-                        continue
-                else:
-                    # Augmentation
-                    try:
-                        save_img = transform(image=img)['image']
-                        prefix = "aug"
-                    except Exception as e:
-                        print(f"Augmentation failed for {chosen_file}: {e}")
-                        continue
-                
-                # Use helper for writing
-                save_name = f"{prefix}_{generated_count}_{chosen_file}"
-                save_path = os.path.join(target_folder, save_name)
-                cv2_imwrite(save_path, save_img)
-                generated_count += 1
+    source.close()
 
     # Save Mapping
     mapping_path = os.path.join("datasets", "id_to_name.json")
@@ -207,4 +330,16 @@ def process():
     print("✅ Data processing complete! Ready for training.")
 
 if __name__ == "__main__":
-    process()
+    parser = argparse.ArgumentParser(description="Clean, augment and split the raw artifact images.")
+    parser.add_argument("--source", default=SOURCE_DIR,
+                        help="Raw image tree, or a .zip / .tar archive of it (read without extraction)")
+    parser.add_argument("--budget-from", default=None,
+                        help="evaluate_model.py report: fewer images for easy classes, more for confused ones")
+    parser.add_argument("--total", type=int, default=None,
+                        help=f"Global image cap with --budget-from (default {TARGET_COUNT} x number of classes)")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Output dataset (train/ and val/)")
+    parser.add_argument("--imgsz", type=int, default=IMG_SIZE, help="Output image size")
+    parser.add_argument("--roi", action="store_true",
+                        help="Crop originals to their labelled box (<image>.txt) first, for the ROI-crop classifier")
+    args = parser.parse_args()
+    process(args.source, args.budget_from, args.total, args.output, args.imgsz, args.roi)
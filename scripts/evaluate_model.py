@@ -0,0 +1,211 @@
+"""
+evaluate_model.py
+------------------
+Accuracy, confusion and throughput report for a classifier in one pass.
+
+Usage:
+    python scripts/evaluate_model.py --model models/best.onnx
+    python scripts/evaluate_model.py --model models/best.pt --val datasets/processed/val --output runs/eval/best.json
+    python scripts/evaluate_model.py --model models/best.onnx --tta --tta-conf 0.6
+
+Description:
+    Runs a model (.pt / .onnx / quantized .onnx / cascade .json) over the
+    validation split (<val>/<ShortID>/<image>) through BatchPipeline, i.e.
+    with parallel image reading and batched forward passes, and reports:
+      - top-1 / top-5 accuracy and per-class accuracy
+      - a sparse confusion matrix (only non-zero off-diagonal cells)
+      - the most-confused (true -> predicted) ID pairs
+      - images/s, per-image latency percentiles and per-stage timings
+    Everything is written to one JSON file (the "分类准确率报告" of the
+    development plan) so runs can be compared across models, and fed back
+    into `data_augment.py --budget-from` to re-balance augmentation.
+    With --tta, low-confidence images get batched test-time augmentation and
+    the report adds its trigger rate and latency overhead.
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+from collections import Counter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from batch_pipeline import BatchPipeline
+from image_index import collect_val_images, load_id_mapping
+from model_backend import backend_name, load_model, warmup
+from perf_stats import STATS
+from prediction_cache import model_digest
+from tta import TTAClassifier
+
+
+def run_pipeline(model, paths, batch_size, read_workers):
+    """Return (records sorted by index, wall seconds)."""
+    pipeline = BatchPipeline(model, paths, batch_size=batch_size, read_workers=read_workers, k=5)
+    records = []
+    t0 = time.perf_counter()
+    pipeline.start()
+    while not (pipeline.finished and pipeline.results.empty()):
+        try:
+            records.append(pipeline.results.get(timeout=0.1))
+        except queue.Empty:
+            continue
+        if len(records) % 1000 == 0:
+            print(f"   {len(records)}/{len(paths)} ({pipeline.throughput():.0f} img/s)")
+    elapsed = time.perf_counter() - t0
+    records.sort(key=lambda r: r["index"])
+    return records, elapsed
+
+
+def summarize(records, labels, class_ids, id_to_name, top_confused):
+    """Accuracy, per-class accuracy and sparse confusion from pipeline records."""
+    per_class = {}
+    confusion = Counter()
+    top1_hits = top5_hits = evaluated = 0
+    for record, label in zip(records, labels):
+        if record["error"] is not None:
+            continue
+        evaluated += 1
+        predicted = [idx for idx, _ in record["topk"]]
+        hit1 = predicted[0] == label
+        hit5 = label in predicted[:5]
+        top1_hits += hit1
+        top5_hits += hit5
+        stats = per_class.setdefault(label, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += hit1
+        stats[2] += hit5
+        if not hit1:
+            confusion[(label, predicted[0])] += 1
+
+    def class_entry(idx):
+        n, hit1, hit5 = per_class[idx]
+        return {"name": id_to_name.get(class_ids[idx], class_ids[idx]), "count": n,
+                "top1_acc": round(hit1 / n, 5), "top5_acc": round(hit5 / n, 5)}
+
+    pairs = []
+    for (true, pred), count in confusion.most_common(top_confused):
+        pairs.append({
+            "true_id": class_ids[true], "true_name": id_to_name.get(class_ids[true], class_ids[true]),
+            "pred_id": class_ids[pred], "pred_name": id_to_name.get(class_ids[pred], class_ids[pred]),
+            "count": count, "rate": round(count / per_class[true][0], 5),
+        })
+
+    return {
+        "evaluated": evaluated,
+        "top1_acc": round(top1_hits / evaluated, 5) if evaluated else 0.0,
+        "top5_acc": round(top5_hits / evaluated, 5) if evaluated else 0.0,
+        "mean_class_acc": round(float(np.mean([h / n for n, h, _ in per_class.values()])), 5) if per_class else 0.0,
+        "per_class": {class_ids[idx]: class_entry(idx) for idx in sorted(per_class, key=lambda i: class_ids[i])},
+        # [true_id, predicted_id, count] for every non-zero off-diagonal cell
+        "confusion": [[class_ids[t], class_ids[p], c] for (t, p), c in sorted(confusion.items())],
+        "most_confused": pairs,
+    }
+
+
+def evaluate():
+    parser = argparse.ArgumentParser(description="Evaluate a classifier on the validation split.")
+    parser.add_argument("--model", required=True, help="Path to .onnx / .pt / cascade .json model")
+    parser.add_argument("--val", default=os.path.join(PROJECT_ROOT, "datasets", "processed", "val"))
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--read-workers", type=int, default=4)
+    parser.add_argument("--top-confused", type=int, default=20)
+    parser.add_argument("--tta", action="store_true", help="Test-time augmentation for low-confidence images")
+    parser.add_argument("--tta-conf", type=float, default=0.5)
+    parser.add_argument("--tta-margin", type=float, default=0.0)
+    parser.add_argument("--output", default=None, help="JSON report (default runs/eval/<model>_<time>.json)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Error: Model not found: {args.model}")
+        return
+    if not os.path.isdir(args.val):
+        print(f"❌ Error: Validation split not found: {args.val}")
+        return
+
+    model = load_model(args.model)
+    warmup(model)
+    if args.tta:
+        try:
+            model = TTAClassifier(model, args.tta_conf, args.tta_margin)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+    class_ids = {i: str(name).lstrip('_') for i, name in model.names.items()}
+    name_to_idx = {cid: i for i, cid in class_ids.items()}
+
+    samples = collect_val_images(args.val)
+    unknown = sorted({c for _, c in samples if c.lstrip('_') not in name_to_idx})
+    samples = [(p, c) for p, c in samples if c.lstrip('_') in name_to_idx]
+    if not samples:
+        print("❌ Error: No val images whose class is known to the model.")
+        return
+    if unknown:
+        print(f"⚠️ {len(unknown)} val classes are unknown to the model and skipped")
+
+    paths = [p for p, _ in samples]
+    labels = [name_to_idx[c.lstrip('_')] for _, c in samples]
+    print(f"🚀 Evaluating {os.path.basename(args.model)} ({backend_name(model)}) on "
+          f"{len(paths)} images / {len(set(labels))} classes")
+
+    STATS.reset()
+    records, elapsed = run_pipeline(model, paths, args.batch, args.read_workers)
+    report = summarize(records, labels, class_ids, load_id_mapping(PROJECT_ROOT), args.top_confused)
+
+    latencies = np.array([r["latency_ms"] for r in records if r["error"] is None] or [0.0])
+    errors = [{"path": r["path"], "error": r["error"]} for r in records if r["error"] is not None]
+    perf = STATS.summary()
+    report = dict({
+        "model": os.path.basename(args.model),
+        "model_hash": model_digest(args.model),
+        "backend": backend_name(model),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "val_dir": args.val,
+        "images": len(paths),
+        "classes": len(set(labels)),
+        "unknown_classes": unknown,
+        "errors": errors,
+        "throughput_img_s": round(len(paths) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+        },
+        "stages": perf["stages"],
+        "rss_mb": perf["rss_mb"],
+    }, **report)
+    if args.tta:
+        report["tta"] = model.stats()
+
+    print(f"\n📊 Results ({report['evaluated']} images, {len(errors)} unreadable)")
+    print(f"  top-1        : {report['top1_acc'] * 100:.2f}%")
+    print(f"  top-5        : {report['top5_acc'] * 100:.2f}%")
+    print(f"  class mean   : {report['mean_class_acc'] * 100:.2f}%")
+    print(f"  throughput   : {report['throughput_img_s']:.1f} img/s")
+    print(f"  latency (ms) : p50 {report['latency_ms']['p50']:.2f}  p95 {report['latency_ms']['p95']:.2f}  "
+          f"p99 {report['latency_ms']['p99']:.2f}")
+    if args.tta:
+        print(f"  TTA          : {report['tta']['trigger_rate'] * 100:.1f}% of images, "
+              f"{report['tta']['overhead'] * 100:+.1f}% latency")
+    if report["most_confused"]:
+        print("\n  Most confused (true -> predicted):")
+        for pair in report["most_confused"][:10]:
+            print(f"    {pair['true_name']} ({pair['true_id']}) -> {pair['pred_name']} ({pair['pred_id']}): "
+                  f"{pair['count']} ({pair['rate'] * 100:.0f}%)")
+
+    output = args.output or os.path.join(
+        PROJECT_ROOT, "runs", "eval",
+        f"{os.path.splitext(os.path.basename(args.model))[0]}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Report written to {output}")
+
+
+if __name__ == "__main__":
+    evaluate()
@@ -2,48 +2,97 @@
 export_model.py
 ----------------
 Exports the trained YOLOv8 classification model to ONNX format.
+
+The pooled backbone features feeding the final Linear layer are exposed as a
+second graph output named "embedding", used by the similar-artifact index
+(scripts/build_embedding_index.py). The class probabilities stay output 0.
 """
 
 from ultralytics import YOLO
+import argparse
 import os
 import shutil
 
-def export_model():
-    # Paths
-    # Note: Adjust these if your run name changes
-    source_weights = "runs/classify/runs/classify/artifact_cls_run/weights/best.pt"
-    dest_dir = "models"
-    dest_name = "best.onnx"
-    dest_path = os.path.join(dest_dir, dest_name)
+EMBEDDING_OUTPUT = "embedding"
 
-    # Check if source exists
-    if not os.path.exists(source_weights):
-        print(f"❌ Error: Source weights not found at {source_weights}")
-        return
 
+def add_embedding_output(onnx_path):
+    """Expose the input of the last Gemm/MatMul (pooled features) as an extra output."""
+    import onnx
+    from onnx import helper
+
+    model = onnx.load(onnx_path)
+    graph = model.graph
+    if any(o.name == EMBEDDING_OUTPUT for o in graph.output):
+        return True
+    heads = [n for n in graph.node if n.op_type in ("Gemm", "MatMul")]
+    if not heads:
+        return False
+
+    features = heads[-1].input[0]
+    graph.node.append(helper.make_node("Identity", [features], [EMBEDDING_OUTPUT], name="embedding_identity"))
+    graph.output.append(helper.make_tensor_value_info(EMBEDDING_OUTPUT, onnx.TensorProto.FLOAT, ["batch", None]))
+    onnx.checker.check_model(model)
+    onnx.save(model, onnx_path)
+    return True
+
+
+def export_onnx(source_weights, dest_path):
+    """Export weights to ONNX (dynamic batch + embedding output) and copy to dest_path."""
     print(f"🔄 Loading model from {source_weights}...")
     model = YOLO(source_weights)
 
     print("📤 Starting export to ONNX...")
     # export() returns the path to the exported file
-    exported_path = model.export(format="onnx")
+    # dynamic=True keeps the batch axis dynamic so multi-view / batch inference
+    # runs as a single forward pass instead of one call per image
+    exported_path = model.export(format="onnx", dynamic=True)
     
     # Verify export
-    if exported_path and os.path.exists(exported_path):
-        print(f"✅ Export successful: {exported_path}")
-        
-        # Move to models directory
-        os.makedirs(dest_dir, exist_ok=True)
-        
-        # The exported file is usually in the same dir as weights
-        # We move it to our central 'models' dir
-        try:
-            shutil.copy(exported_path, dest_path)
-            print(f"📂 Copied to: {dest_path}")
-        except Exception as e:
-            print(f"⚠️ Could not copy file: {e}")
-    else:
+    if not (exported_path and os.path.exists(exported_path)):
         print("❌ Export failed.")
+        return None
+    print(f"✅ Export successful: {exported_path}")
+
+    try:
+        if add_embedding_output(exported_path):
+            print(f"🧬 Added '{EMBEDDING_OUTPUT}' output for similarity search")
+        else:
+            print("⚠️ No classifier head found, embedding output not added")
+    except ImportError:
+        print("⚠️ onnx not installed, embedding output not added (pip install onnx)")
+    
+    # Move to models directory
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    
+    # The exported file is usually in the same dir as weights
+    # We move it to our central 'models' dir
+    try:
+        shutil.copy(exported_path, dest_path)
+        print(f"📂 Copied to: {dest_path}")
+    except Exception as e:
+        print(f"⚠️ Could not copy file: {e}")
+        return exported_path
+    return dest_path
+
+
+def export_model():
+    parser = argparse.ArgumentParser(description="Export the classifier to ONNX.")
+    # Note: Adjust these if your run name changes
+    parser.add_argument("--weights", default="runs/classify/runs/classify/artifact_cls_run/weights/best.pt")
+    parser.add_argument("--output", default=os.path.join("models", "best.onnx"))
+    args = parser.parse_args()
+
+    # Paths
+    source_weights = args.weights
+    dest_path = args.output
+
+    # Check if source exists
+    if not os.path.exists(source_weights):
+        print(f"❌ Error: Source weights not found at {source_weights}")
+        return
+
+    export_onnx(source_weights, dest_path)
 
 if __name__ == "__main__":
     export_model()
@@ -0,0 +1,142 @@
+"""
+load_test_server.py
+--------------------
+Load test for the local inference server (app/inference_server.py).
+
+Usage:
+    python app/inference_server.py --model models/best.onnx        # terminal 1
+    python scripts/load_test_server.py --concurrency 32 --duration 20  # terminal 2
+
+Description:
+    Opens N keep-alive connections to localhost and posts sampled dataset
+    images as fast as possible for a fixed duration, then reports throughput,
+    latency percentiles, 503 (backpressure) rejections and the server-side
+    /metrics snapshot (average dynamic batch size, queue depth).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+from image_index import is_image_file
+
+
+def load_payloads(root, limit):
+    payloads = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if is_image_file(name):
+                with open(os.path.join(dirpath, name), 'rb') as f:
+                    payloads.append(f.read())
+                if len(payloads) >= limit:
+                    return payloads
+    return payloads
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def worker(host, port, payloads, stop_at, stats, lock):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    latencies, ok, rejected, failed = [], 0, 0, 0
+    while time.perf_counter() < stop_at:
+        body = random.choice(payloads)
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", "/predict", body=body, headers={"Content-Type": "image/jpeg"})
+            resp = conn.getresponse()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        if resp.status == 200:
+            ok += 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elif resp.status == 503:
+            rejected += 1
+            time.sleep(0.01)
+        else:
+            failed += 1
+    conn.close()
+
+    with lock:
+        stats["latencies"].extend(latencies)
+        stats["ok"] += ok
+        stats["rejected"] += rejected
+        stats["failed"] += failed
+
+
+def fetch_json(host, port, path):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.request("GET", path)
+    data = json.loads(conn.getresponse().read())
+    conn.close()
+    return data
+
+
+def load_test():
+    parser = argparse.ArgumentParser(description="Load test the local inference server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "dataset"))
+    parser.add_argument("--limit", type=int, default=64, help="Distinct images to sample")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.images, args.limit)
+    if not payloads:
+        print(f"❌ Error: No images found under {args.images}")
+        return
+
+    try:
+        health = fetch_json(args.host, args.port, "/health")
+    except OSError as e:
+        print(f"❌ Error: Server not reachable at {args.host}:{args.port} ({e})")
+        return
+    print(f"🎯 {health['model']} ({health['backend']}), {args.concurrency} clients, {args.duration:.0f}s")
+
+    stats = {"latencies": [], "ok": 0, "rejected": 0, "failed": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.host, args.port, payloads, stop_at, stats, lock))
+        for _ in range(args.concurrency)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    lat = stats["latencies"]
+    print("\n📊 Results")
+    print(f"  throughput : {stats['ok'] / elapsed:.1f} req/s")
+    print(f"  ok / 503 / failed : {stats['ok']} / {stats['rejected']} / {stats['failed']}")
+    print(f"  latency ms : p50 {percentile(lat, 50):.1f}  p95 {percentile(lat, 95):.1f}  p99 {percentile(lat, 99):.1f}")
+
+    metrics = fetch_json(args.host, args.port, "/metrics")
+    print(f"  server avg batch size : {metrics['avg_batch_size']}")
+    print(f"  server batches        : {metrics['batches_total']}")
+    for stage, s in metrics.get("stages", {}).items():
+        if s["count"]:
+            print(f"  server {stage:<14} : p50 {s['p50_ms']:.2f}  p95 {s['p95_ms']:.2f}  p99 {s['p99_ms']:.2f} ms/img")
+
+
+if __name__ == "__main__":
+    load_test()
@@ -0,0 +1,237 @@
+"""
+prune_model.py
+---------------
+Structured channel pruning with fine-tune recovery for the classifier.
+
+Usage:
+    python scripts/prune_model.py
+    python scripts/prune_model.py --weights runs/classify/runs/classify/artifact_cls_run/weights/best.pt --flops 0.75,0.5,0.35 --epochs 10
+    python scripts/prune_model.py --latency-ms 6,4 --epochs 10
+
+Description:
+    Shrinks the trained yolov8s-cls by removing whole convolution channels
+    (torch-pruning dependency graph, L2-magnitude importance), so the result is
+    a smaller dense network that runs faster everywhere - no sparse kernels.
+    For each budget level:
+      1. prune a copy of the original model in small steps until it fits the
+         budget: a fraction of the original FLOPs (--flops) or a CPU forward
+         latency in ms at batch 1 (--latency-ms)
+      2. fine-tune it on datasets/processed for --epochs to recover accuracy
+      3. export it through the regular ONNX export (dynamic batch + embedding
+         output) to models/pruned/<weights>_<level>.onnx
+      4. measure top-1 / top-5 on the val split and single-image CPU latency
+         of the exported ONNX
+    The unpruned model is exported and measured the same way as the first row.
+    The report table is printed and written to runs/prune/report_<time>.json.
+
+    Requires torch-pruning (pip install torch-pruning).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from copy import deepcopy
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.models.yolo.classify import ClassificationTrainer
+
+from evaluate_model import run_pipeline, summarize
+from export_model import export_onnx
+from image_index import collect_val_images
+from model_backend import load_model, predict_probs, warmup
+from preprocess import PreparedImage
+
+DEFAULT_WEIGHTS = os.path.join(PROJECT_ROOT, "runs", "classify", "runs", "classify", "artifact_cls_run", "weights", "best.pt")
+PRUNE_DIR = os.path.join(PROJECT_ROOT, "runs", "prune")
+MAX_RATIO = 0.9  # never remove more than 90% of any layer's channels
+
+
+class PrunedClassificationTrainer(ClassificationTrainer):
+    """Fine-tunes the given (pruned) network instead of rebuilding it from the yaml config."""
+    def get_model(self, cfg=None, weights=None, verbose=True):
+        for p in weights.parameters():
+            p.requires_grad = True
+        return weights
+
+
+def count_flops(tp, net, example):
+    """(GFLOPs, params); torch-pruning counts multiply-accumulates, 1 MAC = 2 FLOPs."""
+    macs, params = tp.utils.count_ops_and_params(net, example)
+    return 2 * macs / 1e9, params
+
+
+def torch_latency_ms(net, example, iterations=20):
+    """Median CPU forward time at batch 1."""
+    samples = []
+    with torch.no_grad():
+        net(example)
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            net(example)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(samples))
+
+
+def prune_to_budget(tp, net, example, within_budget, steps):
+    """Remove channels in `steps` equal increments (up to MAX_RATIO) until within_budget(net)."""
+    for p in net.parameters():
+        p.requires_grad = True
+    head = net.model[-1].linear  # class outputs must stay intact
+    pruner = tp.pruner.MagnitudePruner(
+        net, example, importance=tp.importance.MagnitudeImportance(p=2),
+        iterative_steps=steps, pruning_ratio=MAX_RATIO, ignored_layers=[head])
+    for step in range(steps):
+        if within_budget(net):
+            return step * MAX_RATIO / steps
+        pruner.step()
+    return MAX_RATIO
+
+
+def save_checkpoint(net, train_args, path):
+    """ultralytics-compatible checkpoint, so YOLO(path) loads the pruned structure."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    torch.save({"model": deepcopy(net).float(), "train_args": train_args, "epoch": -1}, path)
+
+
+def fine_tune(checkpoint, args, name):
+    """Fine-tune a pruned checkpoint; returns the path of its best weights."""
+    model = YOLO(checkpoint)
+    model.train(trainer=PrunedClassificationTrainer, data=os.path.abspath(args.data), epochs=args.epochs,
+                imgsz=args.imgsz, batch=args.batch, project=PRUNE_DIR, name=name, exist_ok=True)
+    best = str(model.trainer.best)
+    return best if os.path.exists(best) else str(model.trainer.last)
+
+
+def measure_onnx(onnx_path, samples, args):
+    """Accuracy on the val split and single-image CPU latency of an exported model."""
+    model = load_model(onnx_path, intra_op_threads=args.threads)
+    warmup(model)
+    class_ids = {i: str(name).lstrip('_') for i, name in model.names.items()}
+    name_to_idx = {cid: i for i, cid in class_ids.items()}
+    samples = [(p, c) for p, c in samples if c.lstrip('_') in name_to_idx]
+    result = {}
+    if samples:
+        records, _ = run_pipeline(model, [p for p, _ in samples], args.batch, 4)
+        summary = summarize(records, [name_to_idx[c.lstrip('_')] for _, c in samples], class_ids, {}, 0)
+        result = {"top1_acc": summary["top1_acc"], "top5_acc": summary["top5_acc"]}
+
+    # Already-resized input: measures the model, not JPEG decoding
+    image = PreparedImage(None, None, np.random.default_rng(0).integers(0, 255, (args.imgsz, args.imgsz, 3),
+                                                                         dtype=np.uint8))
+    latencies = []
+    for _ in range(args.latency_iters):
+        t0 = time.perf_counter()
+        predict_probs(model, [image])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    result["latency_ms"] = round(float(np.median(latencies)), 3)
+    result["latency_p95_ms"] = round(float(np.percentile(latencies, 95)), 3)
+    return result
+
+
+def parse_levels(value):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def prune():
+    parser = argparse.ArgumentParser(description="Prune channels, fine-tune and export the classifier.")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS, help="Trained ultralytics .pt weights")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("--flops", default="0.75,0.5,0.35", help="Fractions of the original FLOPs to keep")
+    budget.add_argument("--latency-ms", default=None, help="CPU forward latency budgets (batch 1, ms)")
+    parser.add_argument("--steps", type=int, default=30, help="Pruning increments up to the maximum ratio")
+    parser.add_argument("--epochs", type=int, default=10, help="Fine-tune epochs per level (0 = no fine-tune)")
+    parser.add_argument("--data", default=os.path.join(PROJECT_ROOT, "datasets", "processed"))
+    parser.add_argument("--imgsz", type=int, default=224)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime threads for latency (0 = default)")
+    parser.add_argument("--latency-iters", type=int, default=100)
+    parser.add_argument("--output", default=None, help="JSON report (default runs/prune/report_<time>.json)")
+    args = parser.parse_args()
+
+    try:
+        import torch_pruning as tp
+    except ImportError:
+        print("❌ Error: torch-pruning not installed (pip install torch-pruning)")
+        return
+    if not os.path.exists(args.weights):
+        print(f"❌ Error: Weights not found: {args.weights}")
+        return
+
+    base = YOLO(args.weights)
+    net = base.model.float().cpu().eval()
+    train_args = dict(base.ckpt.get("train_args", {})) if base.ckpt else {}
+    example = torch.randn(1, 3, args.imgsz, args.imgsz)
+    base_flops, base_params = count_flops(tp, net, example)
+    stem = os.path.splitext(os.path.basename(args.weights))[0]
+    out_dir = os.path.join(PROJECT_ROOT, "models", "pruned")
+
+    val_dir = os.path.join(args.data, "val")
+    samples = collect_val_images(val_dir) if os.path.isdir(val_dir) else []
+    if not samples:
+        print(f"⚠️ No val images in {val_dir}, accuracy will not be reported")
+
+    if args.latency_ms:
+        levels = [("latency", budget) for budget in parse_levels(args.latency_ms)]
+    else:
+        levels = [("flops", keep) for keep in parse_levels(args.flops)]
+    print(f"🚀 {stem}: {base_flops:.2f} GFLOPs, {base_params / 1e6:.2f} M params, "
+          f"{torch_latency_ms(net, example):.2f} ms/img (torch CPU)")
+
+    rows = []
+    original = export_onnx(args.weights, os.path.join(out_dir, f"{stem}_original.onnx"))
+    if original:
+        rows.append(dict({"level": "original", "ratio": 0.0, "gflops": round(base_flops, 3),
+                          "params_m": round(base_params / 1e6, 3), "onnx": original},
+                         **measure_onnx(original, samples, args)))
+
+    for kind, target in levels:
+        if kind == "flops":
+            tag = f"flops{int(round(target * 100))}"
+            within_budget = lambda m, t=target: count_flops(tp, m, example)[0] <= base_flops * t
+        else:
+            tag = f"lat{target:g}ms"
+            within_budget = lambda m, t=target: torch_latency_ms(m, example) <= t
+        print(f"\n✂️ Pruning to {tag}...")
+
+        pruned = deepcopy(net)
+        ratio = prune_to_budget(tp, pruned, example, within_budget, args.steps)
+        if not within_budget(pruned):
+            print(f"⚠️ {tag}: budget not reached at the maximum ratio {MAX_RATIO}")
+        flops, params = count_flops(tp, pruned, example)
+        print(f"   ratio {ratio:.2f}: {flops:.2f} GFLOPs, {params / 1e6:.2f} M params")
+
+        checkpoint = os.path.join(PRUNE_DIR, tag, "pruned.pt")
+        save_checkpoint(pruned.eval(), train_args, checkpoint)
+        weights = fine_tune(checkpoint, args, tag) if args.epochs > 0 else checkpoint
+        onnx_path = export_onnx(weights, os.path.join(out_dir, f"{stem}_{tag}.onnx"))
+        if not onnx_path:
+            continue
+        rows.append(dict({"level": tag, "ratio": round(ratio, 3), "gflops": round(flops, 3),
+                          "params_m": round(params / 1e6, 3), "onnx": onnx_path},
+                         **measure_onnx(onnx_path, samples, args)))
+
+    print(f"\n📊 {'level':<12} {'ratio':>6} {'GFLOPs':>7} {'params M':>9} {'top-1':>7} {'top-5':>7} {'ms/img':>7}")
+    for row in rows:
+        top1 = f"{row['top1_acc'] * 100:.2f}" if "top1_acc" in row else "-"
+        top5 = f"{row['top5_acc'] * 100:.2f}" if "top5_acc" in row else "-"
+        print(f"   {row['level']:<12} {row['ratio']:>6.2f} {row['gflops']:>7.2f} {row['params_m']:>9.2f} "
+              f"{top1:>7} {top5:>7} {row['latency_ms']:>7.2f}")
+
+    output = args.output or os.path.join(PRUNE_DIR, f"report_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({"weights": args.weights, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "epochs": args.epochs, "imgsz": args.imgsz, "threads": args.threads,
+                   "levels": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Report written to {output}")
+
+
+if __name__ == "__main__":
+    prune()
@@ -0,0 +1,69 @@
+"""
+query_similar.py
+-----------------
+Find the catalogued artifacts most similar to a query image.
+
+Usage:
+    python scripts/query_similar.py path/to/image.jpg [more images]
+    python scripts/query_similar.py image.jpg --k 10 --index models/embedding_index
+
+Description:
+    Embeds each query with the model the index was built with and prints the
+    k nearest artifacts (one entry per artifact, cosine distance), the embed /
+    search time in milliseconds, and whether the query looks like an artifact
+    that is not in the catalogue (nearest distance above the open-set threshold
+    stored in the index). Build the index with scripts/build_embedding_index.py.
+"""
+
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+from embedding_index import DEFAULT_INDEX_DIR, EmbeddingIndex
+from image_index import load_id_mapping
+from model_backend import load_model
+from prediction_cache import model_digest
+
+
+def query():
+    parser = argparse.ArgumentParser(description="Query the similar-artifact index.")
+    parser.add_argument("images", nargs="+", help="Query images")
+    parser.add_argument("--index", default=os.path.join(PROJECT_ROOT, DEFAULT_INDEX_DIR))
+    parser.add_argument("--model", default=None, help="Defaults to the model the index was built with")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.index, "meta.json")):
+        print(f"❌ Error: Index not found: {args.index} (run scripts/build_embedding_index.py)")
+        return
+
+    index = EmbeddingIndex.load(args.index)
+    model_path = args.model or os.path.join(PROJECT_ROOT, "models", index.meta.get("model", "best.onnx"))
+    if not os.path.exists(model_path):
+        print(f"❌ Error: Model not found: {model_path}")
+        return
+    if index.meta.get("model_hash") and model_digest(model_path) != index.meta["model_hash"]:
+        print("⚠️ The model differs from the one the index was built with; rebuild the index.")
+
+    model = load_model(model_path)
+    id_to_name = load_id_mapping(PROJECT_ROOT)
+    print(f"🚀 {len(index)} views, {index.dim} dims, mode {index.meta['mode']}")
+
+    for path in args.images:
+        if not os.path.exists(path):
+            print(f"❌ Error: Image not found: {path}")
+            continue
+        result = index.query(model, path, args.k)
+        print(f"\n🔎 {path} (embed {result['embed_ms']:.1f} ms, search {result['search_ms']:.2f} ms)")
+        for rank, hit in enumerate(result["hits"], start=1):
+            name = id_to_name.get(hit["id"], hit["id"])
+            print(f"  #{rank} {name} (ID: {hit['id']}) distance {hit['distance']:.4f}  {hit['path']}")
+        if result["unknown"]:
+            print(f"  ⚠️ Nearest distance above {index.open_set_distance:.4f}: probably not in the catalogue")
+
+
+if __name__ == "__main__":
+    query()
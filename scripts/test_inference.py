@@ -4,15 +4,214 @@ test_inference.py
 Local inference testing script.
 
 Usage:
-    python scripts/test_inference.py
+    python scripts/test_inference.py path/to/image.jpg [more images or folders]
+    python scripts/test_inference.py dataset/some_folder --model models/best.onnx --topk 3
+    python scripts/test_inference.py dataset/<category>/<artifact> --fuse mean
+    python scripts/test_inference.py dataset --export runs/exports/results.csv
+    python scripts/test_inference.py dataset --perf-json runs/perf/cli.json
+    python scripts/test_inference.py dataset.zip --export runs/exports/results.csv
+    python scripts/test_inference.py dataset --tta --tta-conf 0.6
 
 Description:
-    This script loads the trained model from models/artifact_cls_best.onnx
-    (or .pt) and runs inference on test images.
+    This script loads the trained model from models/best.onnx
+    (or models/artifact_cls_best.onnx / .pt) and runs inference on test images.
+    ONNX models are run with the lightweight onnxruntime backend, so no
+    torch / ultralytics import is needed.
+    With --fuse, every folder (or the list of loose files) is treated as the
+    views of one artifact: all views run as one batch and their probabilities
+    are fused into a single top-k with per-view agreement.
+    With --export, each result is streamed to a .csv / .jsonl / .parquet file
+    as it is produced (top-k IDs, names, confidences, model hash, latency).
+    .zip / .tar inputs are read in place (no extraction); every image member
+    is classified and reported as <archive>::<member>.
+    With --perf-json, per-stage latency percentiles (decode / preprocess /
+    forward / postprocess), throughput and RSS are written for regression tracking.
+    With --tta, images whose top-1 confidence is below --tta-conf are expanded
+    into flipped / rotated / cropped views that run as one extra batch and are
+    fused with the original; the trigger rate and added latency are reported.
 """
 
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+from archive_source import expand_archive, is_archive, read_bytes, split_member_path
+from image_index import is_image_file, load_id_mapping
+from model_backend import load_model, backend_name, predict_probs
+from multiview import FUSION_METHODS, classify_views, collect_views
+from prediction_cache import model_digest
+from perf_stats import STAGES, STATS
+from result_export import EXPORT_FORMATS, ResultExporter
+from results import topk
+from tta import DEFAULT_VIEWS, TTA_VIEWS, TTAClassifier
+
+DEFAULT_MODELS = [
+    os.path.join("models", "best.onnx"),
+    os.path.join("models", "artifact_cls_best.onnx"),
+    os.path.join("models", "best.pt"),
+]
+
+
+def collect_images(inputs):
+    """Expand files and folders into a sorted list of image paths."""
+    images = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if is_image_file(name):
+                    images.append(os.path.join(item, name))
+        elif is_archive(item):
+            images.extend(expand_archive(item))
+        elif is_image_file(item):
+            images.append(item)
+    return images
+
+
+def display_name(class_id, id_to_name):
+    clean_id = class_id.lstrip('_')
+    return id_to_name.get(clean_id, class_id), clean_id
+
+
+def fuse_inputs(model, inputs, method, k, id_to_name):
+    """Fuse each folder (and the loose files as one group) into one prediction."""
+    groups = [collect_views(item) for item in inputs if os.path.isdir(item)]
+    loose = collect_images([item for item in inputs if not os.path.isdir(item)])
+    if loose:
+        groups.append(loose)
+
+    for views in groups:
+        if not views:
+            continue
+        t0 = time.perf_counter()
+        result = classify_views(model, views, method)
+        infer_ms = (time.perf_counter() - t0) * 1000
+
+        print(f"\n🧩 {os.path.dirname(views[0])} ({len(views)} views, {method}, {infer_ms:.1f} ms)")
+        for rank, (idx, conf) in enumerate(result.topk(k), start=1):
+            real_name, clean_id = display_name(model.names[idx], id_to_name)
+            print(f"  #{rank} {real_name} (ID: {clean_id}) {conf * 100:.1f}%")
+        print(f"  agreement: {result.agreement * 100:.0f}% of views vote for the fused top-1")
+        for view, idx, conf in zip(views, result.view_top1, result.view_top1conf):
+            real_name, _ = display_name(model.names[int(idx)], id_to_name)
+            print(f"    {os.path.basename(view):<14} {real_name} {conf * 100:.1f}%")
+
+
+def print_tta_summary(model):
+    if not isinstance(model, TTAClassifier) or not model.total:
+        return
+    print(f"\n🔁 TTA ({len(model.views) + 1} views): {model.triggered}/{model.total} images "
+          f"({model.trigger_rate * 100:.1f}%), +{model.tta_ms:.0f} ms over {model.base_ms:.0f} ms "
+          f"({model.overhead * 100:+.1f}%)")
+
+
+def find_default_model():
+    for rel_path in DEFAULT_MODELS:
+        path = os.path.join(PROJECT_ROOT, rel_path)
+        if os.path.exists(path):
+            return path
+    return None
+
+
 def predict():
-    print("Inference script placeholder.")
+    parser = argparse.ArgumentParser(description="Run artifact classification on images.")
+    parser.add_argument("inputs", nargs="+", help="Image files or folders")
+    parser.add_argument("--model", default=None, help="Path to .onnx / .pt model")
+    parser.add_argument("--topk", type=int, default=5, help="Number of candidates to print")
+    parser.add_argument("--fuse", choices=FUSION_METHODS, default=None,
+                        help="Fuse all views of an artifact folder into one prediction")
+    parser.add_argument("--export", default=None,
+                        help=f"Stream results to a file ({' / '.join(EXPORT_FORMATS)}, chosen by extension)")
+    parser.add_argument("--perf-json", default=None, help="Write per-stage timing percentiles to a JSON file")
+    parser.add_argument("--tta", action="store_true", help="Test-time augmentation for low-confidence images")
+    parser.add_argument("--tta-conf", type=float, default=0.5, help="Run TTA when top-1 confidence is below this")
+    parser.add_argument("--tta-margin", type=float, default=0.0, help="... or top-1 minus top-2 is below this")
+    parser.add_argument("--tta-views", default=",".join(DEFAULT_VIEWS),
+                        help=f"Comma-separated views ({', '.join(TTA_VIEWS)})")
+    args = parser.parse_args()
+
+    model_path = args.model or find_default_model()
+    if not model_path or not os.path.exists(model_path):
+        print(f"❌ Error: Model not found: {model_path or DEFAULT_MODELS[0]}")
+        return
+
+    images = collect_images(args.inputs)
+    if not images and not args.fuse:
+        print("❌ Error: No images found.")
+        return
+
+    t0 = time.perf_counter()
+    model = load_model(model_path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    if args.tta:
+        try:
+            model = TTAClassifier(model, args.tta_conf, args.tta_margin, [v for v in args.tta_views.split(",") if v])
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+    print(f"🔄 Loaded {os.path.basename(model_path)} ({backend_name(model)}) in {load_ms:.0f} ms")
+
+    id_to_name = load_id_mapping(PROJECT_ROOT)
+    names = model.names
+
+    if args.fuse:
+        fuse_inputs(model, args.inputs, args.fuse, args.topk, id_to_name)
+        print_tta_summary(model)
+        return
+
+    exporter = None
+    if args.export:
+        try:
+            exporter = ResultExporter(args.export, names, id_to_name, model_digest(model_path), k=args.topk)
+        except (ImportError, ValueError) as e:
+            print(f"❌ Error: {e}")
+            return
+
+    try:
+        for i, img_path in enumerate(images):
+            t0 = time.perf_counter()
+            try:
+                source = read_bytes(img_path) if split_member_path(img_path) else img_path
+                probs = predict_probs(model, [source])[0]
+            except (OSError, ValueError) as e:
+                # unreadable or corrupt image: report it and keep going
+                print(f"\n❌ {img_path}: {e}")
+                if exporter is not None:
+                    exporter.write({"index": i, "path": img_path, "error": str(e),
+                                    "latency_ms": (time.perf_counter() - t0) * 1000, "topk": []})
+                continue
+            infer_ms = (time.perf_counter() - t0) * 1000
+            ranked = topk(probs, args.topk)
+
+            print(f"\n🖼️ {img_path} ({infer_ms:.1f} ms)")
+            for rank, idx in enumerate(ranked, start=1):
+                real_name, clean_id = display_name(names[int(idx)], id_to_name)
+                print(f"  #{rank} {real_name} (ID: {clean_id}) {probs[idx] * 100:.1f}%")
+
+            if exporter is not None:
+                exporter.write({
+                    "index": i, "path": img_path, "error": None, "latency_ms": infer_ms,
+                    "topk": [(int(idx), float(probs[idx])) for idx in ranked],
+                })
+    finally:
+        if exporter is not None:
+            exporter.close()
+            print(f"\n✅ Exported {exporter.count} results to {args.export}")
+
+    print_tta_summary(model)
+    summary = STATS.summary()
+    print("\n📊 Stage latency (ms/img)")
+    for stage in STAGES:
+        s = summary["stages"][stage]
+        if s["count"]:
+            print(f"  {stage:<12} p50 {s['p50_ms']:>7.2f}  p95 {s['p95_ms']:>7.2f}  p99 {s['p99_ms']:>7.2f}  (n={s['count']})")
+    if args.perf_json:
+        STATS.dump(args.perf_json, source="cli", model=os.path.basename(model_path), backend=backend_name(model))
+        print(f"✅ Timing written to {args.perf_json}")
+
 
 if __name__ == "__main__":
     predict()
@@ -0,0 +1,158 @@
+"""
+train_localizer.py
+-------------------
+Train the artifact localizer, the first stage of ROI-crop inference.
+
+Usage:
+    python scripts/train_localizer.py
+    python scripts/train_localizer.py --source dataset --epochs 50 --imgsz 320 --classifier models/best_roi.onnx
+    python scripts/train_localizer.py --prepare-only
+
+Description:
+    Every artifact folder keeps YOLO box labels next to its photos
+    (main.jpg + main.txt, angle_N.jpg + angle_N.txt; class 0 is the artifact).
+    This script
+      1. builds a single-class detection dataset in datasets/localizer/
+         (images are hard-linked, or copied across drives; artifacts are split
+         into train / val by a hash of their folder name, so no artifact has
+         views in both)
+      2. trains a tiny yolov8n detector on it at --imgsz
+      3. exports it to ONNX (models/localizer/localizer.onnx, outside the
+         models/*.onnx classifier list) and writes models/roi.json, which
+         load_model() / the GUI / the HTTP server accept like a model file
+    Run scripts/benchmark_roi.py afterwards to compare against full-frame
+    classification.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import zlib
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+from image_index import is_image_file
+from prediction_cache import file_digest
+from roi_crop import yolo_label_box
+
+VAL_PERCENT = 10
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def read_label(path):
+    """Valid boxes of a YOLO label file, rewritten as class 0."""
+    lines = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if yolo_label_box(line, 1, 1) is not None:
+                lines.append("0 " + " ".join(line.split()[1:5]))
+    return lines
+
+
+def build_dataset(source_dir, out_dir):
+    """<category>/<Era_Name_ShortID>/<view>.jpg + .txt -> YOLO detection layout; returns data.yaml path."""
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    counts = {"train": 0, "val": 0}
+    skipped = 0
+    for dirpath, _, filenames in os.walk(source_dir):
+        art = os.path.basename(dirpath)
+        split = "val" if zlib.crc32(art.encode('utf-8')) % 100 < VAL_PERCENT else "train"
+        for name in sorted(filenames):
+            stem, ext = os.path.splitext(name)
+            if not is_image_file(name):
+                continue
+            label_path = os.path.join(dirpath, stem + ".txt")
+            lines = read_label(label_path) if os.path.exists(label_path) else []
+            if not lines:
+                skipped += 1
+                continue
+            # ShortID + view name is unique across the dataset
+            target = f"{art.split('_')[-1]}_{stem}"
+            image_dir = os.path.join(out_dir, "images", split)
+            label_dir = os.path.join(out_dir, "labels", split)
+            os.makedirs(image_dir, exist_ok=True)
+            os.makedirs(label_dir, exist_ok=True)
+            link_or_copy(os.path.join(dirpath, name), os.path.join(image_dir, target + ext.lower()))
+            with open(os.path.join(label_dir, target + ".txt"), 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            counts[split] += 1
+
+    data_yaml = os.path.join(out_dir, "data.yaml")
+    with open(data_yaml, 'w', encoding='utf-8') as f:
+        f.write(f"path: {os.path.abspath(out_dir)}\ntrain: images/train\nval: images/val\nnames:\n  0: artifact\n")
+    print(f"📦 Detection dataset: {counts['train']} train / {counts['val']} val images "
+          f"({skipped} without labels skipped) -> {out_dir}")
+    return data_yaml
+
+
+def write_roi_config(config_path, localizer, classifier, pad, min_conf):
+    base = os.path.dirname(os.path.abspath(config_path))
+    config = {
+        "localizer": os.path.relpath(os.path.abspath(localizer), base).replace(os.sep, "/"),
+        "classifier": os.path.relpath(os.path.abspath(classifier), base).replace(os.sep, "/"),
+        "pad": pad,
+        "min_conf": min_conf,
+        "localizer_hash": file_digest(localizer),
+        "classifier_hash": file_digest(classifier),
+    }
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+def train():
+    parser = argparse.ArgumentParser(description="Train the artifact localizer on the dataset box labels.")
+    parser.add_argument("--source", default=os.path.join(PROJECT_ROOT, "dataset"))
+    parser.add_argument("--data-dir", default=os.path.join(PROJECT_ROOT, "datasets", "localizer"))
+    parser.add_argument("--model", default="yolov8n.pt", help="Detector to fine-tune")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--imgsz", type=int, default=320)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, "models", "localizer", "localizer.onnx"))
+    parser.add_argument("--classifier", default=os.path.join(PROJECT_ROOT, "models", "best.onnx"),
+                        help="Second-stage classifier referenced by the ROI config")
+    parser.add_argument("--config", default=os.path.join(PROJECT_ROOT, "models", "roi.json"))
+    parser.add_argument("--pad", type=float, default=0.1, help="Box padding before cropping")
+    parser.add_argument("--min-conf", type=float, default=0.25, help="Below this, classify the full frame")
+    parser.add_argument("--prepare-only", action="store_true", help="Only build the detection dataset")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source):
+        print(f"❌ Error: Source directory not found: {args.source}")
+        return
+    data_yaml = build_dataset(args.source, args.data_dir)
+    if args.prepare_only:
+        return
+
+    from ultralytics import YOLO
+
+    print(f"🚀 Training {args.model} localizer at {args.imgsz}px for {args.epochs} epochs...")
+    model = YOLO(args.model)
+    model.train(data=data_yaml, epochs=args.epochs, imgsz=args.imgsz, batch=args.batch,
+                project=os.path.join(PROJECT_ROOT, "runs", "localize"), name="localizer", exist_ok=True)
+    best = str(model.trainer.best)
+    print(f"✅ Training Complete: {best}")
+
+    exported = YOLO(best).export(format="onnx", dynamic=True, imgsz=args.imgsz)
+    if not exported or not os.path.exists(exported):
+        print("❌ Export failed.")
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    shutil.copy(exported, args.output)
+    print(f"📂 Localizer exported to {args.output}")
+
+    write_roi_config(args.config, args.output, args.classifier, args.pad, args.min_conf)
+    print(f"✅ ROI config written to {args.config}")
+
+
+if __name__ == "__main__":
+    train()
@@ -5,24 +5,35 @@ Training launch script for YOLOv8 model (Classification).
 
 Usage:
     python scripts/train_yolo.py
+    python scripts/train_yolo.py --data datasets/processed_roi --imgsz 160 --name artifact_cls_roi
 
 Description:
     This script initializes the YOLOv8-cls model and trains it using
     the dataset located in datasets/processed.
+    The ROI-crop classifier (see app/roi_crop.py) is trained the same way on
+    the cropped dataset from `data_augment.py --roi`, at a smaller --imgsz.
 """
 
 from ultralytics import YOLO
+import argparse
 import os
 
 def train():
+    parser = argparse.ArgumentParser(description="Train the YOLOv8 artifact classifier.")
+    parser.add_argument("--data", default="datasets/processed")
+    parser.add_argument("--imgsz", type=int, default=224)
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--name", default="artifact_cls_run")
+    args = parser.parse_args()
+
     # 1. Configuration
-    DATASET_DIR = "datasets/processed"
+    DATASET_DIR = args.data
     MODEL_NAME = "yolov8s-cls.pt"  # Small model for better fine-grained recognition
-    EPOCHS = 100  # 细粒度分类需要更长训练时间
-    IMG_SIZE = 224
+    EPOCHS = args.epochs  # 细粒度分类需要更长训练时间 (默认 100)
+    IMG_SIZE = args.imgsz
     BATCH_SIZE = 16
     PROJECT_NAME = "Luyun-Artifact-Vision"
-    RUN_NAME = "artifact_cls_run"
+    RUN_NAME = args.name
 
     # Absolute path to dataset for safety
     dataset_abs_path = os.path.abspath(DATASET_DIR)
@@ -0,0 +1,111 @@
+"""
+verify_onnx_runtime.py
+-----------------------
+Checks that the lightweight onnxruntime backend (app/onnx_inference.py)
+reproduces ultralytics predictions on the exported model.
+
+Usage:
+    python scripts/verify_onnx_runtime.py [--model models/best.onnx] [--images dataset] [--limit 50]
+
+Description:
+    Runs the same images through ultralytics YOLO(best.onnx) and OnnxClassifier,
+    then reports the max absolute probability difference, top-1 / top-5 agreement
+    and the cold-start cost (import + load) of both backends.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "app"))
+
+import numpy as np
+
+from image_index import is_image_file
+
+# Measured in a fresh interpreter so already-imported modules do not hide the cost
+COLD_START_SNIPPET = {
+    "onnxruntime": "import sys; sys.path.insert(0, {app!r}); "
+                   "from onnx_inference import OnnxClassifier; OnnxClassifier({model!r})",
+    "ultralytics": "from ultralytics import YOLO; YOLO({model!r}, task='classify')",
+}
+
+
+def collect_images(root, limit):
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if is_image_file(name):
+                images.append(os.path.join(dirpath, name))
+                if len(images) >= limit:
+                    return images
+    return images
+
+
+def measure_cold_start(backend, model_path):
+    code = COLD_START_SNIPPET[backend].format(app=os.path.join(PROJECT_ROOT, "app"), model=model_path)
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        return None
+    return elapsed
+
+
+def verify():
+    parser = argparse.ArgumentParser(description="Compare onnxruntime backend against ultralytics.")
+    parser.add_argument("--model", default=os.path.join(PROJECT_ROOT, "models", "best.onnx"))
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "dataset"))
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--atol", type=float, default=1e-3, help="Max allowed probability difference")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Error: Model not found at {args.model}")
+        sys.exit(1)
+
+    images = collect_images(args.images, args.limit)
+    if not images:
+        print(f"❌ Error: No images found under {args.images}")
+        sys.exit(1)
+
+    from onnx_inference import OnnxClassifier
+    from ultralytics import YOLO
+
+    lite = OnnxClassifier(args.model)
+    reference = YOLO(args.model, task='classify')
+
+    max_diff = 0.0
+    top1_match = 0
+    top5_match = 0
+    for img_path in images:
+        ref = reference(img_path, verbose=False)[0].probs
+        ref_probs = ref.data.cpu().numpy()
+        probs = lite.predict_probs([img_path])[0]
+
+        max_diff = max(max_diff, float(np.abs(ref_probs - probs).max()))
+        top1_match += int(ref.top1 == int(probs.argmax()))
+        top5_match += int(list(ref.top5) == (-probs).argsort(kind="stable")[:5].tolist())
+
+    n = len(images)
+    print(f"📊 Compared {n} images")
+    print(f"  max |Δprob|     : {max_diff:.2e}")
+    print(f"  top-1 agreement : {top1_match}/{n}")
+    print(f"  top-5 agreement : {top5_match}/{n}")
+
+    for backend in ("onnxruntime", "ultralytics"):
+        elapsed = measure_cold_start(backend, args.model)
+        if elapsed is not None:
+            print(f"  cold start ({backend}): {elapsed:.2f} s")
+
+    if max_diff > args.atol or top1_match != n:
+        print("❌ onnxruntime backend does not match ultralytics.")
+        sys.exit(1)
+    print("✅ onnxruntime backend matches ultralytics.")
+
+
+if __name__ == "__main__":
+    verify()